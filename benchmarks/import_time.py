@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Import time benchmark. Measures, in fresh interpreters, the
+time spent importing the package and building a client, and
+reports which heavy modules end up loaded.
+
+Usage:
+    python3 benchmarks/import_time.py [runs]
+"""
+
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = [
+    ("baseline", "pass"),
+    ("import", "import pycryptocompare"),
+    ("client", "from pycryptocompare import CryptoCompare; "
+               "CryptoCompare()"),
+    ("client (http.client)", "from pycryptocompare import CryptoCompare; "
+                             "CryptoCompare(transport='http.client')"),
+]
+
+HEAVY_MODULES = ("requests", "urllib3", "decimal", "re", "http.client")
+
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+%s
+elapsed = time.perf_counter() - start
+loaded = [m for m in %r if m in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+
+def measure(statement, runs):
+    timings, loaded = [], ""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    for _ in range(runs):
+        out = subprocess.check_output(
+            [sys.executable, "-c", SCRIPT % (statement, HEAVY_MODULES)],
+            env=env, universal_newlines=True)
+        elapsed, loaded = out.split(" ", 1)
+        timings.append(float(elapsed))
+    timings.sort()
+    return timings[len(timings) // 2], loaded.strip()
+
+
+def main(runs=15):
+    print("%-22s %12s  %s" % ("case", "median (ms)", "heavy modules loaded"))
+    for name, statement in STATEMENTS:
+        median, loaded = measure(statement, runs)
+        print("%-22s %12.2f  %s" % (name, median * 1000, loaded or "-"))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
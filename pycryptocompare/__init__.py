@@ -7,4 +7,24 @@ __author__ = 'Álvaro Mondéjar Rubio <mondejar1994@gmail.com>'
 __repo__    = 'https://github.com/mondeja/pycriptocompare'
 __license__ = 'BSD License'
 
-from .cryptocompare import CryptoCompare, CryptoCompareError
+# Public names are resolved on first access, so a plain
+# ``import pycryptocompare`` doesn't load the HTTP machinery.
+_LAZY = {
+    'CryptoCompare': '.cryptocompare',
+    'CryptoCompareError': '.cryptocompare',
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        from importlib import import_module
+        value = getattr(import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
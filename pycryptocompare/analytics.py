@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Derived indicators over histo candles.
+
+The functions compute indicators over whole arrays with numpy.
+``Indicators`` keeps them as derived columns of a ``HistoSeries``
+and, when the series is updated by a poll, only recomputes the
+changed rows using running sums, instead of the full window.
+"""
+
+from .series import np, require_numpy, HistoSeries
+
+
+""" ###########################################
+    ############  ARRAY FUNCTIONS  ############
+    ###########################################
+"""
+
+def returns(close, log=False):
+    """
+    Simple (or logarithmic) returns between consecutive
+    closes. First value is NaN.
+    """
+    require_numpy()
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    if log:
+        out[1:] = np.log(close[1:] / close[:-1])
+    else:
+        out[1:] = close[1:] / close[:-1] - 1
+    return out
+
+
+def _window_sum(values, window):
+    """Sum of each ``window`` consecutive values (NaN before filled)."""
+    csum = np.cumsum(values)
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = csum[window - 1:]
+        out[window:] -= csum[:-window]
+    return out
+
+
+def sma(values, window):
+    """Simple moving average."""
+    require_numpy()
+    return _window_sum(np.asarray(values, dtype=np.float64), window) / window
+
+
+def ema(values, span):
+    """Exponential moving average, alpha = 2 / (span + 1)."""
+    require_numpy()
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty(len(values))
+    _ema_fill(values, out, 0, 2.0 / (span + 1))
+    return out
+
+
+def _ema_fill(values, out, start, alpha):
+    # The recursion only visits rows from ``start``
+    previous = out[start - 1] if start > 0 else np.nan
+    for i in range(start, len(values)):
+        value = values[i]
+        if previous != previous:  # NaN, seed with the first value
+            previous = value
+        else:
+            previous = previous + alpha * (value - previous)
+        out[i] = previous
+
+
+def volatility(close, window, periods_per_year=None):
+    """
+    Rolling standard deviation (sample) of log returns.
+    If ``periods_per_year`` is passed, it's annualized.
+    """
+    require_numpy()
+    rets = returns(close, log=True)
+    rets[:1] = 0
+    count = np.full(len(rets), window, dtype=np.float64)
+    sum1 = _window_sum(rets, window)
+    sum2 = _window_sum(rets * rets, window)
+    out = _std(sum1, sum2, count)
+    out[:window] = np.nan
+    if periods_per_year:
+        out *= np.sqrt(periods_per_year)
+    return out
+
+
+def _std(sum1, sum2, count):
+    var = (sum2 - sum1 * sum1 / count) / (count - 1)
+    return np.sqrt(np.maximum(var, 0))
+
+
+def vwap(high, low, close, volume, window=None):
+    """
+    Volume weighted average of the typical price
+    ((high + low + close) / 3). Cumulative from the first
+    candle or over a rolling ``window``.
+    """
+    require_numpy()
+    typical = (np.asarray(high, dtype=np.float64) +
+               np.asarray(low, dtype=np.float64) +
+               np.asarray(close, dtype=np.float64)) / 3
+    volume = np.asarray(volume, dtype=np.float64)
+    if window is None:
+        return np.cumsum(typical * volume) / np.cumsum(volume)
+    return _window_sum(typical * volume, window) / _window_sum(volume, window)
+
+
+""" ###########################################
+    #########  INCREMENTAL INDICATORS  ########
+    ###########################################
+"""
+
+class Indicators(object):
+    """ Indicators maintained as derived columns of a series.
+    Columns are named "return", "log_return", "vwap",
+    "vwap_<window>", "sma_<window>", "ema_<span>"
+    and "volatility_<window>".
+
+    Example:
+        ---------------------------------------
+        >>> series = HistoSeries.from_response(
+        ...     cc.histo("minute", "BTC", "USD", limit=2000))
+        >>> ind = Indicators(series, sma=(20, 50), ema=(12,),
+        ...                  volatility=(60,), vwap=(30,))
+        >>> series.update(cc.histo("minute", "BTC", "USD", limit=3))
+        >>> ind["sma_20"][-1]
+        ---------------------------------------
+
+    :param series: Series of candles, or a histo response.
+    :type series: HistoSeries or dict
+
+    :param sma: Windows of simple moving averages of close.
+    :type sma: tuple
+
+    :param ema: Spans of exponential moving averages of close.
+    :type ema: tuple
+
+    :param volatility: Windows of rolling volatility
+        of log returns of close.
+    :type volatility: tuple
+
+    :param vwap: Windows of rolling VWAP, cumulative VWAP
+        is always computed.
+    :type vwap: tuple
+
+    :param annualize: Annualize volatility using the
+        period of the series. (optional, default == False)
+    :type annualize: bool
+    """
+    def __init__(self, series, sma=(), ema=(), volatility=(),
+                 vwap=(), annualize=False):
+        if not isinstance(series, HistoSeries):
+            series = HistoSeries.from_response(series)
+        self.series = series
+        self.sma = tuple(sma)
+        self.ema = tuple(ema)
+        self.volatility = tuple(volatility)
+        self.vwap = tuple(vwap)
+        self.annualize = annualize
+        windows = self.sma + self.volatility + self.vwap
+        if series.maxlen is not None and windows and series.maxlen <= max(windows):
+            raise ValueError("maxlen of the series must be greater "
+                             "than the largest window")
+
+        # Running sums used to compute windows in O(changed rows)
+        self._sums = ["_sum_close", "_sum_ret", "_sum_ret2",
+                      "_sum_pv", "_sum_vol"]
+        for name in self._sums + self.names:
+            series.add_column(name)
+        series.listeners.append(self.refresh)
+        self.refresh(0)
+
+    @property
+    def names(self):
+        names = ["return", "log_return", "vwap"]
+        names += ["vwap_%d" % w for w in self.vwap]
+        names += ["sma_%d" % w for w in self.sma]
+        names += ["ema_%d" % s for s in self.ema]
+        names += ["volatility_%d" % w for w in self.volatility]
+        return names
+
+    def __getitem__(self, name):
+        return self.series[name]
+
+    def as_dict(self):
+        return {name: self.series[name] for name in self.names}
+
+    def refresh(self, start=0):
+        """
+        Recompute indicators from row ``start``. Called
+        automatically when the series is updated.
+        """
+        s = self.series
+        n = len(s)
+        if start >= n:
+            return
+        close = s["close"]
+        rows = slice(start, n)
+
+        ret, log_ret = s["return"], s["log_return"]
+        if start == 0:
+            ret[0] = log_ret[0] = np.nan
+        first = max(start, 1)
+        ret[first:] = close[first:] / close[first - 1:-1] - 1
+        log_ret[first:] = np.log(close[first:] / close[first - 1:-1])
+
+        typical = (s["high"][rows] + s["low"][rows] + close[rows]) / 3
+        volume = s["volumefrom"][rows]
+        clean_log_ret = np.nan_to_num(log_ret[rows])
+        sum_close = self._running_sum("_sum_close", close[rows], start)
+        sum_ret = self._running_sum("_sum_ret", clean_log_ret, start)
+        sum_ret2 = self._running_sum("_sum_ret2", clean_log_ret ** 2, start)
+        sum_pv = self._running_sum("_sum_pv", typical * volume, start)
+        sum_vol = self._running_sum("_sum_vol", volume, start)
+
+        s["vwap"][rows] = sum_pv[rows] / sum_vol[rows]
+        for w in self.vwap:
+            s["vwap_%d" % w][rows] = (self._window(sum_pv, w, start) /
+                                      self._window(sum_vol, w, start))
+        for w in self.sma:
+            s["sma_%d" % w][rows] = self._window(sum_close, w, start) / w
+        for span in self.ema:
+            _ema_fill(close, s["ema_%d" % span], start, 2.0 / (span + 1))
+        for w in self.volatility:
+            out = _std(self._window(sum_ret, w, start),
+                       self._window(sum_ret2, w, start),
+                       np.float64(w))
+            # Return of the first row is undefined
+            out[:max(0, w - start)] = np.nan
+            if self.annualize:
+                out *= np.sqrt(365 * 86400.0 / s.step)
+            s["volatility_%d" % w][rows] = out
+
+    def _running_sum(self, name, values, start):
+        column = self.series[name]
+        offset = column[start - 1] if start > 0 else 0.0
+        column[start:] = offset + np.cumsum(values)
+        return column
+
+    def _window(self, csum, window, start):
+        """Sum of the last ``window`` values for rows from ``start``."""
+        index = np.arange(start, len(csum))
+        lower = index - window
+        previous = np.where(lower >= 0, csum[np.maximum(lower, 0)], 0.0)
+        out = csum[start:] - previous
+        out[index < window - 1] = np.nan
+        return out
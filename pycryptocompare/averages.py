@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Averages computed locally for many pairs.
+
+``day_averages`` reproduces the ``avgType`` variants of the dayAvg
+endpoint from hourly candles, for every day of a range at once, and
+``bulk_day_avg`` retrieves the histohour ranges of many pairs to
+compute them without a request per day and pair.
+
+``batch_generate_avg`` does the same for the generateAvg endpoint:
+per exchange ticks of every pair are retrieved with a pricemultifull
+request by exchange and volume weighted over each basket of markets
+at once. Requires numpy.
+"""
+
+import time
+
+from .series import np, require_numpy, candles_to_columns, HistoSeries
+from .batch import split_batch_kwargs
+from .cryptocompare import PRICE_CHUNK
+
+AVG_TYPES = ("HourVWAP", "MidHighLow", "VolFVolT")
+
+DAY = 86400
+HOUR = 3600
+
+# Hours by histohour request
+MAX_LIMIT = 2000
+
+
+def day_start(timestamp, utc_hour_diff=0):
+    """
+    UTC timestamp of the start of the day of ``timestamp``,
+    in the time zone ``utc_hour_diff`` hours from UTC.
+    """
+    shift = int(utc_hour_diff) * HOUR
+    return (int(timestamp) + shift) // DAY * DAY - shift
+
+
+def day_averages(candles, avg_types=AVG_TYPES, utc_hour_diff=0):
+    """
+    Compute day averages from hourly candles, like the
+    dayAvg endpoint (see ``CryptoCompare.day_avg``):
+
+        HourVWAP: sum(close * volumefrom) / sum(volumefrom)
+        MidHighLow: (max(high) + min(low)) / 2
+        VolFVolT: sum(volumeto) / sum(volumefrom)
+
+    Days without volume have no HourVWAP nor VolFVolT (NaN),
+    the value dayAvg returns for them isn't reproduced.
+
+    Example call:
+        ---------------------------------------
+        >>> averages = day_averages(cc.histo("hour", "BTC", "USD", limit=2000),
+        ...                         utc_hour_diff=-8)
+        >>> averages["time"], averages["HourVWAP"]
+        ---------------------------------------
+
+    :param candles: Histohour response, list of candles,
+        dict of columns or series.
+    :type candles: dict, list or HistoSeries
+
+    :param avg_types: Averages computed.
+        (optional, default == AVG_TYPES)
+    :type avg_types: tuple
+
+    :param utc_hour_diff: Hours from UTC of the time zone
+        of the days. (optional, default == 0)
+    :type utc_hour_diff: int
+
+    :return: Arrays of day start times ("time") and
+        of each average type.
+    :rtype: dict
+    """
+    require_numpy()
+    for avg_type in avg_types:
+        if avg_type not in AVG_TYPES:
+            msg = "%s is not a valid avgType, please select: %s"
+            raise ValueError(msg % (avg_type, ", ".join(AVG_TYPES)))
+    if isinstance(candles, HistoSeries):
+        columns = candles
+    else:
+        columns = candles_to_columns(candles)
+    times = columns["time"]
+    shift = int(utc_hour_diff) * HOUR
+    days = (times + shift) // DAY
+    result = {"time": np.empty(0, dtype=np.int64)}
+    result.update((avg_type, np.empty(0)) for avg_type in avg_types)
+    if not len(times):
+        return result
+
+    starts = np.flatnonzero(np.concatenate(([True], days[1:] != days[:-1])))
+    result["time"] = days[starts] * DAY - shift
+    volumefrom = columns["volumefrom"]
+    total_from = np.add.reduceat(volumefrom, starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if "HourVWAP" in avg_types:
+            close = columns["close"]
+            vwap = np.add.reduceat(close * volumefrom, starts) / total_from
+            result["HourVWAP"] = np.where(total_from > 0, vwap, np.nan)
+        if "MidHighLow" in avg_types:
+            result["MidHighLow"] = (np.maximum.reduceat(columns["high"], starts) +
+                                    np.minimum.reduceat(columns["low"], starts)) / 2
+        if "VolFVolT" in avg_types:
+            total_to = np.add.reduceat(columns["volumeto"], starts)
+            result["VolFVolT"] = np.where(total_from > 0,
+                                          total_to / total_from, np.nan)
+    return result
+
+
+def bulk_day_avg(cc, pairs, start, end=None, avg_types=AVG_TYPES,
+                 utc_hour_diff=0, e=None, **kwargs):
+    """
+    Compute day averages of many pairs for every day from
+    ``start`` to ``end``, retrieving their hourly candles
+    concurrently (a request by pair and 2000 hours) instead
+    of calling ``day_avg`` by pair and day.
+
+    Example call:
+        ---------------------------------------
+        >>> averages = bulk_day_avg(cc, [("BTC", "USD"), ("ETH", "EUR")],
+        ...                         start=1514764800, avg_types=("HourVWAP",))
+        >>> averages[("BTC", "USD")]["HourVWAP"]
+        ---------------------------------------
+
+    :param cc: Client.
+    :type cc: CryptoCompare
+
+    :param pairs: (fsym, tsym) tuples.
+    :type pairs: list
+
+    :param start: Timestamp of the first day.
+    :type start: int
+
+    :param end: Timestamp of the last day, as default
+        the current one. (optional, default == None)
+    :type end: int
+
+    :param e: Exchange, as default CCCAGG.
+        (optional, default == None)
+    :type e: str
+
+    :param **kwargs: See tryConversion param in price method,
+        and params of the batch executor, like max_workers.
+
+    See ``day_averages`` for other params.
+
+    :return: Result of ``day_averages`` by pair.
+    :rtype: dict
+
+    - raises 'cryptocompare.CryptoCompareError' if a
+        request returns an error.
+    """
+    require_numpy()
+    first = day_start(start, utc_hour_diff)
+    last = day_start(time.time() if end is None else end, utc_hour_diff) + DAY - HOUR
+
+    batch_kwargs = split_batch_kwargs(kwargs)
+    if e:
+        kwargs["e"] = e
+
+    pairs = [tuple(pair) for pair in pairs]
+    calls, windows = [], []
+    for pair in pairs:
+        to_ts = last
+        while to_ts >= first:
+            limit = min(MAX_LIMIT, (to_ts - first) // HOUR)
+            calls.append(("histo", ("hour",) + pair,
+                          dict(kwargs, toTs=to_ts, limit=max(limit, 1))))
+            windows.append((pair, to_ts - limit * HOUR, to_ts))
+            to_ts -= (limit + 1) * HOUR
+
+    series = dict((pair, HistoSeries("hour")) for pair in pairs)
+    for result in cc.batch(calls, **batch_kwargs):
+        if not result.ok:
+            raise result.error
+        pair, lower, upper = windows[result.index]
+        candles = [candle for candle in result.result.get("Data", ())
+                   if lower <= candle["time"] <= upper and
+                   (candle["open"] or candle["close"])]
+        series[pair].update(candles)
+    return dict((pair, day_averages(series[pair], avg_types, utc_hour_diff))
+                for pair in pairs)
+
+
+""" ###########################################
+    ##########  GENERATED AVERAGES  ###########
+    ###########################################
+"""
+
+# RAW fields of per exchange ticks used by generate_averages
+TICK_FIELDS = ("PRICE", "LASTUPDATE", "LASTVOLUME", "LASTVOLUMETO",
+               "VOLUME24HOUR", "VOLUME24HOURTO", "OPEN24HOUR",
+               "HIGH24HOUR", "LOW24HOUR")
+
+
+def exchange_ticks(cc, pairs, exchanges, **kwargs):
+    """
+    Retrieve pricemultifull ticks of the pairs on every exchange,
+    with a request by exchange (and PRICE_CHUNK from symbols).
+    Requests run as a batch (see ``CryptoCompare.batch``).
+
+    :param cc: Client.
+    :type cc: CryptoCompare
+
+    :param pairs: (fsym, tsym) tuples.
+    :type pairs: list
+
+    :param exchanges: Names of exchanges.
+    :type exchanges: list
+
+    :param **kwargs: Params of the batch executor, like
+        max_workers, and other params of price method.
+
+    :return: RAW ticks by exchange, display symbols by
+        symbol and errors by exchange.
+    :rtype: tuple
+    """
+    batch_kwargs = split_batch_kwargs(kwargs)
+    fsyms = sorted(set(fsym for fsym, _ in pairs))
+    tsyms = sorted(set(tsym for _, tsym in pairs))
+    calls, targets = [], []
+    for exchange in exchanges:
+        for i in range(0, len(fsyms), PRICE_CHUNK):
+            calls.append(("price", (fsyms[i:i + PRICE_CHUNK], tsyms),
+                          dict(kwargs, e=exchange, full=True)))
+            targets.append(exchange)
+
+    ticks, symbols, errors = {}, {}, {}
+    for result in cc.batch(calls, **batch_kwargs):
+        exchange = targets[result.index]
+        if not result.ok:
+            errors[exchange] = result.error
+            continue
+        raw = ticks.setdefault(exchange, {})
+        for fsym, entries in result.result.get("RAW", {}).items():
+            raw.setdefault(fsym, {}).update(entries)
+        for fsym, entries in result.result.get("DISPLAY", {}).items():
+            for tsym, entry in entries.items():
+                symbols.setdefault(fsym, entry.get("FROMSYMBOL", fsym))
+                symbols.setdefault(tsym, entry.get("TOSYMBOL", tsym))
+    return ticks, symbols, errors
+
+
+def _display_number(value):
+    if value != value:
+        return None
+    if abs(value) >= 1:
+        return "{:,.2f}".format(value).rstrip("0").rstrip(".")
+    return "%.4g" % value if value else "0"
+
+
+def _display(raw, symbols):
+    """DISPLAY block of a generated average."""
+    fsym = symbols.get(raw["FROMSYMBOL"], raw["FROMSYMBOL"])
+    tsym = symbols.get(raw["TOSYMBOL"], raw["TOSYMBOL"])
+    display = dict(FROMSYMBOL=fsym, TOSYMBOL=tsym, MARKET=raw["MARKET"],
+                   LASTMARKET=raw["LASTMARKET"])
+    for field, symbol in (("PRICE", tsym), ("OPEN24HOUR", tsym),
+                          ("HIGH24HOUR", tsym), ("LOW24HOUR", tsym),
+                          ("CHANGE24HOUR", tsym), ("LASTVOLUME", fsym),
+                          ("LASTVOLUMETO", tsym), ("VOLUME24HOUR", fsym),
+                          ("VOLUME24HOURTO", tsym)):
+        number = _display_number(raw[field])
+        display[field] = None if number is None else "%s %s" % (symbol, number)
+    display["CHANGEPCT24HOUR"] = _display_number(raw["CHANGEPCT24HOUR"])
+    return display
+
+
+def generate_averages(ticks, pairs, baskets, symbols=None, display=True):
+    """
+    Compute volume weighted averages of every pair in every
+    basket of markets from per exchange ticks (see
+    ``exchange_ticks``), like the generateAvg endpoint:
+
+        PRICE, OPEN24HOUR: weighted by VOLUME24HOUR
+        VOLUME24HOUR, VOLUME24HOURTO: sums
+        HIGH24HOUR, LOW24HOUR: maximum and minimum
+        LAST*: from the market with the last update
+
+    Markets of a basket where a pair isn't traded are ignored, and
+    pairs not traded in any market of a basket are left out.
+
+    :param ticks: RAW pricemultifull ticks by exchange.
+    :type ticks: dict
+
+    :param pairs: (fsym, tsym) tuples.
+    :type pairs: list
+
+    :param baskets: Markets by basket name.
+    :type baskets: dict
+
+    :param symbols: Display symbols by symbol, like "Ƀ" for
+        "BTC". (optional, default == None)
+    :type symbols: dict
+
+    :param display: Add DISPLAY blocks.
+        (optional, default == True)
+    :type display: bool
+
+    :return: Responses like generate_avg ones by basket
+        name and pair.
+    :rtype: dict
+    """
+    require_numpy()
+    pairs = [tuple(pair) for pair in pairs]
+    names = list(baskets)
+    exchanges = sorted(set(m for markets in baskets.values() for m in markets))
+    column = dict((exchange, j) for j, exchange in enumerate(exchanges))
+    shape = (len(pairs), len(exchanges))
+
+    values = dict((field, np.full(shape, np.nan)) for field in TICK_FIELDS)
+    trade_ids = np.full(shape, None, dtype=object)
+    for j, exchange in enumerate(exchanges):
+        raw = ticks.get(exchange) or {}
+        for i, (fsym, tsym) in enumerate(pairs):
+            entry = raw.get(fsym, {}).get(tsym)
+            if not entry:
+                continue
+            for field in TICK_FIELDS:
+                if entry.get(field) is not None:
+                    values[field][i, j] = float(entry[field])
+            trade_ids[i, j] = entry.get("LASTTRADEID")
+
+    # (basket, exchange) membership
+    member = np.zeros((len(names), len(exchanges)), dtype=bool)
+    for k, name in enumerate(names):
+        member[k, [column[m] for m in baskets[name]]] = True
+    weights = member.astype(np.float64).T
+
+    present = ~np.isnan(values["PRICE"])
+    volume = np.where(present, np.nan_to_num(values["VOLUME24HOUR"]), 0)
+    counts = present.astype(np.float64).dot(weights)
+    total = volume.dot(weights)
+
+    def weighted(field):
+        value = np.where(present, np.nan_to_num(values[field]), 0)
+        mean = value.dot(weights) / np.maximum(counts, 1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(total > 0, (value * volume).dot(weights) / total,
+                            mean)
+
+    def masked(field, reduce, fill):
+        value = values[field][:, None, :]
+        mask = present[:, None, :] & member[None, :, :] & ~np.isnan(value)
+        return reduce(np.where(mask, value, fill), axis=2)
+
+    aggregates = {
+        "PRICE": weighted("PRICE"),
+        "OPEN24HOUR": weighted("OPEN24HOUR"),
+        "VOLUME24HOUR": total,
+        "VOLUME24HOURTO": np.where(present, np.nan_to_num(
+            values["VOLUME24HOURTO"]), 0).dot(weights),
+        "HIGH24HOUR": masked("HIGH24HOUR", np.max, -np.inf),
+        "LOW24HOUR": masked("LOW24HOUR", np.min, np.inf),
+    }
+    last = np.where(present[:, None, :] & member[None, :, :],
+                    np.nan_to_num(values["LASTUPDATE"], nan=-1)[:, None, :],
+                    -2).argmax(axis=2)
+
+    averages = dict((name, {}) for name in names)
+    symbols = symbols or {}
+    for i, (fsym, tsym) in enumerate(pairs):
+        for k, name in enumerate(names):
+            if not counts[i, k]:
+                continue
+            j = last[i, k]
+            raw = dict(MARKET="CUSTOMAGG", FLAGS=0, FROMSYMBOL=fsym,
+                       TOSYMBOL=tsym, LASTMARKET=exchanges[j],
+                       LASTTRADEID=trade_ids[i, j])
+            for field in ("LASTUPDATE", "LASTVOLUME", "LASTVOLUMETO"):
+                raw[field] = float(values[field][i, j])
+            raw["LASTUPDATE"] = int(np.nan_to_num(raw["LASTUPDATE"]))
+            for field, array in aggregates.items():
+                value = float(array[i, k])
+                raw[field] = value if np.isfinite(value) else float("nan")
+            raw["CHANGE24HOUR"] = raw["PRICE"] - raw["OPEN24HOUR"]
+            raw["CHANGEPCT24HOUR"] = (raw["CHANGE24HOUR"] / raw["OPEN24HOUR"] * 100
+                                      if raw["OPEN24HOUR"] else 0.0)
+            average = {"RAW": raw}
+            if display:
+                average["DISPLAY"] = _display(raw, symbols)
+            averages[name][(fsym, tsym)] = average
+    return averages
+
+
+def batch_generate_avg(cc, pairs, baskets, display=True, **kwargs):
+    """
+    Compute ``generate_avg`` of many pairs for many baskets of
+    markets, with a pricemultifull request by exchange instead
+    of a request by pair and basket.
+
+    Example call:
+        ---------------------------------------
+        >>> averages = batch_generate_avg(cc, [("BTC", "USD"), ("ETH", "USD")],
+        ...                               {"main": ["Kraken", "Coinbase"],
+        ...                                "all": ["Kraken", "Coinbase", "Bitstamp"]})
+        >>> averages["main"][("BTC", "USD")]["RAW"]["PRICE"]
+        ---------------------------------------
+
+    :param cc: Client.
+    :type cc: CryptoCompare
+
+    :param pairs: (fsym, tsym) tuples.
+    :type pairs: list
+
+    :param baskets: Markets by basket name, a list of
+        markets for a single basket named "CUSTOMAGG".
+    :type baskets: dict or list
+
+    :param **kwargs: See exchange_ticks.
+
+    See ``generate_averages`` for other params.
+
+    :return: Responses like generate_avg ones by basket
+        name and pair. Numbers are floats.
+    :rtype: dict
+
+    - raises 'cryptocompare.CryptoCompareError' if every
+        exchange request returns an error.
+    """
+    if not isinstance(baskets, dict):
+        baskets = {"CUSTOMAGG": list(baskets)}
+    exchanges = sorted(set(m for markets in baskets.values() for m in markets))
+    ticks, symbols, errors = exchange_ticks(cc, pairs, exchanges, **kwargs)
+    if errors and not ticks:
+        raise next(iter(errors.values()))
+    return generate_averages(ticks, pairs, baskets, symbols, display=display)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Concurrent execution of heterogeneous lists of client calls.
+
+Calls run on an ``AdaptiveExecutor``, so they share the connection
+pool of the client transport and adapt to rate limits. Errors are
+returned per item instead of being raised.
+"""
+
+import inspect
+from functools import wraps
+from collections import namedtuple
+from concurrent.futures import as_completed
+
+from .executor import AdaptiveExecutor
+
+
+class Call(namedtuple("Call", ("method", "args", "kwargs"))):
+    """ Invocation of a client method.
+
+    :param method: Name of a public method of the client
+        (like "top_pairs") or the bound method itself.
+    :type method: str or function
+
+    :param args: Positional arguments, or the only
+        argument if it's not a tuple or a list.
+    :type args: tuple
+
+    :param kwargs: Keyword arguments.
+    :type kwargs: dict
+    """
+    def __new__(cls, method, args=(), kwargs=None):
+        if not isinstance(args, (tuple, list)):
+            args = (args,)
+        return super(Call, cls).__new__(cls, method, tuple(args),
+                                        dict(kwargs or {}))
+
+
+class BatchResult(namedtuple("BatchResult",
+                             ("index", "call", "result", "error"))):
+    """ Result of a call in a batch. ``error`` is the exception
+    raised by the call or None if it succeeded.
+    """
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def to_call(call):
+    """
+    Convert ``Call`` objects or tuples like ``(method,)``,
+    ``(method, args)`` or ``(method, args, kwargs)``.
+    """
+    if isinstance(call, Call):
+        return call
+    if isinstance(call, str) or callable(call):
+        return Call(call)
+    return Call(*call)
+
+
+def split_batch_kwargs(kwargs):
+    """
+    Pop from ``kwargs`` the params of ``iter_batch`` and of
+    ``AdaptiveExecutor`` (like max_workers), so the others
+    can be passed to client methods.
+
+    :return: Params of the batch.
+    :rtype: dict
+    """
+    return dict((name, kwargs.pop(name)) for name in BATCH_PARAMS
+                if name in kwargs)
+
+
+def _resolve(cc, name):
+    """
+    Public method of the client named ``name``.
+    - raises 'AttributeError' for other names.
+    """
+    method = None
+    if not name.startswith("_"):
+        method = getattr(cc, name, None)
+    if not callable(method):
+        raise AttributeError("%s is not a method of the client" % name)
+    return method
+
+
+def _named(cc, name):
+    """Call of the method ``name``, resolved when it runs."""
+    def call(*args, **kwargs):
+        return _resolve(cc, name)(*args, **kwargs)
+    call.__name__ = name
+    return call
+
+
+def _with_priority(cc, method, priority, timeout):
+    @wraps(method)
+    def call(*args, **kwargs):
+        with cc.priority(priority, timeout):
+            return method(*args, **kwargs)
+    return call
+
+
+def iter_batch(cc, calls, executor=None, ordered=False,
+               priority=None, timeout=None, **executor_kwargs):
+    """
+    Run calls concurrently, yielding a ``BatchResult`` per call
+    in completion order, or in input order if ``ordered``.
+
+    :param cc: Client.
+    :type cc: CryptoCompare
+
+    :param calls: Calls to run, see ``to_call``.
+    :type calls: list
+
+    :param executor: Executor to use, as default a new
+        ``AdaptiveExecutor`` is created with ``executor_kwargs``
+        and shut down at the end. (optional, default == None)
+    :type executor: AdaptiveExecutor
+
+    :param priority: Priority class of the calls, if
+        the client has a scheduler. (optional, default == None)
+    :type priority: str
+
+    :param timeout: Deadline in seconds of each request when
+        queued by the scheduler. (optional, default == None)
+    :type timeout: float
+    """
+    calls = [to_call(call) for call in calls]
+    own_executor = executor is None
+    if own_executor:
+        executor = AdaptiveExecutor(cc, **executor_kwargs)
+    futures = {}
+    try:
+        for index, call in enumerate(calls):
+            method = call.method
+            if isinstance(method, str):
+                # Unknown names fail as an item of the batch
+                method = _named(cc, method)
+            if priority is not None or timeout is not None:
+                method = _with_priority(cc, method, priority or "normal",
+                                        timeout)
+            future = executor.submit(method, *call.args, **call.kwargs)
+            futures[future] = index
+
+        pending = futures if ordered else as_completed(futures)
+        for future in pending:
+            index = futures[future]
+            error = future.exception()
+            result = None if error is not None else future.result()
+            yield BatchResult(index, calls[index], result, error)
+    finally:
+        # Cancel calls not started yet if the caller stops iterating
+        for future in futures:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=False)
+
+
+def _params(func, exclude):
+    return tuple(name for name in inspect.signature(func).parameters
+                 if name not in exclude)
+
+# Keyword arguments of iter_batch and of the executors it creates
+BATCH_PARAMS = (_params(iter_batch, ("cc", "calls", "ordered",
+                                     "executor_kwargs")) +
+                _params(AdaptiveExecutor.__init__, ("self", "cc")))
+
+
+def batch(cc, calls, executor=None, **executor_kwargs):
+    """
+    Run calls concurrently, returns a list of
+    ``BatchResult`` in input order.
+    """
+    return list(iter_batch(cc, calls, executor=executor, ordered=True,
+                           **executor_kwargs))
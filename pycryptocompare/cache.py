@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Response caches for CryptoCompare clients.
+
+Caches store raw response bodies by request url, so the client
+keeps decoding them with its own ``parse_float`` and ``parse_int``.
+Every cache exposes ``fetch(route, key, loader)``, which returns the
+cached body for ``key`` or calls ``loader()`` to retrieve and store it.
+Only successful responses reach the cache, the client raises before
+storing error messages.
+"""
+
+import os
+import time
+import zlib
+import sqlite3
+import threading
+
+# Default time to live in seconds for each route, based on
+# the server cache durations of the CryptoCompare API.
+DEFAULT_TTLS = {
+    "documentation": 3600,
+    "data/coinlist": 3600,
+    "data/miningcontracts": 3600,
+    "data/miningequipment": 3600,
+    "data/all/exchanges": 3600,
+    "data/news/providers": 3600,
+    "data/socialstats": 600,
+    "data/top/pairs": 60,
+    "data/top/exchanges": 60,
+    "data/top/volumes": 60,
+    "data/histoday": 600,
+    "data/histohour": 60,
+    "data/histominute": 10,
+    "data/pricehistorical": 600,
+    "data/dayAvg": 600,
+    "data/news/": 60,
+    "data/pricemulti": 10,
+    "data/pricemultifull": 10,
+    "data/generateAvg": 10,
+}
+
+
+class MemoryCache(object):
+    """ In-process cache of response bodies, shared by threads.
+    Hits are read without locking. Threads missing the same key
+    at once wait for the first one to retrieve it, so a process
+    makes one upstream call per key and TTL.
+
+    :param ttls: Time to live in seconds by route, updates
+        DEFAULT_TTLS (optional, default == None)
+    :type ttls: dict
+
+    :param default_ttl: Time to live for routes not present
+        in ttls, 0 disables caching for them.
+        (optional, default == 0)
+    :type default_ttl: int
+
+    :param max_entries: Maximum number of stored responses,
+        oldest are evicted first (optional, default == 1024)
+    :type max_entries: int
+    """
+    def __init__(self, ttls=None, default_ttl=0, max_entries=1024):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def ttl(self, route):
+        return self.ttls.get(route, self.default_ttl)
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is not None and entry[0] > time.time():
+            return entry[1]
+        return None
+
+    def set(self, route, key, body, ttl=None):
+        ttl = self.ttl(route) if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.time() + ttl, body)
+            while len(self._data) > self.max_entries:
+                # dicts keep insertion order, first key is the oldest
+                del self._data[next(iter(self._data))]
+
+    def fetch(self, route, key, loader):
+        body = self.get(key)
+        if body is not None:
+            return body
+        if self.ttl(route) <= 0:
+            return loader()
+        with self._lock:
+            lock = self._loading.setdefault(key, threading.Lock())
+        with lock:
+            try:
+                body = self.get(key)
+                if body is None:
+                    body = loader()
+                    self.set(route, key, body)
+                return body
+            finally:
+                with self._lock:
+                    if self._loading.get(key) is lock:
+                        del self._loading[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache(object):
+    """ Cache stored in a SQLite database on local disk, shared by
+    all processes (and threads) that open the same file. Bodies are
+    stored zlib compressed. When several processes miss the same key
+    at once, only one of them calls the API and the others wait for
+    its response, so a host makes one upstream call per key and TTL.
+
+    :param path: Path of the database file.
+    :type path: str
+
+    :param ttls: Time to live in seconds by route, updates
+        DEFAULT_TTLS (optional, default == None)
+    :type ttls: dict
+
+    :param default_ttl: Time to live for routes not present
+        in ttls, 0 disables caching for them.
+        (optional, default == 0)
+    :type default_ttl: int
+
+    :param max_size: Maximum size in bytes of stored (compressed)
+        bodies. Expired entries and then the oldest ones are
+        evicted when exceeded. (optional, default == 64 MiB)
+    :type max_size: int
+
+    :param lock_timeout: Seconds to wait for another process
+        retrieving the same key before fetching it anyway.
+        (optional, default == 30)
+    :type lock_timeout: int
+    """
+    def __init__(self, path, ttls=None, default_ttl=0,
+                 max_size=64 * 1024 * 1024, lock_timeout=30):
+        self.path = os.path.abspath(path)
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self.lock_timeout = lock_timeout
+        self.poll_interval = 0.05
+        self._local = threading.local()
+        self._owner = "%d-%d" % (os.getpid(), id(self))
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS responses ("
+                         "key TEXT PRIMARY KEY, route TEXT, "
+                         "stored REAL, expires REAL, "
+                         "size INTEGER, body BLOB)")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_stored "
+                         "ON responses (stored)")
+            conn.execute("CREATE TABLE IF NOT EXISTS locks ("
+                         "key TEXT PRIMARY KEY, owner TEXT, expires REAL)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=60,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def ttl(self, route):
+        return self.ttls.get(route, self.default_ttl)
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT body FROM responses WHERE key = ? AND expires > ?",
+            (key, time.time())).fetchone()
+        if row is None:
+            return None
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def set(self, route, key, body, ttl=None):
+        ttl = self.ttl(route) if ttl is None else ttl
+        if ttl <= 0:
+            return
+        now = time.time()
+        blob = zlib.compress(body.encode("utf-8"))
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT OR REPLACE INTO responses VALUES "
+                         "(?, ?, ?, ?, ?, ?)",
+                         (key, route, now, now + ttl, len(blob), blob))
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        total = conn.execute("SELECT TOTAL(size) FROM responses").fetchone()[0]
+        if total <= self.max_size:
+            return
+        conn.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+        total = conn.execute("SELECT TOTAL(size) FROM responses").fetchone()[0]
+        rows = conn.execute("SELECT key, size FROM responses "
+                            "ORDER BY stored").fetchall()
+        for key, size in rows:
+            if total <= self.max_size:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def _acquire(self, key):
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT expires FROM locks WHERE key = ?",
+                               (key,)).fetchone()
+            if row is not None and row[0] > now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO locks VALUES (?, ?, ?)",
+                         (key, self._owner, now + self.lock_timeout))
+        return True
+
+    def _release(self, key):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM locks WHERE key = ? AND owner = ?",
+                         (key, self._owner))
+
+    def fetch(self, route, key, loader):
+        if self.ttl(route) <= 0:
+            return loader()
+        deadline = time.time() + self.lock_timeout
+        while True:
+            body = self.get(key)
+            if body is not None:
+                return body
+            if self._acquire(key):
+                try:
+                    body = loader()
+                    self.set(route, key, body)
+                    return body
+                finally:
+                    self._release(key)
+            if time.time() > deadline:
+                return loader()
+            time.sleep(self.poll_interval)
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM responses")
+            conn.execute("DELETE FROM locks")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Command line interface.
+
+``pycryptocompare fetch`` downloads histo ranges, price snapshots or
+news for the pairs listed in a file and writes them to CSV, Parquet
+or SQLite. Requests run concurrently on an ``AdaptiveExecutor`` behind
+a ``RequestScheduler``, finished tasks are recorded in a checkpoint
+database so interrupted downloads resume where they stopped.
+
+Example:
+    ---------------------------------------
+    $ pycryptocompare fetch histo --pairs pairs.txt --period hour \\
+          --start 2018-01-01 --output histo.parquet
+    ---------------------------------------
+"""
+
+import os
+import sys
+import csv
+import time
+import sqlite3
+import argparse
+import calendar
+from datetime import datetime
+
+from .series import PERIODS, FIELDS
+from .export import RAW_FIELDS, RAW_STRING_FIELDS
+from .cryptocompare import PRICE_CHUNK
+
+HISTO_FIELDS = ("fsym", "tsym") + FIELDS
+PRICE_FIELDS = ("fsym", "tsym", "snapshot") + RAW_FIELDS + RAW_STRING_FIELDS
+NEWS_FIELDS = ("id", "published_on", "title", "url", "source",
+               "categories", "tags", "lang", "body")
+
+# Column types of Parquet output, other columns are strings
+INTEGER_FIELDS = ("time", "snapshot", "published_on")
+FLOAT_FIELDS = FIELDS[1:] + RAW_FIELDS
+
+# Columns identifying a row, used as primary key of SQLite tables
+ROW_KEYS = {
+    "histo": ("fsym", "tsym", "time"),
+    "price": ("fsym", "tsym", "snapshot"),
+    "news": ("id",),
+}
+
+# Candles by histo request
+HISTO_LIMIT = 2000
+
+TIME_FORMATS = ("%Y-%m-%d", "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S",
+                "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S")
+
+
+def parse_time(text):
+    """Parse a UTC timestamp or date like "2018-01-01"."""
+    if text.isdigit():
+        return int(text)
+    for fmt in TIME_FORMATS:
+        try:
+            return calendar.timegm(datetime.strptime(text, fmt).timetuple())
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError("invalid time: %r" % text)
+
+
+def read_pairs(path):
+    """
+    Read pairs from a file (or stdin with "-"), one by line
+    like "BTC/USD", "BTC-USD", "BTC,USD" or "BTC USD".
+    Empty lines and comments starting with "#" are ignored.
+    """
+    f = sys.stdin if path == "-" else open(path)
+    pairs = []
+    try:
+        for number, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            for sep in "/-, \t":
+                line = line.replace(sep, " ")
+            parts = line.split()
+            if len(parts) != 2:
+                raise ValueError("%s:%d: invalid pair %r" % (path, number, line))
+            pair = (parts[0].upper(), parts[1].upper())
+            if pair not in pairs:
+                pairs.append(pair)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    return pairs
+
+
+""" ###########################################
+    ##############  CHECKPOINTS  ##############
+    ###########################################
+"""
+
+class Checkpoint(object):
+    """ SQLite database recording finished tasks.
+
+    :param path: Path of the database.
+    :type path: str
+    """
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "  id TEXT PRIMARY KEY, rows INTEGER, finished REAL);"
+            "CREATE TABLE IF NOT EXISTS state ("
+            "  key TEXT PRIMARY KEY, value TEXT);")
+
+    def done(self):
+        """Identifiers of finished tasks."""
+        return set(row[0] for row in self.conn.execute("SELECT id FROM tasks"))
+
+    def mark(self, tasks):
+        """Record ``(id, rows)`` tuples as finished."""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?)",
+                [(task_id, rows, now) for task_id, rows in tasks])
+
+    def get(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM state WHERE key = ?",
+                                (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO state VALUES (?, ?)",
+                              (key, str(value)))
+
+    def time_range(self, key, start, end, span, now):
+        """
+        Resolve a download range, missing bounds default to
+        ``now`` and ``span`` seconds before the end. The range
+        of the first run is stored under ``key`` and reused
+        by runs that don't pass other bounds, so they resume
+        the same tasks.
+        """
+        stored = self.get(key)
+        if stored is not None:
+            stored_start, stored_end = [int(v) for v in stored.split(":")]
+            if start in (None, stored_start) and end in (None, stored_end):
+                return stored_start, stored_end
+        end = now if end is None else end
+        start = end - span if start is None else start
+        self.set(key, "%d:%d" % (start, end))
+        return start, end
+
+    def close(self):
+        self.conn.close()
+
+
+""" ###########################################
+    #################  SINKS  #################
+    ###########################################
+"""
+
+class CSVSink(object):
+    """ Appends rows to a CSV file. """
+    durable = True
+
+    def __init__(self, path, kind, fields):
+        header = not os.path.exists(path) or not os.path.getsize(path)
+        self.file = open(path, "a", newline="")
+        self.writer = csv.DictWriter(self.file, fields, extrasaction="ignore")
+        if header:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class SQLiteSink(object):
+    """ Inserts rows in a table named as the data kind, rows
+    already stored (same ROW_KEYS) are replaced. """
+    durable = True
+
+    def __init__(self, path, kind, fields):
+        self.conn = sqlite3.connect(path)
+        self.fields = fields
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS "%s" (%s, PRIMARY KEY (%s))'
+            % (kind, ", ".join('"%s"' % f for f in fields),
+               ", ".join('"%s"' % f for f in ROW_KEYS[kind])))
+        self.sql = 'INSERT OR REPLACE INTO "%s" VALUES (%s)' % (
+            kind, ", ".join("?" * len(fields)))
+
+    def write(self, rows):
+        with self.conn:
+            self.conn.executemany(self.sql, [tuple(row.get(f) for f in self.fields)
+                                             for row in rows])
+
+    def close(self):
+        self.conn.close()
+
+
+class ParquetSink(object):
+    """ Writes rows by chunks to a Parquet file, written under a
+    temporary name until closed. If the output exists (a resumed
+    download) a numbered file is created next to it, like
+    "histo.1.parquet", so the files can be read as a dataset. """
+    durable = False
+
+    def __init__(self, path, kind, fields):
+        from .export import ArrowWriter
+        root, ext = os.path.splitext(path)
+        number = 0
+        while os.path.exists(path):
+            number += 1
+            path = "%s.%d%s" % (root, number, ext)
+        self.path = path
+        self.fields = fields
+        self.writer = ArrowWriter(path + ".tmp", format="parquet")
+
+    def write(self, rows):
+        pa = self.writer.pa
+        arrays = []
+        for field in self.fields:
+            values = [row.get(field) for row in rows]
+            if field in INTEGER_FIELDS:
+                arrays.append(pa.array(values, pa.int64()))
+            elif field in FLOAT_FIELDS:
+                arrays.append(pa.array(values, pa.float64()))
+            else:
+                arrays.append(pa.array([None if v is None else str(v)
+                                        for v in values], pa.string()))
+        self.writer.write(pa.RecordBatch.from_arrays(arrays, names=self.fields))
+
+    def close(self):
+        self.writer.close()
+        if os.path.exists(self.path + ".tmp"):
+            os.rename(self.path + ".tmp", self.path)
+
+
+SINKS = {
+    "csv": CSVSink,
+    "sqlite": SQLiteSink,
+    "parquet": ParquetSink,
+}
+
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".db": "sqlite",
+    ".sqlite": "sqlite",
+    ".sqlite3": "sqlite",
+    ".parquet": "parquet",
+}
+
+
+""" ###########################################
+    #################  TASKS  #################
+    ###########################################
+"""
+
+class Task(object):
+    """ A request of a download and the conversion of its
+    response into rows. """
+    __slots__ = ("id", "call", "rows")
+
+    def __init__(self, id, call, rows):
+        self.id = id
+        self.call = call
+        self.rows = rows
+
+
+def histo_tasks(pairs, period, start, end, **kwargs):
+    """
+    Split ranges of each pair in requests of HISTO_LIMIT
+    candles, ending at fixed timestamps so they're the
+    same between runs.
+    """
+    step = PERIODS[period]
+    end = end // step * step
+    span = HISTO_LIMIT * step
+    pages = (end - start) // span + 1
+
+    def rows_of(fsym, tsym, lower, upper):
+        def rows(response):
+            return [dict(candle, fsym=fsym, tsym=tsym)
+                    for candle in response.get("Data", ())
+                    if lower < candle["time"] <= upper and
+                    (candle["open"] or candle["close"])]
+        return rows
+
+    tasks = []
+    for fsym, tsym in pairs:
+        for page in range(pages):
+            to_ts = end - page * span
+            lower = max(to_ts - span, start - 1)
+            call = ("histo", (period, fsym, tsym),
+                    dict(limit=HISTO_LIMIT, toTs=to_ts, **kwargs))
+            tasks.append(Task("histo:%s:%s:%s:%d" % (period, fsym, tsym, to_ts),
+                              call, rows_of(fsym, tsym, lower, to_ts)))
+    return tasks
+
+
+def price_tasks(pairs, run, **kwargs):
+    """
+    Group pairs in pricemultifull requests of up to
+    PRICE_CHUNK symbols. Rows are stamped with the time
+    they're received as snapshot, ``run`` identifies the
+    tasks of a download.
+    """
+    wanted = set(pairs)
+    tsyms = sorted(set(tsym for _, tsym in pairs))
+    fsyms = sorted(set(fsym for fsym, _ in pairs))
+
+    def rows(response):
+        snapshot = int(time.time())
+        return [dict(entry, fsym=fsym, tsym=tsym, snapshot=snapshot)
+                for fsym, entries in response.get("RAW", {}).items()
+                for tsym, entry in entries.items()
+                if (fsym, tsym) in wanted]
+
+    tasks = []
+    for i in range(0, len(fsyms), PRICE_CHUNK):
+        chunk = fsyms[i:i + PRICE_CHUNK]
+        call = ("price", (chunk, tsyms), dict(full=True, **kwargs))
+        tasks.append(Task("price:%d:%s" % (run, ",".join(chunk)),
+                          call, rows))
+    return tasks
+
+
+def news_row(article):
+    row = dict(article)
+    source = row.get("source_info") or {}
+    row["source"] = row.get("source") or source.get("name")
+    return row
+
+
+""" ###########################################
+    ################  PROGRESS  ###############
+    ###########################################
+"""
+
+class Progress(object):
+    """ Reports progress and throughput of a download.
+
+    :param total: Number of tasks, None if unknown.
+    :type total: int
+
+    :param out: File where reports are written.
+    :type out: file
+
+    :param interval: Seconds between reports, None
+        for only the final report. (optional, default == 5)
+    :type interval: float
+    """
+    def __init__(self, total, out, interval=5):
+        self.total = total
+        self.out = out
+        self.interval = interval
+        self.started = self.reported = time.time()
+        self.tasks = self.rows = self.errors = 0
+
+    def update(self, rows=0, error=False):
+        self.tasks += 1
+        self.rows += rows
+        self.errors += bool(error)
+        now = time.time()
+        if self.interval is not None and now - self.reported >= self.interval:
+            self.reported = now
+            self.report()
+
+    def report(self, final=False):
+        elapsed = max(time.time() - self.started, 1e-9)
+        tasks = "%d" % self.tasks
+        if self.total is not None:
+            tasks += "/%d" % self.total
+        line = ("[%.1fs] %s tasks, %d rows, %.1f rows/s, %.2f req/s, "
+                "%d errors" % (elapsed, tasks, self.rows, self.rows / elapsed,
+                               self.tasks / elapsed, self.errors))
+        if (not final and self.tasks and self.total is not None and
+                self.total > self.tasks):
+            eta = elapsed / self.tasks * (self.total - self.tasks)
+            line += ", eta %ds" % eta
+        self.out.write(line + "\n")
+        self.out.flush()
+
+
+""" ###########################################
+    ##############  DOWNLOADS  ################
+    ###########################################
+"""
+
+def run_tasks(cc, tasks, sink, checkpoint, progress, workers=8, err=None):
+    """
+    Run tasks concurrently writing their rows to ``sink``, tasks
+    are recorded in the checkpoint once their rows are durable.
+    Returns the number of failed tasks.
+    """
+    from .batch import iter_batch
+    pending = []
+    try:
+        for result in iter_batch(cc, [task.call for task in tasks],
+                                 max_workers=workers,
+                                 initial_workers=min(4, workers)):
+            task = tasks[result.index]
+            if not result.ok:
+                progress.update(error=True)
+                if err is not None:
+                    err.write("%s: %s\n" % (task.id, result.error))
+                continue
+            rows = task.rows(result.result)
+            if rows:
+                sink.write(rows)
+            if sink.durable:
+                checkpoint.mark([(task.id, len(rows))])
+            else:
+                pending.append((task.id, len(rows)))
+            progress.update(len(rows))
+    finally:
+        sink.close()
+        if pending:
+            checkpoint.mark(pending)
+    return progress.errors
+
+
+def run_news(cc, sink, checkpoint, progress, start, end, err=None, **kwargs):
+    """
+    Page news backwards from ``end`` to ``start``. News pages
+    depend on the previous one, so they're requested in sequence
+    and the oldest timestamp reached is kept in the checkpoint.
+    """
+    key = "news:%d:%d" % (start, end)
+    to_ts = int(checkpoint.get(key, end))
+    seen = set()
+    try:
+        while to_ts > start:
+            try:
+                articles = cc.news(lTs=to_ts, **kwargs)
+            except Exception as error:
+                progress.update(error=True)
+                if err is not None:
+                    err.write("news:%d: %s\n" % (to_ts, error))
+                return progress.errors
+            if isinstance(articles, dict):
+                articles = articles.get("Data") or []
+            new = [a for a in articles if a["id"] not in seen and
+                   start <= a["published_on"] <= end]
+            seen.update(a["id"] for a in articles)
+            if new:
+                sink.write([news_row(a) for a in new])
+            progress.update(len(new))
+            oldest = min([a["published_on"] for a in articles] or [start])
+            if oldest >= to_ts:
+                oldest = to_ts - 1
+            to_ts = oldest
+            if sink.durable:
+                checkpoint.set(key, to_ts)
+    finally:
+        sink.close()
+        if not sink.durable:
+            checkpoint.set(key, to_ts)
+    return progress.errors
+
+
+def fetch(cc, args, out=None, err=None):
+    """
+    Run a download parsed with ``parser()``.
+    Returns the exit status.
+    """
+    if args.kind == "price" and (args.start is not None or
+                                 args.end is not None):
+        raise ValueError("--start and --end aren't supported by price, "
+                         "snapshots are current quotes")
+    out = sys.stderr if out is None else out
+    now = int(time.time())
+    kwargs = {"e": args.exchange} if args.exchange else {}
+
+    output_format = args.format
+    if output_format is None:
+        ext = os.path.splitext(args.output)[1].lower()
+        output_format = FORMAT_EXTENSIONS.get(ext, "csv")
+    fields = {"histo": HISTO_FIELDS, "price": PRICE_FIELDS,
+              "news": NEWS_FIELDS}[args.kind]
+    checkpoint = Checkpoint(args.checkpoint or args.output + ".checkpoint")
+    try:
+        if args.kind == "news":
+            start, end = checkpoint.time_range("range:news", args.start,
+                                               args.end, 86400, now)
+            if args.feeds:
+                kwargs["feeds"] = args.feeds
+            sink = SINKS[output_format](args.output, args.kind, fields)
+            progress = Progress(None, out, args.progress)
+            errors = run_news(cc, sink, checkpoint, progress, start, end,
+                              err=out, **kwargs)
+            progress.report(final=True)
+            return 1 if errors else 0
+
+        pairs = read_pairs(args.pairs)
+        done = checkpoint.done()
+        if args.kind == "histo":
+            start, end = checkpoint.time_range(
+                "range:histo:%s" % args.period, args.start, args.end,
+                HISTO_LIMIT * PERIODS[args.period], now)
+            tasks = histo_tasks(pairs, args.period, start, end, **kwargs)
+        else:
+            # Resume an unfinished snapshot, else take a new one
+            run = int(checkpoint.get("price:run", now))
+            tasks = price_tasks(pairs, run, **kwargs)
+            if all(task.id in done for task in tasks):
+                run = now
+                tasks = price_tasks(pairs, run, **kwargs)
+            checkpoint.set("price:run", run)
+        remaining = [task for task in tasks if task.id not in done]
+        if len(remaining) < len(tasks):
+            out.write("resuming, %d of %d tasks already done\n"
+                      % (len(tasks) - len(remaining), len(tasks)))
+        progress = Progress(len(remaining), out, args.progress)
+        if not remaining:
+            progress.report(final=True)
+            return 0
+        sink = SINKS[output_format](args.output, args.kind, fields)
+        errors = run_tasks(cc, remaining, sink, checkpoint, progress,
+                           workers=args.workers, err=out)
+        progress.report(final=True)
+        return 1 if errors else 0
+    finally:
+        checkpoint.close()
+
+
+def client_from_args(args):
+    """Build the client of a download."""
+    from .cryptocompare import CryptoCompare
+    from .scheduler import RequestScheduler, DEFAULT_RATES
+    keys = list(args.api_key or [])
+    if not keys and os.environ.get("CRYPTOCOMPARE_API_KEYS"):
+        keys = os.environ["CRYPTOCOMPARE_API_KEYS"].split(",")
+    rates = {bucket: rate * max(1, len(keys))
+             for bucket, rate in DEFAULT_RATES.items()}
+    if args.rate:
+        rates = {bucket: args.rate for bucket in rates}
+    return CryptoCompare(parse_float=float, transport=args.transport,
+                         scheduler=RequestScheduler(rates=rates),
+                         api_keys=keys or None)
+
+
+def parser():
+    """Build the argument parser of the command line."""
+    main = argparse.ArgumentParser(
+        prog="pycryptocompare",
+        description="CryptoCompare API command line tools.")
+    commands = main.add_subparsers(dest="command")
+    commands.required = True
+
+    fetch_ = commands.add_parser(
+        "fetch", help="bulk download of histo, price or news data",
+        description="Download histo ranges, price snapshots or news, "
+                    "resuming from the checkpoint if it exists.")
+    fetch_.add_argument("kind", choices=("histo", "price", "news"))
+    fetch_.add_argument("--pairs", metavar="FILE",
+                        help='file with a pair by line like "BTC/USD", '
+                             '"-" for stdin (required for histo and price)')
+    fetch_.add_argument("-o", "--output", required=True,
+                        help="output file, rows are appended if it exists")
+    fetch_.add_argument("--format", choices=sorted(SINKS),
+                        help="output format, as default guessed "
+                             "from the output extension (csv)")
+    fetch_.add_argument("--period", choices=sorted(PERIODS), default="day",
+                        help="histo period (default: day)")
+    fetch_.add_argument("--start", type=parse_time,
+                        help="UTC timestamp or date like 2018-01-01 "
+                             "(histo and news)")
+    fetch_.add_argument("--end", type=parse_time,
+                        help="UTC timestamp or date (default: now, the "
+                             "end of the first run when resuming)")
+    fetch_.add_argument("-e", "--exchange",
+                        help="exchange (default: CCCAGG)")
+    fetch_.add_argument("--feeds", help="news feeds, comma separated")
+    fetch_.add_argument("-j", "--workers", type=int, default=8,
+                        help="maximum concurrent requests (default: 8)")
+    fetch_.add_argument("--rate", type=float,
+                        help="maximum requests per second, as default "
+                             "the API limits times the number of keys")
+    fetch_.add_argument("--api-key", action="append",
+                        help="API key, can be repeated "
+                             "(default: $CRYPTOCOMPARE_API_KEYS)")
+    fetch_.add_argument("--transport", choices=("requests", "http.client"))
+    fetch_.add_argument("--checkpoint",
+                        help="checkpoint database (default: OUTPUT.checkpoint)")
+    fetch_.add_argument("--progress", type=float, default=5, metavar="SECONDS",
+                        help="seconds between progress reports (default: 5)")
+    return main
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    if args.kind in ("histo", "price") and not args.pairs:
+        parser().error("--pairs is required for %s" % args.kind)
+    try:
+        return fetch(client_from_args(args), args)
+    except ValueError as error:
+        parser().error(str(error))
+    except KeyboardInterrupt:
+        sys.stderr.write("interrupted, run again to resume\n")
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
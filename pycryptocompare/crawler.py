@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Concurrent crawler of social stats.
+
+``SocialStatsCrawler`` requests ``social_stats`` of many coin ids
+(as default every ``Id`` of the coin list) concurrently under the
+rate limits of the client, and stores each response zlib compressed
+in a SQLite database as soon as it arrives. The database is the
+checkpoint: a crawl interrupted at any point resumes with the ids
+not stored yet, and later crawls only request ids whose stats are
+older than ``max_age``.
+"""
+
+import os
+import time
+import zlib
+import sqlite3
+
+ROUTE = "data/socialstats"
+
+
+class SocialStatsCrawler(object):
+    """ Crawls and stores social stats of coins.
+
+    Example:
+        ---------------------------------------
+        >>> crawler = SocialStatsCrawler(cc, "socialstats.db", max_age=86400)
+        >>> crawler.crawl()  # every coin of the coin list
+        {'fetched': 2917, 'fresh': 0, 'errors': 3}
+        >>> crawler.get(1182)["Data"]["Twitter"]["followers"]
+        ---------------------------------------
+
+    :param cc: Client.
+    :type cc: CryptoCompare
+
+    :param path: Path of the database file.
+    :type path: str
+
+    :param max_age: Seconds after which stored stats are
+        requested again. (optional, default == 86400)
+    :type max_age: float
+
+    :param max_workers: Maximum concurrent requests, see
+        ``AdaptiveExecutor``. (optional, default == 16)
+    :type max_workers: int
+    """
+    def __init__(self, cc, path, max_age=86400, max_workers=16):
+        self.cc = cc
+        self.path = os.path.abspath(path)
+        self.max_age = max_age
+        self.max_workers = max_workers
+        self.conn = sqlite3.connect(self.path, timeout=60,
+                                    isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS socialstats ("
+                          "id TEXT PRIMARY KEY, fetched REAL, "
+                          "body BLOB, error TEXT)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM socialstats "
+                                 "WHERE body IS NOT NULL").fetchone()[0]
+
+    def coin_ids(self):
+        """Ids of every coin of the coin list."""
+        return [coin["Id"] for _, coin in
+                self.cc.iter_coin_list(predicate=lambda _, coin: "Id" in coin)]
+
+    def stale(self, ids, now=None):
+        """
+        Ids without stats stored, stored with an error
+        or older than max_age.
+        """
+        now = time.time() if now is None else now
+        fresh = set(row[0] for row in self.conn.execute(
+            "SELECT id FROM socialstats WHERE error IS NULL AND fetched > ?",
+            (now - self.max_age,)))
+        return [i for i in ids if str(i) not in fresh]
+
+    def _fetch(self, id):
+        """Body of a response, raises errors returned by the API."""
+        url = self.cc._url(ROUTE, dict(id=str(id)))
+        text = self.cc._get(ROUTE, url)
+        self.cc._decode(text)
+        return text
+
+    def crawl(self, ids=None, callback=None):
+        """
+        Request stats of stale ids, storing each response
+        when received.
+
+        :param ids: Coin ids, as default every coin of the
+            coin list. (optional, default == None)
+        :type ids: list
+
+        :param callback: Function called with the id and
+            the error (None if succeeded) of each request.
+            (optional, default == None)
+        :type callback: function
+
+        :return: Counters of ids fetched, already fresh
+            and failed.
+        :rtype: dict
+        """
+        from .batch import iter_batch
+        if ids is None:
+            ids = self.coin_ids()
+        ids = list(dict.fromkeys(str(i) for i in ids))
+        pending = self.stale(ids)
+        counters = dict(fetched=0, fresh=len(ids) - len(pending), errors=0)
+        calls = [(self._fetch, (id,)) for id in pending]
+        for result in iter_batch(self.cc, calls, max_workers=self.max_workers):
+            id = pending[result.index]
+            if result.ok:
+                row = (id, time.time(),
+                       zlib.compress(result.result.encode("utf-8")), None)
+                counters["fetched"] += 1
+            else:
+                row = (id, time.time(), None, str(result.error))
+                counters["errors"] += 1
+            with self.conn:
+                if row[2] is None:
+                    # Keep stats previously stored, retried next crawl
+                    self.conn.execute(
+                        "INSERT INTO socialstats VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(id) DO UPDATE SET error = excluded.error",
+                        row)
+                else:
+                    self.conn.execute("INSERT OR REPLACE INTO socialstats "
+                                      "VALUES (?, ?, ?, ?)", row)
+            if callback is not None:
+                callback(id, result.error)
+        return counters
+
+    def get(self, id):
+        """Stored stats of a coin, None if not stored."""
+        row = self.conn.execute("SELECT body FROM socialstats WHERE id = ?",
+                                (str(id),)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return self.cc._decode(zlib.decompress(row[0]).decode("utf-8"))
+
+    def fetched(self, id):
+        """Time when the stats of a coin were stored."""
+        row = self.conn.execute("SELECT fetched FROM socialstats WHERE id = ? "
+                                "AND body IS NOT NULL", (str(id),)).fetchone()
+        return None if row is None else row[0]
+
+    def errors(self):
+        """Errors of the last request of failed ids."""
+        return dict(self.conn.execute("SELECT id, error FROM socialstats "
+                                      "WHERE error IS NOT NULL"))
+
+    def items(self):
+        """Iterate over stored (id, stats)."""
+        for id, body in self.conn.execute("SELECT id, body FROM socialstats "
+                                          "WHERE body IS NOT NULL"):
+            yield id, self.cc._decode(zlib.decompress(body).decode("utf-8"))
+
+    def close(self):
+        self.conn.close()
@@ -8,15 +8,11 @@ try:
 except:
     from urllib.parse import urlencode as _urlencode
 
+import threading
+from functools import partial
 from json import loads as _loads
-from requests import post as _post
-from requests import get as _get
-from requests.exceptions import (ConnectionError, 
-                                ConnectTimeout,
-                                ReadTimeout)
 
-from decimal import Decimal
-from re import sub
+from .transport import get_transport
 
 
 WEB_URL_ROUTES = [
@@ -55,6 +51,54 @@ MAP_ROUTES = {
     "stats/rate/second": "stats/rate/second/limit",
 
 }
+
+# Rate limit bucket ("CallsMade" and "CallsLeft" keys
+# of "stats/rate/<period>" responses) of each route
+RATE_LIMIT_BUCKETS = {
+    "data/pricemulti": "Price",
+    "data/pricemultifull": "Price",
+    "data/generateAvg": "Price",
+    "data/dayAvg": "Price",
+    "data/pricehistorical": "Price",
+    "data/top/pairs": "Price",
+    "data/top/exchanges": "Price",
+    "data/top/volumes": "Price",
+    "data/all/exchanges": "Price",
+    "data/histominute": "Histo",
+    "data/histohour": "Histo",
+    "data/histoday": "Histo",
+    "data/news/providers": "News",
+    "data/news/": "News",
+}
+
+# Route requested by each method of CryptoCompare
+METHOD_ROUTES = {
+    "documentation": "documentation",
+    "server_stats": "stats",
+    "rate_calls": "stats/rate/second",
+    "cache_duration": "documentation",
+    "coin_list": "data/coinlist",
+    "price": "data/pricemulti",
+    "generate_avg": "data/generateAvg",
+    "day_avg": "data/dayAvg",
+    "price_historical": "data/pricehistorical",
+    "social_stats": "data/socialstats",
+    "histo": "data/histominute",
+    "mining_contracts": "data/miningcontracts",
+    "mining_equipment": "data/miningequipment",
+    "top_pairs": "data/top/pairs",
+    "top_exchanges": "data/top/exchanges",
+    "top_volumes": "data/top/volumes",
+    "exchanges": "data/all/exchanges",
+    "news_providers": "data/news/providers",
+    "news": "data/news/",
+}
+
+# Maximum symbols by pricemulti and pricemultifull request
+PRICE_CHUNK = 20
+
+THROTTLE_MESSAGES = ("rate limit", "too many")
+
 class CryptoCompareError(Exception):
     """
     Exception for catch invalid commands and other repsonses
@@ -63,6 +107,33 @@ class CryptoCompareError(Exception):
     def __init__(self, err):
         print(err)
 
+def is_rate_limit_error(err):
+    """
+    Returns True if an exception is a throttling
+    message of the CryptoCompare API.
+    """
+    if not isinstance(err, CryptoCompareError):
+        return False
+    message = str(err).lower()
+    return any(throttle in message for throttle in THROTTLE_MESSAGES)
+
+def _is_throttled(text):
+    """
+    Returns True if a response body is a throttling
+    message. Error messages are short, so bigger bodies
+    aren't decoded.
+    """
+    if len(text) > 2048 or "Error" not in text:
+        return False
+    try:
+        jsonout = _loads(text)
+    except ValueError:
+        return False
+    if not isinstance(jsonout, dict) or jsonout.get("Response") != "Error":
+        return False
+    message = str(jsonout.get("Message", "")).lower()
+    return any(throttle in message for throttle in THROTTLE_MESSAGES)
+
 class CryptoCompare(object):
     """ Main class for retrieve data from coinmarketcap
 
@@ -78,25 +149,87 @@ class CryptoCompare(object):
         (optional, default == 30)
     :type timeout: int
 
+    :param transport: HTTP transport used for requests,
+        "requests" (pooled ``requests.Session``) or
+        "http.client" (standard library with keep-alive,
+        faster startup). An object with a
+        ``get(url, timeout, headers=None)`` method returning
+        the response body can be passed too.
+        (optional, default == "requests")
+    :type transport: str or object
+
+    :param cache: Cache for responses, like
+        ``cache.MemoryCache``, ``cache.SQLiteCache``
+        (shared by processes in the same host) or
+        ``refresh.RefreshAheadCache``.
+        (optional, default == None)
+    :type cache: object
+
+    :param scheduler: Scheduler of requests between priority
+        classes sharing rate limits, like
+        ``scheduler.RequestScheduler``. (optional, default == None)
+    :type scheduler: object
+
+    :param api_keys: API key, list of keys or ``keys.KeyPool``.
+        Each request uses the key with more calls left in its
+        rate limit bucket, throttled keys are rotated away.
+        Rate stats of the keys are refreshed by the client.
+        (optional, default == None)
+    :type api_keys: str, list or object
+
+    Instances are thread-safe, a client can be shared by every
+    thread of a worker pool: requests don't take client locks,
+    transports pool connections between threads and caches
+    read without locking.
+
     :return: CryptoCompare object
     :rtype: <class 'cryptocompare.CryptoCompare'>
     """
 
-    def __init__(self, parse_float=Decimal, 
-                 parse_int=int, timeout=30):
+    def __init__(self, parse_float=None, 
+                 parse_int=int, timeout=30,
+                 transport=None, cache=None, scheduler=None,
+                 api_keys=None):
         self.api_url = "https://min-api.cryptocompare.com/"
         self.web_url = "https://www.cryptocompare.com/api/"
+        if parse_float is None:
+            from decimal import Decimal as parse_float
         self.parse_float = parse_float
         self.parse_int = parse_int
         self.timeout = timeout
-
-    def __call__(self, route, args={}):
+        self.transport = get_transport(transport)
+        self.cache = cache
+        if hasattr(cache, "bind"):
+            cache.bind(self)
+        self.scheduler = scheduler
+        if api_keys is not None and not hasattr(api_keys, "choose"):
+            from .keys import KeyPool
+            api_keys = KeyPool(api_keys)
+        self.keys = api_keys
+        self._doc_index = None
+        self._doc_lock = threading.Lock()
+
+    def __call__(self, route, args=None):
         """
         Main Api Function
         - raises 'cryptocompare.CryptoCompareError' if the <route> is not valid, or
             if an error is returned from Cryptocompare API
         - returns decoded json api message
         """
+        url = self._url(route, args or {})
+
+        if self.cache is None:
+            return self._decode(self._get(route, url))
+
+        # Caches keep the loader to refresh entries, it mustn't
+        # hold decoded responses
+        text = self.cache.fetch(route, url, partial(self._load, route, url))
+        return self._decode(text)
+
+    def _url(self, route, args):
+        """
+        Internal function for build the url of a request.
+        """
         if route in API_URL_ROUTES:
             url = self.api_url
             if route in MAP_ROUTES:
@@ -106,11 +239,119 @@ class CryptoCompare(object):
         elif route in WEB_URL_ROUTES:
             url = self.web_url + route
         else:
-            raise CryptoCompareError("Invalid Command!: %s" % command)
+            raise CryptoCompareError("Invalid Command!: %s" % route)
+        return url + "?" + _urlencode(args)
+
+    def _get(self, route, url):
+        """
+        Internal function for retrieve the body of a response.
+        """
+        bucket = RATE_LIMIT_BUCKETS.get(route)
+        if self.keys is None:
+            if self.scheduler is not None:
+                self.scheduler.acquire(bucket)
+            return self.transport.get(url, timeout=self.timeout)
+
+        self.keys.poll(self)
+        # Retry throttled requests with the other keys,
+        # each retry takes a token of the scheduler too
+        tried = []
+        while True:
+            if self.scheduler is not None:
+                self.scheduler.acquire(bucket)
+            key = self.keys.choose(bucket, exclude=tried)
+            text = self.transport.get(url, timeout=self.timeout,
+                                      headers=self.keys.headers(key))
+            if not _is_throttled(text):
+                if route.startswith("stats/rate/"):
+                    # Stats of the key sending the request
+                    self._update_key(key, route, text)
+                return text
+            self.keys.throttle(key)
+            tried.append(key)
+            if len(tried) >= len(self.keys):
+                return text
+
+    def _update_key(self, key, route, text):
+        """
+        Internal function for update the quota of an API key
+        from a rate stats response.
+        """
+        try:
+            stats = _loads(text)
+        except ValueError:
+            return
+        if isinstance(stats, dict):
+            self.keys.update(key, stats, route.split("/")[-1])
+
+    def _load(self, route, url):
+        """
+        Internal function for retrieve the body of a response
+        to be cached.
+        - raises 'cryptocompare.CryptoCompareError' if an error
+            is returned from Cryptocompare API
+        """
+        text = self._get(route, url)
+        # Error messages mention it, other bodies aren't decoded
+        if "Error" in text:
+            jsonout = _loads(text)
+            if (isinstance(jsonout, dict) and "Response" in jsonout and
+                    jsonout["Response"] != "Success"):
+                raise CryptoCompareError(jsonout["Message"])
+        return text
 
-        ret = _get(url + "?" + _urlencode(args), timeout=self.timeout)
+    def _stream(self, route, args, path, predicate=None, keys=None):
+        """
+        Internal function for iterate over the entries of the
+        object at ``path`` of a response while it's downloaded.
+        Streamed responses aren't cached.
+        """
+        from .stream import iter_items
+        url = self._url(route, args)
+        if self.scheduler is not None:
+            self.scheduler.acquire(RATE_LIMIT_BUCKETS.get(route))
+        headers = None
+        if self.keys is not None:
+            key = self.keys.choose(RATE_LIMIT_BUCKETS.get(route))
+            headers = self.keys.headers(key)
+        chunks = self.transport.stream(url, timeout=self.timeout,
+                                       headers=headers)
+        return iter_items(chunks, path, predicate=predicate, keys=keys,
+                          parse_float=self.parse_float,
+                          parse_int=self.parse_int)
+
+    def priority(self, priority="normal", timeout=None):
+        """
+        Context manager for set the priority class of requests
+        made by the current thread. Requires a scheduler.
+
+        Example call:
+            ---------------------------------------
+            >>> cc = CryptoCompare(scheduler=RequestScheduler())
+            >>> with cc.priority("interactive", timeout=2):
+            ...     cc.price("BTC", "USD")
+            ---------------------------------------
 
-        jsonout = _loads(ret.text, 
+        :param priority: Priority class, "interactive",
+            "normal" or "bulk". (optional, default == "normal")
+        :type priority: str
+
+        :param timeout: Seconds after which queued requests are
+            dropped raising 'scheduler.DeadlineExceeded'.
+            (optional, default == None)
+        :type timeout: float
+        """
+        if self.scheduler is None:
+            raise ValueError("priority requires a scheduler")
+        return self.scheduler.priority(priority, timeout)
+
+    def _decode(self, text):
+        """
+        Internal function for decode a response body.
+        - raises 'cryptocompare.CryptoCompareError' if an error
+            is returned from Cryptocompare API
+        """
+        jsonout = _loads(text, 
                          parse_float=self.parse_float,
                          parse_int=self.parse_int)
 
@@ -126,9 +367,10 @@ class CryptoCompare(object):
         ###########################################
     """
 
-    def documentation(self, func=None):
+    def documentation(self, func=None, refresh=False):
         """
-        Get API documentation
+        Get API documentation. It's downloaded once
+        and reused by next calls, see documentation_index.
         
         Example call:
             ---------------------------------------
@@ -145,43 +387,53 @@ class CryptoCompare(object):
             format Endpoints of the min-api.
             (optional, defaul == None)
         :type func: function
+
+        :param refresh: Download again the documentation.
+            (optional, default == False)
+        :type refresh: bool
         """
-        response = self.__call__("documentation")
+        index = self.documentation_index(refresh=refresh)
         if not func:
-            return response
-        else:
-            response = response["AvailableCalls"]
-            if func == self.price:
-                response = response["Price"]
-                response = dict(Single=response["Single"],
-                                Multi=response["Multi"],
-                                MultiFull=response["MultiFull"])
-            elif func == self.generate_avg:
-                response = response["Price"]["GenerateAvg"]
-            elif func == self.day_avg:
-                response = response["Price"]["DayAvg"]
-            elif func == self.price_historical:
-                response = response["Price"]["PriceHistorical"]
-            elif func == self.histo:
-                response = dict(HistoDay=response["HistoDay"],
-                                HistoHour=response["HistoHour"],
-                                HistoMinute=response["HistoMinute"])
-            elif func == self.top_pairs:
-                response = response["TopPairs"]
-            elif func == self.top_exchanges:
-                response = response["TopExchanges"]
-            elif func == self.top_volumes:
-                response = response["TopVolumes"]
-            elif func == self.exchanges:
-                response = response["AllExchanges"]
-            elif func == self.news_providers:
-                response = response["AllNewsProviders"]
-            elif func == self.news:
-                response = response["News"]
-            else:
-                msg = "%s method doesn't appears in API documentation"
-                raise ValueError(msg % func.__name__)
-        return response
+            return index.documentation
+        return index.entry(func)
+
+    def documentation_index(self, refresh=False):
+        """
+        Get the API documentation indexed by method name
+        (AvailableCalls entry, cache duration and parameters).
+        Downloaded on first use and memoized.
+
+        :param refresh: Download again the documentation.
+            (optional, default == False)
+        :type refresh: bool
+
+        :rtype: <class 'documentation.DocumentationIndex'>
+        """
+        index = self._doc_index
+        if index is not None and not refresh:
+            return index
+        # Threads missing the index at once download it once
+        with self._doc_lock:
+            if self._doc_index is None or (refresh and self._doc_index is index):
+                from .documentation import DocumentationIndex
+                self._doc_index = DocumentationIndex(self.__call__("documentation"))
+            return self._doc_index
+
+    def save_documentation(self, path):
+        """
+        Write the API documentation to a JSON file,
+        for load it later with load_documentation.
+        """
+        self.documentation_index().save(path)
+
+    def load_documentation(self, path):
+        """
+        Load the API documentation from a file written
+        by save_documentation, so it's not downloaded.
+        """
+        from .documentation import DocumentationIndex
+        self._doc_index = DocumentationIndex.load(
+            path, parse_float=self.parse_float, parse_int=self.parse_int)
 
     def server_stats(self):
         """
@@ -235,12 +487,7 @@ class CryptoCompare(object):
         :param func: Method to retrieve cache duration
         :type func: function
         """
-        doc = self.documentation(func=func)
-        if func == self.price:
-            response = doc["Single"]["Info"]["CacheDuration"]
-        else:
-            response = doc["Info"]["CacheDuration"]
-        return self.parse_int(sub(r"\D", "", response))
+        return self.parse_int(self.documentation_index().cache_duration(func))
 
 
     """ ###########################################
@@ -314,6 +561,39 @@ class CryptoCompare(object):
         
         return data
 
+    def iter_coin_list(self, predicate=None, coins=None):
+        """
+        Iterate over general information about all the coins,
+        parsing the response while it's downloaded, so memory
+        doesn't depend on the number of coins.
+
+        Example call:
+            ---------------------------------------
+            >>> cc = CryptoCompare()
+            >>> for symbol, coin in cc.iter_coin_list(
+            ...         lambda symbol, coin: coin["ProofType"] == "PoS"):
+            ...     print(symbol, coin["CoinName"])
+            ---------------------------------------
+
+        Endpoint:
+            https://www.cryptocompare.com/api/data/coinlist
+
+        :param predicate: Function receiving symbol and coin
+            information, only coins for which it returns True
+            are yielded. (optional, default == None)
+        :type predicate: function
+
+        :param coins: Coin symbols to retrieve, the rest
+            are skipped without being decoded.
+            (optional, default == None)
+        :type coins: list
+
+        :return: Generator of (symbol, information) tuples.
+        :rtype: generator
+        """
+        return self._stream("data/coinlist", {}, ("Data",),
+                            predicate=predicate, keys=coins)
+
     def price(self, fsyms, tsyms, e=None, 
               extraParams=None, sign=False,
               tryConversion=True, full=False):
@@ -730,6 +1010,34 @@ class CryptoCompare(object):
         """
         return self.__call__("data/miningequipment")
 
+    def iter_mining_contracts(self, predicate=None):
+        """
+        Iterate over mining contracts, parsing the response
+        while it's downloaded. See iter_coin_list.
+
+        Endpoint:
+            https://www.cryptocompare.com/api/data/miningcontracts/
+
+        :return: Generator of (id, contract) tuples.
+        :rtype: generator
+        """
+        return self._stream("data/miningcontracts", {}, ("MiningData",),
+                            predicate=predicate)
+
+    def iter_mining_equipment(self, predicate=None):
+        """
+        Iterate over mining equipment, parsing the response
+        while it's downloaded. See iter_coin_list.
+
+        Endpoint:
+            https://www.cryptocompare.com/api/data/miningequipment/
+
+        :return: Generator of (id, equipment) tuples.
+        :rtype: generator
+        """
+        return self._stream("data/miningequipment", {}, ("MiningData",),
+                            predicate=predicate)
+
     def top_pairs(self, fsym, tsym=None, limit="5", **kwargs):
         """
         Get top pairs by volume for a currency 
@@ -828,6 +1136,27 @@ class CryptoCompare(object):
         args = dict(**kwargs)
         return self.__call__("data/all/exchanges", args)
 
+    def iter_exchanges(self, predicate=None, exchanges=None, **kwargs):
+        """
+        Iterate over exchanges that CryptoCompare has integrated
+        with and their pairs, parsing the response while it's
+        downloaded. See iter_coin_list.
+
+        Endpoint:
+            https://min-api.cryptocompare.com/data/all/exchanges
+
+        :param exchanges: Exchange names to retrieve, the rest
+            are skipped without being decoded.
+            (optional, default == None)
+        :type exchanges: list
+
+        :return: Generator of (exchange, pairs) tuples, where pairs
+            is a dict of from symbol -> list of to symbols.
+        :rtype: generator
+        """
+        return self._stream("data/all/exchanges", dict(**kwargs), (),
+                            predicate=predicate, keys=exchanges)
+
     def news_providers(self, **kwargs):
         """
         Returns all the news providers that CryptoCompare 
@@ -872,4 +1201,50 @@ class CryptoCompare(object):
         if lang:
             args["lang"] = lang
 
-        return self.__call__("data/news/", args)
\ No newline at end of file
+        return self.__call__("data/news/", args)
+
+    """ ###########################################
+        #############  BATCH METHODS  #############
+        ###########################################
+    """
+
+    def batch(self, calls, ordered=True, **kwargs):
+        """
+        Execute many calls concurrently over the connection
+        pool of the client, adapting concurrency to rate limits
+        (see executor.AdaptiveExecutor). Errors don't stop
+        the batch, they're returned by item.
+
+        Example call:
+            ---------------------------------------
+            >>> cc = CryptoCompare()
+            >>> results = cc.batch([
+            ...     ("top_pairs", ("BTC",), {"limit": 10}),
+            ...     ("social_stats", (1182,)),
+            ...     (cc.day_avg, ("ETH", "USD")),
+            ... ])
+            >>> [r.result for r in results if r.ok]
+            ---------------------------------------
+
+        :param calls: Invocations as tuples (method, args, kwargs),
+            where method is a name or a method of the client, args
+            and kwargs are optional. See batch.Call.
+        :type calls: list
+
+        :param ordered: If True, returns a list of results in
+            input order. Otherwise returns a generator yielding
+            results as they complete. (optional, default == True)
+        :type ordered: bool
+
+        :param **kwargs: Passed to executor.AdaptiveExecutor
+            (like max_workers), or an executor to use as
+            executor keyword.
+
+        :return: batch.BatchResult objects, with index, call,
+            result and error attributes.
+        :rtype: list or generator
+        """
+        from .batch import batch, iter_batch
+        if ordered:
+            return batch(self, calls, **kwargs)
+        return iter_batch(self, calls, **kwargs)
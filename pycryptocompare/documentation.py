@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Index of the min-api documentation by client method.
+
+The documentation is downloaded and parsed once, then each
+method name maps to its ``AvailableCalls`` entry, its server
+cache duration and its parameters. Indexes can be saved to
+a file and loaded later for offline use.
+"""
+
+import json
+from decimal import Decimal
+from urllib.parse import urlsplit, parse_qsl
+
+# Path in "AvailableCalls" of each method, methods documented
+# by several endpoints map to a dict of paths
+DOC_PATHS = {
+    "price": {"Single": ("Price", "Single"),
+              "Multi": ("Price", "Multi"),
+              "MultiFull": ("Price", "MultiFull")},
+    "generate_avg": ("Price", "GenerateAvg"),
+    "day_avg": ("Price", "DayAvg"),
+    "price_historical": ("Price", "PriceHistorical"),
+    "histo": {"HistoDay": ("HistoDay",),
+              "HistoHour": ("HistoHour",),
+              "HistoMinute": ("HistoMinute",)},
+    "top_pairs": ("TopPairs",),
+    "top_exchanges": ("TopExchanges",),
+    "top_volumes": ("TopVolumes",),
+    "exchanges": ("AllExchanges",),
+    "news_providers": ("AllNewsProviders",),
+    "news": ("News",),
+}
+
+# Endpoint used for cache duration and parameters
+# of methods documented by several endpoints
+MAIN_ENDPOINTS = {
+    "price": "Single",
+    "histo": "HistoMinute",
+}
+
+
+def _lookup(calls, path):
+    for key in path:
+        calls = calls[key]
+    return calls
+
+
+def _parse_duration(text):
+    digits = "".join(c for c in str(text) if c.isdigit())
+    return int(digits) if digits else None
+
+
+def _parameters(entry):
+    """
+    Parameters schema of an endpoint entry: documented ``Parameters``
+    if present, otherwise the query parameters of its example url.
+    """
+    info = entry.get("Info", {})
+    params = info.get("Parameters")
+    if isinstance(params, dict):
+        return dict(params)
+    if isinstance(params, list):
+        return {p["name"]: p for p in params
+                if isinstance(p, dict) and "name" in p}
+    for value in entry.values():
+        if isinstance(value, str) and value.startswith("http"):
+            query = urlsplit(value).query
+            return {name: {"example": example}
+                    for name, example in parse_qsl(query)}
+    return {}
+
+
+def _encode(value):
+    """JSON text of a decoded response, Decimal objects as numbers."""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, dict):
+        return "{%s}" % ", ".join("%s: %s" % (json.dumps(str(key)), _encode(item))
+                                  for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return "[%s]" % ", ".join(_encode(item) for item in value)
+    return json.dumps(value, default=str)
+
+
+class DocumentationIndex(object):
+    """ Documentation of the API indexed by method name.
+
+    :param documentation: Decoded response of the
+        "documentation" route.
+    :type documentation: dict
+    """
+    def __init__(self, documentation):
+        self.documentation = documentation
+        self.entries = {}
+        self.cache_durations = {}
+        self.parameters = {}
+
+        calls = documentation.get("AvailableCalls", {})
+        for name, path in DOC_PATHS.items():
+            try:
+                if isinstance(path, dict):
+                    entry = {k: _lookup(calls, p) for k, p in path.items()}
+                    main = entry[MAIN_ENDPOINTS[name]]
+                else:
+                    entry = main = _lookup(calls, path)
+            except (KeyError, TypeError):
+                continue
+            self.entries[name] = entry
+            duration = main.get("Info", {}).get("CacheDuration")
+            self.cache_durations[name] = _parse_duration(duration)
+            self.parameters[name] = _parameters(main)
+
+    @staticmethod
+    def method_name(func):
+        """Name of a method passed as function or string."""
+        return func if isinstance(func, str) else func.__name__
+
+    def __contains__(self, func):
+        return self.method_name(func) in self.entries
+
+    def _get(self, mapping, func):
+        name = self.method_name(func)
+        try:
+            return mapping[name]
+        except KeyError:
+            msg = "%s method doesn't appears in API documentation"
+            raise ValueError(msg % name)
+
+    def entry(self, func):
+        """AvailableCalls entry of a method."""
+        return self._get(self.entries, func)
+
+    def cache_duration(self, func):
+        """
+        Server cache duration in seconds of a method.
+        - raises 'ValueError' if it's not documented.
+        """
+        duration = self._get(self.cache_durations, func)
+        if duration is None:
+            msg = "%s method hasn't a cache duration in API documentation"
+            raise ValueError(msg % self.method_name(func))
+        return duration
+
+    def parameters_of(self, func):
+        """Parameters schema of a method."""
+        return self._get(self.parameters, func)
+
+    def save(self, path):
+        """Write the documentation to a JSON file."""
+        with open(path, "w") as f:
+            f.write(_encode(self.documentation))
+
+    @classmethod
+    def load(cls, path, parse_float=None, parse_int=None):
+        """Build an index from a file written by ``save``."""
+        with open(path) as f:
+            return cls(json.load(f, parse_float=parse_float,
+                                 parse_int=parse_int))
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Executor for running many CryptoCompare calls concurrently with
+a number of in-flight requests tuned automatically (AIMD): it grows
+by one each round trip while latency and ``CallsLeft`` (from the
+``stats/rate/second`` endpoint) are healthy, and it's halved on
+throttling messages, latency spikes or when the calls left in a
+rate limit bucket run out. Latency is compared with a baseline by
+method, so mixes of fast and slow methods aren't taken as spikes.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .cryptocompare import (METHOD_ROUTES, RATE_LIMIT_BUCKETS,
+                            is_rate_limit_error)
+
+# Calls faster than this (cache hits) don't reach the server,
+# they don't tell anything about congestion
+MIN_LATENCY = 0.001
+
+
+class AdaptiveExecutor(object):
+    """ Thread pool with adaptive concurrency for client calls.
+
+    Example:
+        ---------------------------------------
+        >>> cc = CryptoCompare()
+        >>> with AdaptiveExecutor(cc) as executor:
+        ...     futures = [executor.submit(cc.histo, "hour", fsym, "USD")
+        ...                for fsym in ("BTC", "ETH", "LTC")]
+        ...     results = [f.result() for f in futures]
+        ---------------------------------------
+
+    :param cc: Client used to retrieve rate limit stats.
+    :type cc: CryptoCompare
+
+    :param min_workers: Minimum concurrent requests.
+        (optional, default == 1)
+    :type min_workers: int
+
+    :param max_workers: Maximum concurrent requests.
+        (optional, default == 32)
+    :type max_workers: int
+
+    :param initial_workers: Concurrent requests at start.
+        (optional, default == 4)
+    :type initial_workers: int
+
+    :param latency_target: Latency in seconds above which
+        concurrency is reduced. As default, ``latency_factor``
+        times the lowest latency observed for the same method.
+        Time spent queued by the client scheduler isn't counted.
+        (optional, default == None)
+    :type latency_target: float
+
+    :param latency_factor: See latency_target.
+        (optional, default == 3)
+    :type latency_factor: float
+
+    :param backoff: Factor applied to concurrency when reduced.
+        (optional, default == 0.5)
+    :type backoff: float
+
+    :param stats_interval: Seconds between polls of rate limit
+        stats, None disables them. (optional, default == 1)
+    :type stats_interval: float
+
+    :param min_calls_left: Calls left in a rate limit bucket
+        under which new requests of that bucket wait for the
+        next second. (optional, default == 1)
+    :type min_calls_left: int
+    """
+    def __init__(self, cc, min_workers=1, max_workers=32, initial_workers=4,
+                 latency_target=None, latency_factor=3, backoff=0.5,
+                 stats_interval=1, min_calls_left=1):
+        self.cc = cc
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.latency_target = latency_target
+        self.latency_factor = latency_factor
+        self.backoff = backoff
+        self.stats_interval = stats_interval
+        self.min_calls_left = min_calls_left
+
+        self._pool = ThreadPoolExecutor(max_workers)
+        self._cond = threading.Condition()
+        self._limit = float(max(min_workers, min(initial_workers, max_workers)))
+        self._in_flight = 0
+        self._latency = None
+        self._min_latency = {}
+        self._last_decrease = 0.0
+
+        self._calls_left = {}
+        self._calls_since_stats = {}
+        self._stats_time = 0.0
+        self._stats_running = False
+
+        self.counters = dict(completed=0, errors=0, throttled=0,
+                             decreases=0)
+
+    @property
+    def limit(self):
+        """Current number of allowed concurrent requests."""
+        return int(max(self.min_workers, min(self.max_workers, self._limit)))
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Schedule ``fn(*args, **kwargs)``, returns a
+        ``concurrent.futures.Future``.
+        """
+        return self._pool.submit(self._run, fn, args, kwargs)
+
+    def map(self, fn, *iterables):
+        """
+        Like builtin map, running calls concurrently.
+        Results are yielded in input order.
+        """
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        for future in futures:
+            yield future.result()
+
+    def bucket(self, fn):
+        """
+        Rate limit bucket of a client method ("Price", "Histo",
+        "News") or None for calls not rate limited.
+        """
+        name = getattr(fn, "__name__", None)
+        return RATE_LIMIT_BUCKETS.get(METHOD_ROUTES.get(name))
+
+    def _run(self, fn, args, kwargs):
+        bucket = self.bucket(fn)
+        with self._cond:
+            while (self._in_flight >= self.limit or
+                   not self._has_headroom(bucket)):
+                self._cond.wait(0.05)
+            self._in_flight += 1
+            if bucket is not None:
+                self._calls_since_stats[bucket] = \
+                    self._calls_since_stats.get(bucket, 0) + 1
+
+        start, error = time.time(), None
+        try:
+            return fn(*args, **kwargs)
+        except Exception as err:
+            error = err
+            raise
+        finally:
+            end = time.time()
+            # Time queued by the scheduler is local, not congestion
+            scheduler = getattr(self.cc, "scheduler", None)
+            granted = scheduler.granted() if scheduler is not None else None
+            if granted is not None and granted > start:
+                start = granted
+            with self._cond:
+                self._in_flight -= 1
+                self._feedback(getattr(fn, "__name__", None),
+                               end - start, error)
+                self._cond.notify_all()
+            self._refresh_stats()
+
+    def _has_headroom(self, bucket):
+        if bucket not in self._calls_left:
+            return True
+        if time.time() - self._stats_time >= 1:
+            # Per second limits have been restored
+            return True
+        left = self._calls_left[bucket] - self._calls_since_stats.get(bucket, 0)
+        return left > self.min_calls_left
+
+    def _feedback(self, method, latency, error):
+        if error is not None:
+            self.counters["errors"] += 1
+            if is_rate_limit_error(error):
+                self.counters["throttled"] += 1
+                self._decrease()
+            return
+
+        self.counters["completed"] += 1
+        if latency < MIN_LATENCY:
+            return
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency += 0.2 * (latency - self._latency)
+        lowest = self._min_latency.get(method)
+        if lowest is None or latency < lowest:
+            lowest = self._min_latency[method] = latency
+
+        target = self.latency_target
+        if target is None:
+            target = lowest * self.latency_factor
+        if latency > target and latency > 0.01:
+            self._decrease()
+        else:
+            # Additive increase, about one more request per round trip
+            self._limit = min(self.max_workers,
+                              self._limit + 1.0 / max(1.0, self._limit))
+
+    def _decrease(self):
+        # Only once per round trip, so a burst of slow or throttled
+        # responses caused by the same congestion counts once
+        now = time.time()
+        if now - self._last_decrease < (self._latency or 0.1):
+            return
+        self._last_decrease = now
+        self._limit = max(self.min_workers, self._limit * self.backoff)
+        self.counters["decreases"] += 1
+
+    def _refresh_stats(self):
+        if self.stats_interval is None:
+            return
+        with self._cond:
+            if (self._stats_running or
+                    time.time() - self._stats_time < self.stats_interval):
+                return
+            self._stats_running = True
+        try:
+            stats = self.cc.rate_calls("second")
+        except Exception:
+            stats = None
+        with self._cond:
+            self._stats_running = False
+            self._stats_time = time.time()
+            used = set(self._calls_since_stats)
+            self._calls_since_stats.clear()
+            calls_left = (stats or {}).get("CallsLeft") or {}
+            self._calls_left = {k: int(v) for k, v in calls_left.items()}
+            if any(self._calls_left.get(bucket, self.min_calls_left + 1)
+                   <= self.min_calls_left for bucket in used):
+                self._decrease()
+            self._cond.notify_all()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Export of histo and price snapshots to Apache Arrow.
+
+Histo ``Data`` and pricemultifull ``RAW`` blocks are decoded into
+numpy columns and wrapped as Arrow record batches without copying
+them again. Batches can be written by chunks to Parquet or Arrow IPC
+files, or serialized to an in-memory Arrow buffer that in-process
+consumers read without copies. Requires numpy and pyarrow.
+"""
+
+from .series import np, require_numpy, candles_to_columns, HistoSeries, FIELDS
+
+# Numeric fields of pricemultifull RAW entries
+RAW_FIELDS = (
+    "PRICE", "LASTUPDATE", "LASTVOLUME", "LASTVOLUMETO", "VOLUMEDAY",
+    "VOLUMEDAYTO", "VOLUME24HOUR", "VOLUME24HOURTO", "OPENDAY", "HIGHDAY",
+    "LOWDAY", "OPEN24HOUR", "HIGH24HOUR", "LOW24HOUR", "CHANGE24HOUR",
+    "CHANGEPCT24HOUR", "SUPPLY", "MKTCAP",
+)
+
+# String fields of pricemultifull RAW entries
+RAW_STRING_FIELDS = ("MARKET", "LASTMARKET")
+
+
+def _pyarrow():
+    require_numpy()
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("pyarrow is required for this feature, "
+                          "install it with 'pip install pyarrow'")
+    return pyarrow
+
+
+def _constant(pa, value, length):
+    """Dictionary encoded column repeating ``value``."""
+    indices = pa.array(np.zeros(length, dtype=np.int32))
+    return pa.DictionaryArray.from_arrays(indices, pa.array([value]))
+
+
+def histo_record_batch(histo, fsym=None, tsym=None):
+    """
+    Build a record batch from histo candles. Columns of a
+    ``HistoSeries`` are wrapped without copies; "time" is
+    exposed as a timestamp in seconds.
+
+    :param histo: Histo response, list of candles or series.
+    :type histo: dict, list or HistoSeries
+
+    :param fsym: From symbol, added as a column if passed.
+        (optional, default == None)
+    :type fsym: str
+
+    :param tsym: To symbol, added as a column if passed.
+        (optional, default == None)
+    :type tsym: str
+
+    :rtype: pyarrow.RecordBatch
+    """
+    pa = _pyarrow()
+    if isinstance(histo, HistoSeries):
+        columns = {field: histo[field] for field in FIELDS}
+    else:
+        columns = candles_to_columns(histo)
+    length = len(columns["time"])
+    times = np.ascontiguousarray(columns["time"], dtype=np.int64)
+    arrays = [pa.Array.from_buffers(pa.timestamp("s"), length,
+                                    [None, pa.py_buffer(times)])]
+    names = ["time"]
+    for field in FIELDS[1:]:
+        arrays.append(pa.array(np.ascontiguousarray(columns[field])))
+        names.append(field)
+    for name, value in (("fsym", fsym), ("tsym", tsym)):
+        if value is not None:
+            arrays.append(_constant(pa, value, length))
+            names.append(name)
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def price_record_batch(response, timestamp=None):
+    """
+    Build a record batch from the RAW block of a pricemultifull
+    response (``CryptoCompare.price(..., full=True)``), one row
+    by pair.
+
+    :param response: pricemultifull response or its RAW block.
+    :type response: dict
+
+    :param timestamp: Time of the snapshot, added as a
+        "snapshot" column if passed. (optional, default == None)
+    :type timestamp: int
+
+    :rtype: pyarrow.RecordBatch
+    """
+    pa = _pyarrow()
+    raw = response.get("RAW", response)
+    entries = [(fsym, tsym, entry)
+               for fsym, tsyms in raw.items()
+               for tsym, entry in tsyms.items()]
+    length = len(entries)
+    arrays = [pa.array([e[0] for e in entries], pa.string()).dictionary_encode(),
+              pa.array([e[1] for e in entries], pa.string()).dictionary_encode()]
+    names = ["fsym", "tsym"]
+    if timestamp is not None:
+        times = np.full(length, int(timestamp), dtype=np.int64)
+        arrays.append(pa.Array.from_buffers(pa.timestamp("s"), length,
+                                            [None, pa.py_buffer(times)]))
+        names.append("snapshot")
+    for field in RAW_FIELDS:
+        values = np.fromiter((e[2].get(field, np.nan) for e in entries),
+                             dtype=np.float64, count=length)
+        arrays.append(pa.array(values))
+        names.append(field)
+    for field in RAW_STRING_FIELDS:
+        arrays.append(pa.array([e[2].get(field) for e in entries],
+                               pa.string()).dictionary_encode())
+        names.append(field)
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+class ArrowWriter(object):
+    """ Writes record batches by chunks to a Parquet or Arrow IPC
+    file. Batches are buffered until ``chunk_rows`` rows, so each
+    Parquet row group or IPC batch has a reasonable size.
+
+    Example:
+        ---------------------------------------
+        >>> with ArrowWriter("histo.parquet") as writer:
+        ...     for fsym in ("BTC", "ETH"):
+        ...         histo = cc.histo("hour", fsym, "USD", limit=2000)
+        ...         writer.write(histo_record_batch(histo, fsym, "USD"))
+        ---------------------------------------
+
+    :param path: Path of the file.
+    :type path: str
+
+    :param format: "parquet" or "ipc", as default guessed from
+        the extension (".arrow", ".ipc" and ".feather" are IPC).
+        (optional, default == None)
+    :type format: str
+
+    :param chunk_rows: Rows written at once.
+        (optional, default == 65536)
+    :type chunk_rows: int
+
+    :param compression: Compression codec of Parquet files.
+        (optional, default == "snappy")
+    :type compression: str
+    """
+    def __init__(self, path, format=None, chunk_rows=65536,
+                 compression="snappy"):
+        self.pa = _pyarrow()
+        if format is None:
+            ipc = path.rsplit(".", 1)[-1].lower() in ("arrow", "ipc", "feather")
+            format = "ipc" if ipc else "parquet"
+        if format not in ("parquet", "ipc"):
+            msg = '%s is not a valid format, please select: "parquet" or "ipc"'
+            raise ValueError(msg % format)
+        self.path = path
+        self.format = format
+        self.chunk_rows = chunk_rows
+        self.compression = compression
+        self.rows = 0
+        self._writer = None
+        self._pending = []
+        self._pending_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open(self, schema):
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self.path, schema,
+                                            compression=self.compression)
+        else:
+            self._writer = self.pa.ipc.new_file(self.path, schema)
+
+    def write(self, batch):
+        """Buffer a record batch, writing a chunk if it's full."""
+        if not batch.num_rows:
+            return
+        self._pending.append(batch)
+        self._pending_rows += batch.num_rows
+        if self._pending_rows >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """Write buffered batches."""
+        if not self._pending:
+            return
+        pa = self.pa
+        table = pa.Table.from_batches(self._pending)
+        if self.format == "ipc":
+            # IPC files hold a single dictionary by field, so
+            # dictionaries changing between chunks are decoded
+            schema = pa.schema([
+                field.with_type(field.type.value_type)
+                if pa.types.is_dictionary(field.type) else field
+                for field in table.schema])
+            table = table.cast(schema)
+        if self._writer is None:
+            self._open(table.schema)
+        if self.format == "parquet":
+            self._writer.write_table(table, row_group_size=len(table))
+        else:
+            self._writer.write_table(table, max_chunksize=len(table))
+        self.rows += len(table)
+        self._pending, self._pending_rows = [], 0
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def to_buffer(batches):
+    """
+    Serialize record batches to an in-memory Arrow IPC stream.
+    Consumers read it without copies with ``read_buffer``.
+
+    :rtype: pyarrow.Buffer
+    """
+    pa = _pyarrow()
+    batches = list(batches)
+    sink = pa.BufferOutputStream()
+    if batches:
+        with pa.ipc.new_stream(sink, batches[0].schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+    return sink.getvalue()
+
+
+def read_buffer(buffer):
+    """
+    Read record batches from a buffer written by ``to_buffer``,
+    columns reference the buffer memory (zero-copy).
+
+    :rtype: pyarrow.Table
+    """
+    pa = _pyarrow()
+    return pa.ipc.open_stream(buffer).read_all()
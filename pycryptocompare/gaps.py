@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Gap detection and targeted repair of histo series.
+
+Histo responses may lack some timestamps or contain zero filled
+candles (no volume) when data wasn't available. ``find_gaps`` scans
+the times of a series for missing steps and runs of zero volume
+candles, ``repair_calls`` covers them with the minimal number of
+histo requests (tight ``toTs`` and ``limit``) and ``repair`` merges
+the responses into the series, leaving the rest untouched.
+Requires numpy.
+"""
+
+from collections import namedtuple
+
+from .series import np, require_numpy, candles_to_columns, HistoSeries
+
+# Maximum candles returned by a histo request
+MAX_LIMIT = 2000
+
+MISSING = "missing"
+ZERO = "zero"
+
+
+class Gap(namedtuple("Gap", ("start", "end", "kind"))):
+    """ Times from ``start`` to ``end`` (both included) of
+    missing or zero filled candles. """
+    def count(self, step):
+        """Number of candles of the gap."""
+        return (self.end - self.start) // step + 1
+
+
+class HistoCall(namedtuple("HistoCall", ("toTs", "limit"))):
+    """ Histo request covering ``limit + 1`` candles up to
+    ``toTs``. """
+    def start(self, step):
+        return self.toTs - self.limit * step
+
+
+Repair = namedtuple("Repair", ("gaps", "calls", "remaining"))
+
+
+def _runs(mask):
+    """Start and end (excluded) indexes of runs of True in mask."""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return edges[::2], edges[1::2]
+
+
+def find_gaps(series, step=None, start=None, end=None, min_zero_run=3):
+    """
+    Find missing candles and runs of zero volume candles.
+
+    Example call:
+        ---------------------------------------
+        >>> series = HistoSeries.from_response(cc.histo("hour", "BTC", "USD",
+        ...                                             limit=2000), "hour")
+        >>> find_gaps(series)
+        [Gap(start=1514782800, end=1514790000, kind='missing')]
+        ---------------------------------------
+
+    :param series: Series, histo response, list of candles
+        or dict of columns.
+    :type series: HistoSeries, dict or list
+
+    :param step: Seconds between candles, required if
+        series isn't a HistoSeries. (optional, default == None)
+    :type step: int
+
+    :param start: Time of the first expected candle, missing
+        candles before the series are reported too.
+        (optional, default == None)
+    :type start: int
+
+    :param end: Time of the last expected candle, see start.
+        (optional, default == None)
+    :type end: int
+
+    :param min_zero_run: Minimum consecutive zero volume
+        candles reported, None disables them.
+        (optional, default == 3)
+    :type min_zero_run: int
+
+    :return: Gaps sorted by time.
+    :rtype: list
+    """
+    require_numpy()
+    if isinstance(series, HistoSeries):
+        step = step or series.step
+        columns = series
+    else:
+        columns = candles_to_columns(series)
+    if not step:
+        raise ValueError("step is required for series of candles")
+    times = columns["time"]
+    gaps = []
+
+    if len(times):
+        if start is not None and times[0] > start:
+            gaps.append(Gap(int(start), int(times[0]) - step, MISSING))
+        holes = np.flatnonzero(np.diff(times) > step)
+        for i in holes.tolist():
+            gaps.append(Gap(int(times[i]) + step, int(times[i + 1]) - step,
+                            MISSING))
+        if end is not None and times[-1] < end:
+            gaps.append(Gap(int(times[-1]) + step, int(end), MISSING))
+    elif start is not None and end is not None and start <= end:
+        gaps.append(Gap(int(start), int(end), MISSING))
+
+    if min_zero_run and len(times):
+        zero = (columns["volumefrom"] == 0) & (columns["volumeto"] == 0)
+        firsts, lasts = _runs(zero)
+        for first, last in zip(firsts.tolist(), lasts.tolist()):
+            if last - first >= min_zero_run:
+                gaps.append(Gap(int(times[first]), int(times[last - 1]), ZERO))
+
+    gaps.sort()
+    return gaps
+
+
+def repair_calls(gaps, step, max_limit=MAX_LIMIT):
+    """
+    Minimal histo requests covering the gaps. Consecutive gaps
+    are fetched together while they fit in ``max_limit + 1``
+    candles, each request is as short as possible.
+
+    :rtype: list
+    """
+    calls = []
+    first = last = None
+    for gap in sorted(gaps):
+        if first is not None and gap.end - first <= max_limit * step:
+            last = max(last, gap.end)
+            continue
+        if first is not None:
+            calls.append(HistoCall(last, (last - first) // step))
+        first, last = gap.start, gap.end
+        # Gaps longer than a request are split
+        while last - first > max_limit * step:
+            calls.append(HistoCall(first + max_limit * step, max_limit))
+            first += (max_limit + 1) * step
+    if first is not None:
+        calls.append(HistoCall(last, (last - first) // step))
+    return calls
+
+
+def repair(cc, series, fsym, tsym, start=None, end=None, min_zero_run=3,
+           max_limit=MAX_LIMIT, concurrent=True, **kwargs):
+    """
+    Detect gaps of a series and request only the affected
+    windows, merging the candles received into the series.
+
+    Example call:
+        ---------------------------------------
+        >>> repaired = repair(cc, series, "BTC", "USD")
+        >>> repaired.remaining  # gaps not filled by the API
+        ---------------------------------------
+
+    :param cc: Client.
+    :type cc: CryptoCompare
+
+    :param series: Series to repair.
+    :type series: HistoSeries
+
+    :param fsym: From symbol
+    :type fsym: str
+
+    :param tsym: To symbol
+    :type tsym: str
+
+    :param concurrent: Run requests as a batch, see
+        ``CryptoCompare.batch``. (optional, default == True)
+    :type concurrent: bool
+
+    :param **kwargs: Other params of histo method, like e.
+
+    See ``find_gaps`` for other params.
+
+    :return: Gaps found, requests made and gaps remaining.
+    :rtype: Repair
+
+    - raises 'cryptocompare.CryptoCompareError' if a
+        request returns an error.
+    """
+    step = series.step
+    gaps = find_gaps(series, start=start, end=end, min_zero_run=min_zero_run)
+    calls = repair_calls(gaps, step, max_limit=max_limit)
+    args = [("histo", (series.period, fsym, tsym),
+             dict(kwargs, aggregate=series.aggregate, toTs=call.toTs,
+                  limit=max(call.limit, 1)))
+            for call in calls]
+    if concurrent and len(args) > 1:
+        results = cc.batch(args)
+        for result in results:
+            if not result.ok:
+                raise result.error
+        responses = [result.result for result in results]
+    else:
+        responses = [getattr(cc, method)(*a, **kw) for method, a, kw in args]
+
+    for call, response in zip(calls, responses):
+        candles = [candle for candle in response.get("Data", ())
+                   if call.start(step) <= candle["time"] <= call.toTs]
+        if candles:
+            series.update(candles)
+    remaining = find_gaps(series, start=start, end=end,
+                          min_zero_run=min_zero_run)
+    return Repair(gaps, calls, remaining)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pool of API keys with per key quota tracking.
+
+Each request is sent with the key that has more calls left in its
+rate limit bucket, counting calls made in the last second and in the
+hour locally and ``CallsMade``/``CallsLeft`` reported by the rate
+stats endpoints, which are polled by the client every
+``refresh_interval`` seconds and read from ``rate_calls`` responses.
+Keys that receive a throttling message are put aside for a while.
+"""
+
+import time
+import threading
+from collections import deque
+
+from .scheduler import DEFAULT_RATES
+
+
+class ApiKey(object):
+    """ State of an API key.
+
+    :param key: The API key.
+    :type key: str
+    """
+    def __init__(self, key):
+        self.key = key
+        self.calls_made = {}
+        self.calls_left = {}
+        self.limits = {}
+        self.hour_left = {}
+        self.throttled_until = 0.0
+        self.sent = {}
+
+    def __repr__(self):
+        return "<ApiKey %s...>" % self.key[:6]
+
+    def recent(self, bucket, now):
+        """Requests sent with this key in the last second."""
+        sent = self.sent.setdefault(bucket, deque())
+        while sent and sent[0] <= now - 1:
+            sent.popleft()
+        return len(sent)
+
+    def headroom(self, bucket, now):
+        """Calls that still can be made this second."""
+        if self.hour_left.get(bucket, 1) <= 0:
+            return 0
+        limit = self.limits.get(bucket, DEFAULT_RATES.get(bucket, 1))
+        return limit - self.recent(bucket, now)
+
+
+class KeyPool(object):
+    """ Pool of API keys used by a client.
+
+    Example:
+        ---------------------------------------
+        >>> cc = CryptoCompare(api_keys=["key1", "key2", "key3"])
+        >>> cc.price("BTC", "USD")
+        >>> cc.keys.stats()
+        ---------------------------------------
+
+    :param keys: API keys.
+    :type keys: list
+
+    :param cooldown: Seconds a key isn't used after
+        receiving a throttling message. (optional, default == 1)
+    :type cooldown: float
+
+    :param refresh_interval: Seconds between refreshes of rate
+        stats of every key, made by the client before a request,
+        None disables them. (optional, default == 60)
+    :type refresh_interval: float
+    """
+    def __init__(self, keys, cooldown=1, refresh_interval=60):
+        if isinstance(keys, str):
+            keys = [keys]
+        self.keys = [ApiKey(key) for key in keys]
+        if not self.keys:
+            raise ValueError("at least one API key is required")
+        self.cooldown = cooldown
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refreshed = 0.0
+        self._refreshing = False
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def headers(key):
+        """Headers authenticating a request with a key."""
+        return {"authorization": "Apikey %s" % key.key}
+
+    def choose(self, bucket, exclude=()):
+        """
+        Returns the key with most headroom for ``bucket`` and
+        counts a request for it. Throttled keys are only chosen
+        if every key is throttled.
+        """
+        with self._lock:
+            now = time.time()
+            candidates = [k for k in self.keys if k not in exclude] or self.keys
+            available = [k for k in candidates if k.throttled_until <= now]
+            if available:
+                key = max(available, key=lambda k: k.headroom(bucket, now))
+            else:
+                key = min(candidates, key=lambda k: k.throttled_until)
+            if bucket is not None:
+                key.recent(bucket, now)
+                key.sent[bucket].append(now)
+                if bucket in key.hour_left:
+                    key.hour_left[bucket] -= 1
+            return key
+
+    def throttle(self, key):
+        """Put aside a key that received a throttling message."""
+        with self._lock:
+            key.throttled_until = time.time() + self.cooldown
+
+    def update(self, key, stats, period="second"):
+        """
+        Update the quota of a key from a "stats/rate/<period>"
+        response (CallsMade and CallsLeft by bucket).
+        """
+        made = stats.get("CallsMade") or {}
+        left = stats.get("CallsLeft") or {}
+        with self._lock:
+            if period == "hour":
+                key.hour_left.update({b: int(v) for b, v in left.items()})
+                return
+            now = time.time()
+            for bucket in set(made) | set(left):
+                made_ = int(made.get(bucket, 0))
+                left_ = int(left.get(bucket, 0))
+                key.calls_made[bucket] = made_
+                key.calls_left[bucket] = left_
+                key.limits[bucket] = made_ + left_
+                # Align local count with calls reported by the server
+                sent = key.sent.setdefault(bucket, deque())
+                key.recent(bucket, now)
+                while len(sent) < made_:
+                    sent.appendleft(now)
+                while len(sent) > made_:
+                    sent.popleft()
+
+    def refresh(self, cc, periods=("second", "hour")):
+        """
+        Retrieve rate stats of every key with the client ``cc``.
+        """
+        for key in self.keys:
+            for period in periods:
+                url = cc._url("stats/rate/" + period, {})
+                text = cc.transport.get(url, timeout=cc.timeout,
+                                        headers=self.headers(key))
+                self.update(key, cc._decode(text), period)
+        with self._lock:
+            self._refreshed = time.time()
+
+    def poll(self, cc):
+        """
+        Refresh rate stats with the client ``cc`` if
+        ``refresh_interval`` seconds passed since the last
+        refresh. Only a thread refreshes them, errors are
+        ignored and local counts are used meanwhile.
+        """
+        if self.refresh_interval is None:
+            return
+        with self._lock:
+            if (self._refreshing or
+                    time.time() - self._refreshed < self.refresh_interval):
+                return
+            self._refreshing = True
+        try:
+            self.refresh(cc)
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._refreshed = time.time()
+
+    def stats(self):
+        """
+        Returns CallsMade and CallsLeft by key and bucket,
+        as last reported by the server.
+        """
+        with self._lock:
+            return {key.key: {"CallsMade": dict(key.calls_made),
+                              "CallsLeft": dict(key.calls_left)}
+                    for key in self.keys}
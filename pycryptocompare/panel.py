@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Aligned histo candles of many pairs.
+
+``fetch_panel`` requests the candles of many (fsym, tsym) pairs
+concurrently and aligns them on the union (or intersection) of their
+times, as 2-D arrays by field with a row per time and a column per
+pair. Alignment is made with numpy on the columns of each response,
+missing candles are NaN and flagged in ``mask``. Requires numpy.
+"""
+
+from .series import np, require_numpy, candles_to_columns, HistoSeries, FIELDS
+from .batch import split_batch_kwargs
+
+
+class Panel(object):
+    """ Candles of many pairs aligned by time.
+
+    Example:
+        ---------------------------------------
+        >>> panel = fetch_panel(cc, [("BTC", "USD"), ("ETH", "USD")],
+        ...                     "hour", limit=500)
+        >>> panel["close"][:, panel.index("ETH", "USD")]
+        >>> panel.mask.all(axis=1)  # times with every pair
+        ---------------------------------------
+
+    :param time: Sorted times of the rows.
+    :type time: numpy.ndarray
+
+    :param pairs: Pairs of the columns.
+    :type pairs: list
+
+    :param values: 2-D array by field.
+    :type values: dict
+
+    :param mask: True where a pair has a candle.
+    :type mask: numpy.ndarray
+
+    :param errors: Exception by pair not retrieved.
+        (optional, default == None)
+    :type errors: dict
+    """
+    def __init__(self, time, pairs, values, mask, errors=None):
+        self.time = time
+        self.pairs = list(pairs)
+        self.values = values
+        self.mask = mask
+        self.errors = errors or {}
+        self._index = dict((pair, i) for i, pair in enumerate(self.pairs))
+
+    @classmethod
+    def from_columns(cls, columns, fields=FIELDS[1:], how="outer",
+                     errors=None):
+        """
+        Align columns (dicts of arrays, histo responses,
+        lists of candles or series) by pair.
+
+        :param columns: Columns by pair.
+        :type columns: dict
+
+        :param fields: Fields of the panel.
+            (optional, default == FIELDS[1:])
+        :type fields: tuple
+
+        :param how: "outer" keeps every time, "inner" only times
+            of candles of every pair. (optional, default == "outer")
+        :type how: str
+        """
+        require_numpy()
+        if how not in ("outer", "inner"):
+            msg = '%s is not a valid join, please select: "outer" or "inner"'
+            raise ValueError(msg % how)
+        pairs = list(columns)
+        columns = [c if isinstance(c, HistoSeries) else candles_to_columns(c)
+                   for c in columns.values()]
+        times = [np.asarray(c["time"], dtype=np.int64) for c in columns]
+        if not times:
+            time = np.empty(0, dtype=np.int64)
+        elif how == "outer":
+            time = np.unique(np.concatenate(times))
+        else:
+            time = times[0]
+            for other in times[1:]:
+                time = np.intersect1d(time, other, assume_unique=True)
+
+        shape = (len(time), len(pairs))
+        mask = np.zeros(shape, dtype=bool)
+        values = dict((field, np.full(shape, np.nan)) for field in fields)
+        for j, (column, times_) in enumerate(zip(columns, times)):
+            rows = np.searchsorted(time, times_)
+            found = rows < len(time)
+            found[found] = time[rows[found]] == times_[found]
+            rows = rows[found]
+            mask[rows, j] = True
+            for field in fields:
+                values[field][rows, j] = np.asarray(column[field])[found]
+        return cls(time, pairs, values, mask, errors)
+
+    def __getitem__(self, field):
+        return self.values[field]
+
+    def __len__(self):
+        return len(self.time)
+
+    @property
+    def fields(self):
+        return list(self.values)
+
+    def index(self, fsym, tsym):
+        """Column of a pair."""
+        return self._index[(fsym, tsym)]
+
+    def pair(self, fsym, tsym):
+        """Dict of 1-D arrays (with "time") of a pair."""
+        j = self.index(fsym, tsym)
+        columns = dict((field, values[:, j])
+                       for field, values in self.values.items())
+        columns["time"] = self.time
+        return columns
+
+
+def fetch_panel(cc, pairs, period="day", limit=None, toTs=None,
+                aggregate=1, fields=FIELDS[1:], how="outer",
+                raise_errors=True, **kwargs):
+    """
+    Retrieve histo candles of many pairs concurrently and align
+    them in a ``Panel``. Requests run as a batch (see
+    ``CryptoCompare.batch``).
+
+    Example call:
+        ---------------------------------------
+        >>> pairs = [(fsym, "USD") for fsym in ("BTC", "ETH", "LTC")]
+        >>> panel = fetch_panel(cc, pairs, "day", limit=365)
+        >>> panel["close"].shape
+        (366, 3)
+        ---------------------------------------
+
+    :param cc: Client.
+    :type cc: CryptoCompare
+
+    :param pairs: (fsym, tsym) tuples.
+    :type pairs: list
+
+    :param raise_errors: Raise the first error of a pair, else
+        the pair is left empty and its error is stored in
+        ``Panel.errors``. (optional, default == True)
+    :type raise_errors: bool
+
+    :param **kwargs: Other params of histo method, like e,
+        and params of the batch executor, like max_workers.
+
+    See ``CryptoCompare.histo`` and ``Panel.from_columns``
+    for other params.
+
+    :rtype: Panel
+    """
+    require_numpy()
+    histo_kwargs = dict(aggregate=aggregate)
+    if limit is not None:
+        histo_kwargs["limit"] = limit
+    if toTs is not None:
+        histo_kwargs["toTs"] = toTs
+    batch_kwargs = split_batch_kwargs(kwargs)
+    histo_kwargs.update(kwargs)
+
+    pairs = [tuple(pair) for pair in pairs]
+    calls = [("histo", (period, fsym, tsym), histo_kwargs)
+             for fsym, tsym in pairs]
+    columns, errors = {}, {}
+    for result in cc.batch(calls, **batch_kwargs):
+        pair = pairs[result.index]
+        if result.ok:
+            columns[pair] = candles_to_columns(result.result)
+        elif raise_errors:
+            raise result.error
+        else:
+            errors[pair] = result.error
+            columns[pair] = candles_to_columns([])
+    return Panel.from_columns(columns, fields=fields, how=how, errors=errors)
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Valuation of many portfolios at once.
+
+``Holdings`` keeps the quantities of many portfolios as a matrix
+(a row per portfolio and a column per symbol), so valuing every
+portfolio is a matrix product with a price vector (current prices)
+or a price matrix (a row per time, historical prices). Quotes of
+every symbol are retrieved once, with pricemulti requests of
+PRICE_CHUNK symbols or a histo series by symbol, run as a batch.
+
+As default quantities and prices are floats. With ``exact=True``
+they're ``decimal.Decimal`` objects and values are summed with
+decimal arithmetic (in the current decimal context), for accounting.
+Requires numpy.
+"""
+
+from decimal import Decimal
+from collections import namedtuple
+
+from .series import np, require_numpy
+from .batch import split_batch_kwargs
+from .panel import fetch_panel
+from .cryptocompare import PRICE_CHUNK
+
+
+class Valuation(namedtuple("Valuation", ("portfolios", "values", "prices",
+                                         "errors"))):
+    """ Values of portfolios, prices of symbols and errors
+    by symbol not retrieved. Values of portfolios holding a
+    symbol without price are NaN (None if exact). """
+    def as_dict(self):
+        """Values by portfolio."""
+        return dict(zip(self.portfolios, self.values.tolist()))
+
+
+class ValuationHistory(namedtuple("ValuationHistory", ("time", "portfolios",
+                                                       "values", "prices",
+                                                       "errors"))):
+    """ Values of portfolios (a row per time, a column per
+    portfolio), prices of symbols (a row per time, a column
+    per symbol) and errors by symbol not retrieved. """
+    def portfolio(self, portfolio):
+        """Values of a portfolio by time."""
+        return self.values[:, self.portfolios.index(portfolio)]
+
+
+def _decimal(value):
+    if value is None or isinstance(value, Decimal):
+        return value
+    if isinstance(value, (float, np.floating)):
+        # Shortest repr, the decimal number parsed as the float
+        return None if value != value else Decimal(repr(float(value)))
+    if isinstance(value, np.integer):
+        return Decimal(int(value))
+    return Decimal(value)
+
+
+def _decimals(values):
+    values = np.asarray(values, dtype=object)
+    if not values.size:
+        return values
+    return np.vectorize(_decimal, otypes=[object])(values)
+
+
+class Holdings(object):
+    """ Quantities of symbols held by portfolios.
+
+    Example:
+        ---------------------------------------
+        >>> holdings = Holdings.from_dict({"alice": {"BTC": 0.5, "ETH": 10},
+        ...                                "bob": {"ETH": 2, "USD": 100}})
+        >>> value_portfolios(cc, holdings, "USD").as_dict()
+        {'alice': 3250.12, 'bob': 640.25}
+        ---------------------------------------
+
+    :param portfolios: Portfolio ids of the rows.
+    :type portfolios: list
+
+    :param symbols: Symbols of the columns.
+    :type symbols: list
+
+    :param quantities: 2-D array (portfolios x symbols).
+    :type quantities: numpy.ndarray
+
+    :param exact: Store quantities as Decimal objects.
+        (optional, default == False)
+    :type exact: bool
+    """
+    def __init__(self, portfolios, symbols, quantities, exact=False):
+        require_numpy()
+        self.portfolios = list(portfolios)
+        self.symbols = list(symbols)
+        self.exact = exact
+        if exact:
+            quantities = _decimals(quantities)
+        else:
+            quantities = np.asarray(quantities, dtype=np.float64)
+        shape = (len(self.portfolios), len(self.symbols))
+        if quantities.shape != shape:
+            raise ValueError("quantities shape %s doesn't match %d portfolios "
+                             "and %d symbols" % ((quantities.shape,) + shape))
+        self.quantities = quantities
+        self._index = dict((p, i) for i, p in enumerate(self.portfolios))
+
+    @classmethod
+    def from_records(cls, portfolios, symbols, quantities, exact=False):
+        """
+        Build holdings from parallel arrays of (portfolio,
+        symbol, quantity), quantities of repeated pairs are
+        added.
+
+        Example call:
+            ---------------------------------------
+            >>> holdings = Holdings.from_records([1, 1, 2], ["BTC", "ETH", "BTC"],
+            ...                                  [0.5, 10, 1.25])
+            ---------------------------------------
+        """
+        require_numpy()
+        portfolio_ids, rows = np.unique(np.asarray(portfolios),
+                                        return_inverse=True)
+        symbol_ids, columns = np.unique(np.asarray(symbols),
+                                        return_inverse=True)
+        shape = (len(portfolio_ids), len(symbol_ids))
+        if exact:
+            matrix = np.full(shape, Decimal(0), dtype=object)
+            np.add.at(matrix, (rows, columns), _decimals(quantities))
+        else:
+            matrix = np.zeros(shape)
+            np.add.at(matrix, (rows, columns),
+                      np.asarray(quantities, dtype=np.float64))
+        return cls(portfolio_ids.tolist(), symbol_ids.tolist(), matrix, exact)
+
+    @classmethod
+    def from_dict(cls, holdings, exact=False):
+        """Build holdings from quantities by symbol by portfolio."""
+        records = [(portfolio, symbol, quantity)
+                   for portfolio, quantities in holdings.items()
+                   for symbol, quantity in quantities.items()]
+        portfolios, symbols, quantities = zip(*records) if records else ((),) * 3
+        return cls.from_records(list(portfolios), list(symbols),
+                                list(quantities), exact=exact)
+
+    def __len__(self):
+        return len(self.portfolios)
+
+    def index(self, portfolio):
+        """Row of a portfolio."""
+        return self._index[portfolio]
+
+    def _missing(self, prices):
+        """Portfolios holding symbols without price, by row of prices."""
+        if not self.exact:
+            unknown = np.isnan(prices)
+        elif prices.size:
+            unknown = np.vectorize(lambda p: p is None, otypes=[bool])(prices)
+        else:
+            unknown = np.zeros(prices.shape, dtype=bool)
+        held = (self.quantities != 0).astype(np.int64)
+        missing = np.dot(unknown.astype(np.int64), held.T) > 0
+        return missing, unknown
+
+    def value(self, prices):
+        """
+        Values of every portfolio.
+
+        :param prices: Prices by symbol, in ``symbols`` order.
+        :type prices: numpy.ndarray
+
+        :rtype: numpy.ndarray
+        """
+        return self.value_series(np.asarray(prices)[np.newaxis])[0]
+
+    def value_series(self, prices):
+        """
+        Values of every portfolio at many times.
+
+        :param prices: 2-D array (times x symbols).
+        :type prices: numpy.ndarray
+
+        :return: 2-D array (times x portfolios).
+        :rtype: numpy.ndarray
+        """
+        if self.exact:
+            prices = _decimals(prices)
+        else:
+            prices = np.asarray(prices, dtype=np.float64)
+        if prices.ndim != 2 or prices.shape[1] != len(self.symbols):
+            raise ValueError("prices must have a column by symbol")
+        missing, unknown = self._missing(prices)
+        if self.exact:
+            known = prices.copy()
+            known[unknown] = Decimal(0)
+            values = np.dot(known, self.quantities.T)
+            if not self.symbols:
+                values = np.full(values.shape, Decimal(0), dtype=object)
+            values[missing] = None
+        else:
+            values = np.dot(np.where(unknown, 0.0, prices), self.quantities.T)
+            values[missing] = np.nan
+        return values
+
+
+def fetch_prices(cc, symbols, tsym, exact=False, **kwargs):
+    """
+    Retrieve current prices of many symbols in ``tsym``, with
+    a pricemulti request by PRICE_CHUNK symbols. Requests run as
+    a batch (see ``CryptoCompare.batch``).
+
+    :param cc: Client.
+    :type cc: CryptoCompare
+
+    :param symbols: From symbols.
+    :type symbols: list
+
+    :param tsym: To symbol.
+    :type tsym: str
+
+    :param exact: Return Decimal objects, None for missing
+        prices. (optional, default == False)
+    :type exact: bool
+
+    :param **kwargs: Params of the batch executor, like
+        max_workers, and other params of price method, like e.
+
+    :return: Prices in ``symbols`` order (NaN if missing)
+        and errors by symbol.
+    :rtype: tuple
+    """
+    require_numpy()
+    batch_kwargs = split_batch_kwargs(kwargs)
+    symbols = list(symbols)
+    quoted = [s for s in dict.fromkeys(symbols) if s != tsym]
+    chunks = [quoted[i:i + PRICE_CHUNK]
+              for i in range(0, len(quoted), PRICE_CHUNK)]
+    calls = [("price", (chunk, tsym), kwargs) for chunk in chunks]
+
+    quotes, errors = {tsym: 1}, {}
+    for result in cc.batch(calls, **batch_kwargs):
+        if not result.ok:
+            for symbol in chunks[result.index]:
+                errors[symbol] = result.error
+            continue
+        for symbol, entries in result.result.items():
+            if tsym in entries:
+                quotes[symbol] = entries[tsym]
+    if exact:
+        return _decimals([quotes.get(s) for s in symbols]), errors
+    prices = np.array([quotes.get(s, np.nan) for s in symbols],
+                      dtype=np.float64)
+    return prices, errors
+
+
+def fetch_price_history(cc, symbols, tsym, period="day", limit=30, toTs=None,
+                        exact=False, **kwargs):
+    """
+    Retrieve close prices of many symbols in ``tsym``, a histo
+    series by symbol aligned on their times (see ``fetch_panel``).
+    Missing and zero closes take the last known close, NaN
+    (None if exact) before the first one.
+
+    :param period: Histo period. (optional, default == "day")
+    :type period: str
+
+    :param limit: Candles by symbol. (optional, default == 30)
+    :type limit: int
+
+    :param toTs: Time of the last candle, as default
+        the current one. (optional, default == None)
+    :type toTs: int
+
+    See ``fetch_prices`` for other params. Exact prices are
+    the decimal numbers parsed as the closes floats.
+
+    :return: Times, 2-D array of prices (times x symbols)
+        and errors by symbol.
+    :rtype: tuple
+    """
+    symbols = list(symbols)
+    quoted = [s for s in dict.fromkeys(symbols) if s != tsym]
+    panel = fetch_panel(cc, [(s, tsym) for s in quoted], period, limit=limit,
+                        toTs=toTs, fields=("close",), raise_errors=False,
+                        **kwargs)
+    close = panel["close"]
+    close[close == 0] = np.nan
+    # Forward fill each column from the last known row
+    rows = np.where(np.isnan(close), 0, np.arange(len(close))[:, np.newaxis])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = close[rows, np.arange(close.shape[1])]
+
+    prices = np.ones((len(panel.time), len(symbols)))
+    for j, symbol in enumerate(symbols):
+        if symbol != tsym:
+            prices[:, j] = filled[:, panel.index(symbol, tsym)]
+    errors = dict((fsym, error) for (fsym, _), error in panel.errors.items())
+    if exact:
+        prices = _decimals(prices)
+    return panel.time, prices, errors
+
+
+def value_portfolios(cc, holdings, tsym="USD", **kwargs):
+    """
+    Value every portfolio at current prices, retrieved once
+    for all of them.
+
+    Example call:
+        ---------------------------------------
+        >>> holdings = Holdings.from_records(ids, symbols, quantities)
+        >>> valuation = value_portfolios(cc, holdings, "EUR", max_workers=8)
+        >>> valuation.values[holdings.index(42)]
+        ---------------------------------------
+
+    :param holdings: Quantities of the portfolios.
+    :type holdings: Holdings
+
+    See ``fetch_prices`` for other params.
+
+    :rtype: Valuation
+    """
+    prices, errors = fetch_prices(cc, holdings.symbols, tsym,
+                                  exact=holdings.exact, **kwargs)
+    return Valuation(holdings.portfolios, holdings.value(prices),
+                     prices, errors)
+
+
+def value_history(cc, holdings, tsym="USD", period="day", limit=30, toTs=None,
+                  **kwargs):
+    """
+    Value every portfolio at each close of a histo range,
+    with a histo request by symbol.
+
+    Example call:
+        ---------------------------------------
+        >>> history = value_history(cc, holdings, "USD", "day", limit=365)
+        >>> history.portfolio(42)  # values of the last 366 days
+        ---------------------------------------
+
+    :param holdings: Quantities of the portfolios.
+    :type holdings: Holdings
+
+    See ``fetch_price_history`` for other params.
+
+    :rtype: ValuationHistory
+    """
+    time, prices, errors = fetch_price_history(
+        cc, holdings.symbols, tsym, period, limit=limit, toTs=toTs,
+        exact=holdings.exact, **kwargs)
+    return ValuationHistory(time, holdings.portfolios,
+                            holdings.value_series(prices), prices, errors)
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Leaderboards maintained locally.
+
+A ``Leaderboard`` keeps items sorted by value in a sorted index and
+reports only rank changes of its top positions after each update,
+with a bounded history of positions by item. ``RankingTracker``
+keeps the leaderboards of ``top_volumes``, ``top_pairs`` and
+``top_exchanges``: they're loaded from a full poll, then updated
+from pricemultifull volumes of the ranked items (volumes and pairs)
+and fully polled again each ``resync`` seconds to discover newcomers.
+"""
+
+import time
+from bisect import bisect_left
+from collections import namedtuple, deque, OrderedDict
+
+from .cryptocompare import PRICE_CHUNK
+
+
+class RankChange(namedtuple("RankChange", ("name", "old", "new", "value"))):
+    """ Change of position (1 based) of an item, ``old`` is None
+    when it enters the top and ``new`` when it leaves it. """
+
+
+class Leaderboard(object):
+    """ Items sorted by value, greater values first.
+
+    Example:
+        ---------------------------------------
+        >>> board = Leaderboard(size=3)
+        >>> board.update({"BTC": 30, "ETH": 20, "LTC": 10})
+        >>> board.update({"LTC": 25})
+        [RankChange(name='LTC', old=3, new=2, value=25),
+         RankChange(name='ETH', old=2, new=3, value=20)]
+        ---------------------------------------
+
+    :param size: Positions whose changes are reported, None
+        for every item. (optional, default == None)
+    :type size: int
+
+    :param history: Positions kept by item.
+        (optional, default == 100)
+    :type history: int
+
+    :param max_names: Items whose history is kept, the least
+        recently ranked are forgotten first.
+        (optional, default == 10000)
+    :type max_names: int
+    """
+    def __init__(self, size=None, history=100, max_names=10000):
+        self.size = size
+        self.history_size = history
+        self.max_names = max_names
+        self.listeners = []
+        self.history = OrderedDict()
+        self._index = []
+        self._values = {}
+        self._top = []
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, name):
+        return name in self._values
+
+    def value(self, name):
+        return self._values.get(name)
+
+    def rank(self, name):
+        """Current position (1 based) of an item, None if absent."""
+        value = self._values.get(name)
+        if value is None:
+            return None
+        return bisect_left(self._index, (-value, name)) + 1
+
+    def top(self, n=None):
+        """First ``n`` (name, value) items, as default ``size``."""
+        n = self.size if n is None else n
+        return [(name, -key) for key, name in self._index[:n]]
+
+    def update(self, values, now=None):
+        """
+        Set values of items, None removes an item.
+        Listeners are called with the changes.
+
+        :param values: Values by item name.
+        :type values: dict
+
+        :return: Rank changes of the top positions.
+        :rtype: list
+        """
+        index = self._index
+        low, high = len(index), -1
+        for name, value in values.items():
+            if value != value:  # NaN
+                value = None
+            old = self._values.get(name)
+            if old == value:
+                continue
+            # Only items between the old and new positions move,
+            # additions and removals move every item after them
+            if old is not None:
+                position = bisect_left(index, (-old, name))
+                del index[position]
+                low, high = min(low, position), max(high, position)
+                if value is None:
+                    high = max(high, len(index))
+                    del self._values[name]
+                    continue
+            else:
+                high = max(high, len(index))
+            self._values[name] = value
+            key = (-value, name)
+            position = bisect_left(index, key)
+            index.insert(position, key)
+            low, high = min(low, position), max(high, position)
+
+        size = len(index) if self.size is None else self.size
+        old_high = min(high, len(self._top) - 1)
+        new_high = min(high, size - 1)
+        if low > max(old_high, new_high):
+            return []
+        old_window = self._top[low:old_high + 1]
+        new_window = [name for _, name in index[low:new_high + 1]]
+        self._top[low:old_high + 1] = new_window
+
+        now = time.time() if now is None else now
+        changes = []
+        old_ranks = dict((name, low + i + 1) for i, name in enumerate(old_window))
+        new_ranks = set(new_window)
+        for i, name in enumerate(new_window):
+            if old_ranks.get(name) != low + i + 1:
+                changes.append(RankChange(name, old_ranks.get(name), low + i + 1,
+                                          self._values[name]))
+        for name, rank in old_ranks.items():
+            if name not in new_ranks:
+                changes.append(RankChange(name, rank, None,
+                                          self._values.get(name)))
+        for change in changes:
+            self._record(change, now)
+        if changes:
+            for listener in self.listeners:
+                listener(changes)
+        return changes
+
+    def _record(self, change, now):
+        positions = self.history.pop(change.name, None)
+        if positions is None:
+            positions = deque(maxlen=self.history_size)
+        positions.append((now, change.new))
+        self.history[change.name] = positions
+        while len(self.history) > self.max_names:
+            self.history.popitem(last=False)
+
+
+class _Source(object):
+    """ A tracked leaderboard and how its values are retrieved. """
+    def __init__(self, kind, args, board):
+        self.kind = kind
+        self.args = args
+        self.board = board
+        self.synced = 0.0
+
+
+class RankingTracker(object):
+    """ Keeps top volumes, pairs and exchanges leaderboards.
+
+    Example:
+        ---------------------------------------
+        >>> tracker = RankingTracker(cc, size=50)
+        >>> tracker.track_volumes("USD")
+        >>> tracker.track_pairs("BTC")
+        >>> while True:
+        ...     for key, changes in tracker.poll().items():
+        ...         print(key, changes)
+        ...     time.sleep(60)
+        ---------------------------------------
+
+    :param cc: Client.
+    :type cc: CryptoCompare
+
+    :param size: Positions of each leaderboard whose changes
+        are reported. (optional, default == 100)
+    :type size: int
+
+    :param margin: Items below ``size`` also updated by
+        incremental polls, as candidates to enter the top.
+        (optional, default == size)
+    :type margin: int
+
+    :param resync: Seconds between full polls of the
+        top_* endpoints. (optional, default == 3600)
+    :type resync: float
+
+    :param history: Positions kept by item.
+        (optional, default == 100)
+    :type history: int
+    """
+    def __init__(self, cc, size=100, margin=None, resync=3600, history=100):
+        self.cc = cc
+        self.size = size
+        self.margin = size if margin is None else margin
+        self.resync = resync
+        self.history = history
+        self.boards = OrderedDict()
+
+    def __getitem__(self, key):
+        return self.boards[key].board
+
+    def _track(self, kind, args):
+        key = (kind,) + args
+        if key not in self.boards:
+            board = Leaderboard(self.size, history=self.history)
+            self.boards[key] = _Source(kind, args, board)
+        return key
+
+    def track_volumes(self, tsym):
+        """Coins by volume in ``tsym``, like top_volumes."""
+        return self._track("volumes", (tsym,))
+
+    def track_pairs(self, fsym):
+        """To symbols of ``fsym`` by volume, like top_pairs."""
+        return self._track("pairs", (fsym,))
+
+    def track_exchanges(self, fsym, tsym):
+        """Exchanges of a pair by volume, like top_exchanges.
+        Always fully polled."""
+        return self._track("exchanges", (fsym, tsym))
+
+    def _full_call(self, source):
+        limit = 2000
+        if source.kind == "volumes":
+            return ("top_volumes", source.args, dict(limit=limit))
+        if source.kind == "pairs":
+            return ("top_pairs", source.args, dict(limit=limit))
+        return ("top_exchanges", source.args, dict(limit=limit))
+
+    @staticmethod
+    def _full_values(source, response):
+        data = response.get("Data") or []
+        if source.kind == "volumes":
+            return dict((item["SYMBOL"], float(item["VOLUME24HOURTO"]))
+                        for item in data)
+        if source.kind == "pairs":
+            return dict((item["toSymbol"], float(item["volume24hTo"]))
+                        for item in data)
+        return dict((item["exchange"], float(item["volume24hTo"]))
+                    for item in data)
+
+    def _incremental_calls(self, source):
+        names = [name for name, _ in
+                 source.board.top(self.size + self.margin)]
+        calls = []
+        for i in range(0, len(names), PRICE_CHUNK):
+            chunk = names[i:i + PRICE_CHUNK]
+            if source.kind == "volumes":
+                calls.append(("price", (chunk, source.args[0]), dict(full=True)))
+            else:
+                calls.append(("price", (source.args[0], chunk), dict(full=True)))
+        return calls
+
+    @staticmethod
+    def _incremental_values(source, response):
+        raw = response.get("RAW") or {}
+        if source.kind == "volumes":
+            tsym = source.args[0]
+            return dict((fsym, float(entries[tsym]["VOLUME24HOURTO"]))
+                        for fsym, entries in raw.items() if tsym in entries)
+        entries = raw.get(source.args[0]) or {}
+        return dict((tsym, float(entry["VOLUME24HOURTO"]))
+                    for tsym, entry in entries.items())
+
+    def poll(self, now=None):
+        """
+        Update every leaderboard, with a full poll when it's
+        due or incrementally. Requests run as a batch.
+
+        :return: Rank changes by leaderboard key.
+        :rtype: dict
+        """
+        now = time.time() if now is None else now
+        calls, targets = [], []
+        for key, source in self.boards.items():
+            full = (source.kind == "exchanges" or not len(source.board) or
+                    now - source.synced >= self.resync)
+            if full:
+                calls.append(self._full_call(source))
+                targets.append((key, True))
+            else:
+                for call in self._incremental_calls(source):
+                    calls.append(call)
+                    targets.append((key, False))
+
+        values = dict((key, {}) for key in self.boards)
+        synced = set()
+        for result in self.cc.batch(calls):
+            if not result.ok:
+                raise result.error
+            key, full = targets[result.index]
+            source = self.boards[key]
+            if full:
+                values[key].update(self._full_values(source, result.result))
+                synced.add(key)
+            else:
+                values[key].update(self._incremental_values(source, result.result))
+
+        changes = {}
+        for key, source in self.boards.items():
+            update = values[key]
+            if key in synced:
+                # Items not in a full poll left the leaderboard
+                for name, _ in source.board.top(len(source.board)):
+                    update.setdefault(name, None)
+                source.synced = now
+            changes[key] = source.board.update(update, now=now)
+        return changes
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Refresh-ahead (stale-while-revalidate) response cache.
+
+Keys read often are refreshed by a background worker shortly before
+their time to live runs out, and expired entries are served stale
+while they're refreshed, so readers don't wait for the API. Time to
+live of each route comes from the server cache durations reported
+by the documentation (see ``CryptoCompare.cache_duration``).
+"""
+
+import time
+import threading
+from collections import deque
+
+from .cache import DEFAULT_TTLS
+from .cryptocompare import METHOD_ROUTES
+
+# Method documenting each route, used for cache durations
+ROUTE_METHODS = dict((route, method) for method, route in METHOD_ROUTES.items()
+                     if route.startswith("data/"))
+ROUTE_METHODS.update({
+    "data/pricemultifull": "price",
+    "data/histohour": "histo",
+    "data/histoday": "histo",
+})
+
+
+class _Entry(object):
+    __slots__ = ("route", "body", "stored", "ttl", "loader",
+                 "hits", "window_start", "refreshing")
+
+    def __init__(self, route, body, ttl, loader):
+        self.route = route
+        self.body = body
+        self.stored = time.time()
+        self.ttl = ttl
+        self.loader = loader
+        self.hits = 0
+        self.window_start = self.stored
+        self.refreshing = False
+
+
+class RefreshAheadCache(object):
+    """ In-process cache refreshing hot keys in background.
+
+    Example:
+        ---------------------------------------
+        >>> cc = CryptoCompare(cache=RefreshAheadCache())
+        >>> cc.price("BTC", "USD")  # hot keys won't block again
+        ---------------------------------------
+
+    :param ttls: Time to live in seconds by route, as default
+        server cache durations are used, or cache.DEFAULT_TTLS
+        if the documentation isn't available.
+        (optional, default == None)
+    :type ttls: dict
+
+    :param hot_hits: Reads in ``hot_window`` seconds from which
+        a key is refreshed ahead. (optional, default == 3)
+    :type hot_hits: int
+
+    :param hot_window: See hot_hits. (optional, default == 60)
+    :type hot_window: float
+
+    :param margin: Fraction of the time to live, before it
+        runs out, when hot keys are refreshed.
+        (optional, default == 0.2)
+    :type margin: float
+
+    :param stale_ttl: Seconds after expiration while an entry
+        is served stale and refreshed, as default its time to
+        live. (optional, default == None)
+    :type stale_ttl: float
+
+    :param max_rate: Maximum background refreshes per second,
+        requests go through the scheduler of the client too,
+        with "bulk" priority. (optional, default == 5)
+    :type max_rate: float
+
+    :param max_entries: Maximum number of stored responses.
+        (optional, default == 1024)
+    :type max_entries: int
+
+    :param use_documentation: Use server cache durations for
+        routes not in ttls. (optional, default == True)
+    :type use_documentation: bool
+    """
+    def __init__(self, ttls=None, hot_hits=3, hot_window=60, margin=0.2,
+                 stale_ttl=None, max_rate=5, max_entries=1024,
+                 use_documentation=True):
+        self.ttls = dict(ttls or {})
+        self.hot_hits = hot_hits
+        self.hot_window = hot_window
+        self.margin = margin
+        self.stale_ttl = stale_ttl
+        self.max_rate = max_rate
+        self.max_entries = max_entries
+        self.use_documentation = use_documentation
+        self.counters = dict(hits=0, stale=0, misses=0, refreshes=0,
+                             errors=0)
+        self.client = None
+
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._queue = deque()
+        self._worker = None
+        self._closed = False
+
+    def bind(self, client):
+        """Called by the client using the cache."""
+        self.client = client
+
+    def ttl(self, route):
+        if route in self.ttls:
+            return self.ttls[route]
+        ttl = None
+        method = ROUTE_METHODS.get(route)
+        if (self.use_documentation and method is not None and
+                self.client is not None):
+            try:
+                ttl = self.client.documentation_index().cache_durations.get(method)
+            except Exception:
+                self.use_documentation = False
+        if ttl is None:
+            ttl = DEFAULT_TTLS.get(route, 0)
+        self.ttls[route] = ttl
+        return ttl
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        return None if entry is None else entry.body
+
+    def fetch(self, route, key, loader):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.stored
+                stale_ttl = entry.ttl if self.stale_ttl is None else self.stale_ttl
+                if age < entry.ttl + stale_ttl:
+                    self._hit(entry, key, age, now)
+                    return entry.body
+            self.counters["misses"] += 1
+
+        body = loader()
+        ttl = self.ttl(route)
+        if ttl > 0:
+            self._store(key, _Entry(route, body, ttl, loader))
+        return body
+
+    def _hit(self, entry, key, age, now):
+        if now - entry.window_start > self.hot_window:
+            entry.hits, entry.window_start = 0, now
+        entry.hits += 1
+        if age >= entry.ttl:
+            # Expired, served stale while it's refreshed
+            self.counters["stale"] += 1
+            self._schedule(entry, key)
+            return
+        self.counters["hits"] += 1
+        if entry.hits >= self.hot_hits and age >= entry.ttl * (1 - self.margin):
+            self._schedule(entry, key)
+
+    def _store(self, key, entry):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                entry.hits = previous.hits
+                entry.window_start = previous.window_start
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+
+    def _schedule(self, entry, key):
+        if entry.refreshing or self._closed:
+            return
+        entry.refreshing = True
+        self._queue.append(key)
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run,
+                                            name="cryptocompare-refresh")
+            self._worker.daemon = True
+            self._worker.start()
+        self._cond.notify()
+
+    def _run(self):
+        interval = 1.0 / self.max_rate if self.max_rate else 0
+        last = 0.0
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                key = self._queue.popleft()
+                entry = self._entries.get(key)
+            if entry is None:
+                continue
+            wait = last + interval - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            last = time.time()
+            self._refresh(key, entry)
+
+    def _refresh(self, key, entry):
+        scheduler = getattr(self.client, "scheduler", None)
+        try:
+            if scheduler is not None:
+                with scheduler.priority("bulk"):
+                    body = entry.loader()
+            else:
+                body = entry.loader()
+        except Exception:
+            # Keep serving the previous value, next read retries
+            self.counters["errors"] += 1
+            entry.refreshing = False
+            return
+        self.counters["refreshes"] += 1
+        self._store(key, _Entry(entry.route, body, entry.ttl, entry.loader))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._queue.clear()
+
+    def close(self):
+        """Stop the background worker."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
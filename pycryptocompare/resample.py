@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Local resampling of histo candles.
+
+One minute (hour, day) series can feed every multiple of its
+period, instead of downloading each timeframe with ``aggregate``.
+Buckets are aligned to multiples of their width since the epoch and
+labelled with their start time. Open is the first open of a bucket,
+close the last close, high and low their extremes and volumes
+are summed.
+"""
+
+from .series import np, require_numpy, HistoSeries, FIELDS
+
+
+def resample_columns(columns, width, partial=True):
+    """
+    Aggregate columns of candles (dict of arrays sorted by time)
+    into buckets of ``width`` seconds.
+
+    :param columns: Arrays by field ("time", "open", "high", ...).
+    :type columns: dict
+
+    :param width: Width of buckets in seconds.
+    :type width: int
+
+    :param partial: Keep the last bucket if it isn't complete
+        yet. Completeness is guessed from the step of candles.
+        (optional, default == True)
+    :type partial: bool
+
+    :return: Arrays by field of aggregated candles.
+    :rtype: dict
+    """
+    require_numpy()
+    times = np.asarray(columns["time"], dtype=np.int64)
+    if not len(times):
+        return {field: np.asarray(columns[field])[:0] for field in FIELDS}
+
+    buckets = times // width
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.concatenate((starts[1:], [len(times)])) - 1
+
+    out = {
+        "time": buckets[starts] * width,
+        "open": np.asarray(columns["open"])[starts],
+        "close": np.asarray(columns["close"])[ends],
+        "high": np.maximum.reduceat(np.asarray(columns["high"]), starts),
+        "low": np.minimum.reduceat(np.asarray(columns["low"]), starts),
+        "volumefrom": np.add.reduceat(np.asarray(columns["volumefrom"]), starts),
+        "volumeto": np.add.reduceat(np.asarray(columns["volumeto"]), starts),
+    }
+
+    if not partial and len(times) > 1:
+        step = int(np.min(np.diff(times)))
+        if times[-1] + step < out["time"][-1] + width:
+            out = {field: values[:-1] for field, values in out.items()}
+    return out
+
+
+def resample(series, factor, partial=True):
+    """
+    Resample a series to ``factor`` times its period.
+
+    Example:
+        ---------------------------------------
+        >>> minutes = HistoSeries.from_response(
+        ...     cc.histo("minute", "BTC", "USD", limit=2000))
+        >>> quarters = resample(minutes, 15)
+        ---------------------------------------
+
+    :param series: Base series.
+    :type series: HistoSeries
+
+    :param factor: Multiple of the base period.
+    :type factor: int
+
+    :param partial: Keep the last incomplete bucket.
+        (optional, default == True)
+    :type partial: bool
+
+    :rtype: HistoSeries
+    """
+    factor = int(factor)
+    if factor < 1:
+        raise ValueError("factor must be a positive integer")
+    out = HistoSeries(series.period, aggregate=series.aggregate * factor)
+    out.update(resample_columns({f: series[f] for f in FIELDS},
+                                series.step * factor, partial=partial))
+    return out
+
+
+class Resampler(object):
+    """ Resampled view of a series that is kept up to date when
+    the base series is updated, only the buckets touched by the
+    changed rows are aggregated again.
+
+    Example:
+        ---------------------------------------
+        >>> minutes = HistoSeries.from_response(
+        ...     cc.histo("minute", "BTC", "USD", limit=2000))
+        >>> frames = {f: Resampler(minutes, f) for f in (5, 15, 60, 240)}
+        >>> minutes.update(cc.histo("minute", "BTC", "USD", limit=5))
+        >>> frames[15].series["close"][-1]
+        ---------------------------------------
+
+    :param series: Base series.
+    :type series: HistoSeries
+
+    :param factor: Multiple of the base period.
+    :type factor: int
+
+    :param maxlen: Maximum number of resampled candles kept.
+        (optional, default == None)
+    :type maxlen: int
+    """
+    def __init__(self, series, factor, maxlen=None):
+        self.base = series
+        self.factor = int(factor)
+        if self.factor < 1:
+            raise ValueError("factor must be a positive integer")
+        self.width = series.step * self.factor
+        self.series = HistoSeries(series.period,
+                                  aggregate=series.aggregate * self.factor,
+                                  maxlen=maxlen)
+        series.listeners.append(self.refresh)
+        self.refresh(0)
+
+    def __getitem__(self, name):
+        return self.series[name]
+
+    def __len__(self):
+        return len(self.series)
+
+    def refresh(self, start=0):
+        """
+        Aggregate again buckets from the one containing
+        the row ``start`` of the base series.
+        """
+        times = self.base["time"]
+        if start >= len(times):
+            return
+        bucket_start = times[start] // self.width * self.width
+        first = int(np.searchsorted(times, bucket_start))
+        self.series.update(resample_columns(
+            {f: self.base[f][first:] for f in FIELDS}, self.width))
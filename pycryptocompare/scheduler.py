@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Priority aware scheduling of requests sharing the API rate limits.
+
+Each rate limit bucket ("Price", "Histo", "News") has a token bucket
+refilled at its per second limit. Requests waiting for a token are
+served by weighted fair queuing between priority classes, strict
+classes (interactive by default) always go first, and requests whose
+deadline expires while queued are dropped without using quota.
+"""
+
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+
+from .cryptocompare import CryptoCompareError
+
+INTERACTIVE = "interactive"
+NORMAL = "normal"
+BULK = "bulk"
+
+PRIORITY_WEIGHTS = {
+    INTERACTIVE: 16,
+    NORMAL: 4,
+    BULK: 1,
+}
+
+# Calls per second by bucket, see CryptoCompare.rate_calls
+DEFAULT_RATES = {
+    "Price": 50,
+    "Histo": 15,
+    "News": 15,
+}
+
+
+class DeadlineExceeded(CryptoCompareError):
+    """
+    Raised when a request deadline expires before
+    it can be sent.
+    """
+
+
+class _Waiter(object):
+    __slots__ = ("priority", "deadline", "key", "done")
+
+    def __init__(self, priority, deadline, key):
+        self.priority = priority
+        self.deadline = deadline
+        self.key = key
+        self.done = False
+
+
+class RequestScheduler(object):
+    """ Schedules requests of a client between priority classes.
+
+    Example:
+        ---------------------------------------
+        >>> cc = CryptoCompare(scheduler=RequestScheduler())
+        >>> with cc.priority("interactive", timeout=2):
+        ...     cc.price("BTC", "USD")
+        ---------------------------------------
+
+    :param rates: Calls per second by rate limit bucket,
+        updates DEFAULT_RATES (optional, default == None)
+    :type rates: dict
+
+    :param weights: Weight of each priority class,
+        updates PRIORITY_WEIGHTS (optional, default == None)
+    :type weights: dict
+
+    :param strict: Priority classes served before any other
+        (optional, default == ("interactive",))
+    :type strict: tuple
+
+    :param burst: Seconds of quota that can be accumulated
+        while idle (optional, default == 1)
+    :type burst: float
+    """
+    def __init__(self, rates=None, weights=None,
+                 strict=(INTERACTIVE,), burst=1):
+        self.rates = dict(DEFAULT_RATES, **(rates or {}))
+        self.weights = dict(PRIORITY_WEIGHTS, **(weights or {}))
+        self.strict = tuple(strict)
+        self.burst = burst
+        self.counters = dict(sent=0, expired=0)
+
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._seq = itertools.count()
+        self._tokens = {}
+        self._refilled = {}
+        self._queues = {}
+        self._virtual_time = {}
+        self._finish = {}
+
+    @contextmanager
+    def priority(self, priority=NORMAL, timeout=None):
+        """
+        Context manager setting the priority class and timeout
+        (seconds from the request, None for no deadline) of
+        requests made in the current thread.
+        """
+        if priority not in self.weights:
+            msg = "%s is not a valid priority, please select: %s"
+            raise ValueError(msg % (priority, ", ".join(sorted(self.weights))))
+        previous = getattr(self._local, "context", None)
+        self._local.context = (priority, timeout)
+        try:
+            yield self
+        finally:
+            self._local.context = previous
+
+    def granted(self):
+        """Time when the last request of this thread was let through."""
+        return getattr(self._local, "granted", None)
+
+    def _refill(self, bucket, now):
+        rate = self.rates[bucket]
+        tokens = self._tokens.get(bucket, rate * self.burst)
+        elapsed = now - self._refilled.get(bucket, now)
+        self._tokens[bucket] = min(rate * self.burst, tokens + elapsed * rate)
+        self._refilled[bucket] = now
+
+    def _push(self, bucket, priority, deadline):
+        # Weighted fair queuing: each request gets a virtual finish
+        # time, advanced by 1 / weight from the last one of its class
+        start = max(self._virtual_time.get(bucket, 0.0),
+                    self._finish.get((bucket, priority), 0.0))
+        finish = start + 1.0 / self.weights[priority]
+        self._finish[(bucket, priority)] = finish
+        rank = 0 if priority in self.strict else 1
+        waiter = _Waiter(priority, deadline, (rank, finish, next(self._seq)))
+        heapq.heappush(self._queues.setdefault(bucket, []),
+                       (waiter.key, waiter))
+        return waiter
+
+    def _head(self, bucket, now):
+        """Pop expired requests and return the first one waiting."""
+        queue = self._queues[bucket]
+        while queue:
+            waiter = queue[0][1]
+            if waiter.done:
+                heapq.heappop(queue)
+            elif waiter.deadline is not None and waiter.deadline <= now:
+                heapq.heappop(queue)
+                waiter.done = True
+                self.counters["expired"] += 1
+                self._cond.notify_all()
+            else:
+                return waiter
+        return None
+
+    def acquire(self, bucket, priority=None, timeout=None):
+        """
+        Wait until a request of ``bucket`` can be sent.
+        Priority and timeout default to the ones set with
+        the ``priority`` context manager of this thread.
+
+        - raises 'scheduler.DeadlineExceeded' if the deadline
+            expires while the request is queued.
+        """
+        if bucket not in self.rates:
+            return
+        context = getattr(self._local, "context", None) or (NORMAL, None)
+        priority = priority or context[0]
+        timeout = context[1] if timeout is None else timeout
+        now = time.time()
+        deadline = None if timeout is None else now + timeout
+
+        with self._cond:
+            waiter = self._push(bucket, priority, deadline)
+            while True:
+                now = time.time()
+                if not waiter.done and deadline is not None and deadline <= now:
+                    waiter.done = True
+                    self.counters["expired"] += 1
+                    self._cond.notify_all()
+                if waiter.done:
+                    raise DeadlineExceeded("Deadline expired for %s request"
+                                           % bucket)
+                head = self._head(bucket, now)
+                self._refill(bucket, now)
+                wait = None
+                if head is waiter:
+                    if self._tokens[bucket] >= 1:
+                        self._tokens[bucket] -= 1
+                        heapq.heappop(self._queues[bucket])
+                        waiter.done = True
+                        self._virtual_time[bucket] = waiter.key[1]
+                        self.counters["sent"] += 1
+                        self._cond.notify_all()
+                        self._local.granted = now
+                        return
+                    wait = (1 - self._tokens[bucket]) / self.rates[bucket]
+                if deadline is not None:
+                    remaining = deadline - now
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._cond.wait(None if wait is None else max(wait, 0.001))
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Columnar storage for histo candles.
+
+``HistoSeries`` keeps the candles returned by ``CryptoCompare.histo``
+as numpy arrays (one per field) instead of lists of dicts, and merges
+new responses in place, so periodic polls only append the new candles.
+Objects registered in ``listeners`` are called with the index of the
+first changed row after each update. Requires numpy.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PERIODS = {
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+}
+
+FIELDS = ("time", "open", "high", "low", "close", "volumefrom", "volumeto")
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("numpy is required for this feature, "
+                          "install it with 'pip install numpy'")
+
+
+def candles_to_columns(candles):
+    """
+    Convert a list of candles (dicts as returned in the ``Data`` field
+    of histo responses) into a dict of numpy arrays sorted by time.
+    A dict of arrays by field is accepted too.
+    """
+    require_numpy()
+    if isinstance(candles, dict):
+        if "Data" not in candles:
+            return {field: np.asarray(candles[field],
+                                      dtype=np.int64 if field == "time"
+                                                     else np.float64)
+                    for field in FIELDS}
+        candles = candles["Data"]
+    count = len(candles)
+    columns = {"time": np.fromiter((c["time"] for c in candles),
+                                   dtype=np.int64, count=count)}
+    for field in FIELDS[1:]:
+        columns[field] = np.fromiter((c[field] for c in candles),
+                                     dtype=np.float64, count=count)
+    if count > 1 and np.any(np.diff(columns["time"]) < 0):
+        order = np.argsort(columns["time"], kind="stable")
+        columns = {k: v[order] for k, v in columns.items()}
+    return columns
+
+
+class HistoSeries(object):
+    """ Histo candles stored by columns.
+
+    Example:
+        ---------------------------------------
+        >>> series = HistoSeries.from_response(
+        ...     cc.histo("minute", "BTC", "USD", limit=2000), "minute")
+        >>> series["close"]
+        >>> series.update(cc.histo("minute", "BTC", "USD", limit=5))
+        ---------------------------------------
+
+    :param period: Period of candles, "minute", "hour" or "day".
+        (optional, default == "minute")
+    :type period: str
+
+    :param aggregate: Aggregate used to retrieve the candles.
+        (optional, default == 1)
+    :type aggregate: int
+
+    :param maxlen: Maximum number of candles kept, older ones
+        are discarded when exceeded. (optional, default == None)
+    :type maxlen: int
+    """
+    def __init__(self, period="minute", aggregate=1, maxlen=None):
+        require_numpy()
+        if period not in PERIODS:
+            msg = '%s is not a valid period, please select: "minute", "hour" or "day"'
+            raise ValueError(msg % period)
+        self.period = period
+        self.aggregate = int(aggregate)
+        self.maxlen = maxlen
+        self.listeners = []
+        self._head = self._tail = 0
+        self._columns = {}
+        for field in FIELDS:
+            self._columns[field] = np.empty(0, dtype=np.int64 if field == "time"
+                                                      else np.float64)
+
+    @classmethod
+    def from_response(cls, response, period="minute", aggregate=1, maxlen=None):
+        """
+        Build a series from a histo response or a list of candles.
+        """
+        series = cls(period, aggregate=aggregate, maxlen=maxlen)
+        series.update(response)
+        return series
+
+    @property
+    def step(self):
+        """Seconds between consecutive candles."""
+        return PERIODS[self.period] * self.aggregate
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def __len__(self):
+        return self._tail - self._head
+
+    def __getitem__(self, name):
+        return self._columns[name][self._head:self._tail]
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def add_column(self, name, dtype=None):
+        """
+        Add a derived float column, filled with NaN, that is
+        kept aligned with candles on updates.
+        """
+        if name not in self._columns:
+            dtype = dtype or np.float64
+            self._columns[name] = np.full(len(self._columns["time"]),
+                                          np.nan, dtype=dtype)
+        return self[name]
+
+    def _reserve(self, extra):
+        """
+        Make room for ``extra`` rows after the tail, moving rows
+        to the start of the buffers or growing them.
+        """
+        size = len(self)
+        capacity = len(self._columns["time"])
+        if self._tail + extra <= capacity:
+            return
+        if size + extra > capacity // 2 or self.maxlen is None:
+            capacity = max(16, 2 * (size + extra))
+        for name, column in self._columns.items():
+            new = np.empty(capacity, dtype=column.dtype)
+            if new.dtype.kind == "f":
+                new[size:] = np.nan
+            new[:size] = column[self._head:self._tail]
+            self._columns[name] = new
+        self._head, self._tail = 0, size
+
+    def update(self, response):
+        """
+        Merge candles from a histo response (or list of candles) into
+        the series. Candles with times already stored are replaced
+        (the last candle of a poll is usually still being formed).
+
+        :return: Index of the first changed row in the series.
+        :rtype: int
+        """
+        new = candles_to_columns(response)
+        count = len(new["time"])
+        if not count:
+            return len(self)
+
+        times = self["time"]
+        if not len(times) or new["time"][0] > times[-1]:
+            start = self._append(new, len(self))
+        elif new["time"][0] == times[-1]:
+            start = self._append(new, len(self) - 1)
+        else:
+            start = self._merge(new)
+
+        if self.maxlen is not None and len(self) > self.maxlen:
+            dropped = len(self) - self.maxlen
+            self._head += dropped
+            start = max(0, start - dropped)
+
+        for listener in self.listeners:
+            listener(start)
+        return start
+
+    def _append(self, new, start):
+        count = len(new["time"])
+        self._reserve(start + count - len(self))
+        begin = self._head + start
+        end = begin + count
+        for name, column in self._columns.items():
+            if name in new:
+                column[begin:end] = new[name]
+            elif column.dtype.kind == "f":
+                column[begin:end] = np.nan
+        self._tail = end
+        return start
+
+    def _merge(self, new):
+        old_time = self["time"]
+        times = np.concatenate((old_time, new["time"]))
+        # The last occurrence of each time wins (new candles)
+        reverse_times = times[::-1]
+        unique, reverse_index = np.unique(reverse_times, return_index=True)
+        index = len(times) - 1 - reverse_index
+        from_new = index >= len(old_time)
+
+        for name in list(self._columns):
+            old = self[name]
+            if name in new:
+                merged = np.concatenate((old, new[name]))[index]
+            else:
+                merged = np.concatenate((old, np.full(len(new["time"]), np.nan)))
+                merged = merged[index]
+                merged[from_new] = np.nan
+            self._columns[name] = merged
+        self._head, self._tail = 0, len(unique)
+        return int(np.searchsorted(unique, new["time"][0]))
+
+    def resample(self, factor, partial=True):
+        """
+        Return a new series aggregated to ``factor`` times the
+        period of this one, see ``resample.resample``.
+        """
+        from .resample import resample
+        return resample(self, factor, partial=partial)
+
+    def to_candles(self, start=0):
+        """
+        Return candles from ``start`` as a list of dicts,
+        like the ``Data`` field of histo responses.
+        """
+        values = [self[field][start:].tolist() for field in FIELDS]
+        return [dict(zip(FIELDS, row)) for row in zip(*values)]
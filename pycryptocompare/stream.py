@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Incremental parsing of big JSON responses.
+
+Catalog responses (coin list, mining equipment and contracts,
+exchanges) are objects with thousands of entries. ``iter_items``
+parses them while they're read from the socket, yielding one
+``(key, value)`` entry at a time, so memory used is bounded by the
+size of the biggest entry instead of the whole payload. Entries
+not kept by the filters are skipped without being decoded.
+"""
+
+import re
+import json
+
+from .cryptocompare import CryptoCompareError
+
+_WHITESPACE = " \t\r\n"
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[,}\]\s]')
+
+
+class JSONStreamReader(object):
+    """ Reads JSON values from an iterable of text chunks.
+
+    :param chunks: Decoded text chunks.
+    :type chunks: iterable
+
+    :param parse_float: See json.loads (optional, default == None)
+    :param parse_int: See json.loads (optional, default == None)
+    """
+    def __init__(self, chunks, parse_float=None, parse_int=None):
+        self.chunks = iter(chunks)
+        self.buf = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder(parse_float=parse_float,
+                                        parse_int=parse_int)
+
+    def _more(self):
+        """
+        Read the next chunk dropping consumed text. Returns the
+        number of characters dropped, or None at the end.
+        """
+        for chunk in self.chunks:
+            if not chunk:
+                continue
+            drop = self.pos
+            self.buf = self.buf[drop:] + chunk
+            self.pos = 0
+            return drop
+        return None
+
+    def peek(self):
+        """Next non whitespace character, empty at the end."""
+        while True:
+            buf, pos = self.buf, self.pos
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if self._more() is None:
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError("Expecting one of %r at position %d, found %r"
+                             % (chars, self.pos, char))
+        self.pos += 1
+        return char
+
+    def _value_end(self, skip=False):
+        """
+        Find the end of the value starting at the current position,
+        reading chunks as needed. If ``skip``, scanned text is dropped
+        from the buffer while searching.
+        """
+        first = self.peek()
+        if not first:
+            raise ValueError("Unexpected end of JSON")
+        kind = ("container" if first in "{[" else
+                "string" if first == '"' else "scalar")
+        i, depth, in_string = self.pos, 0, False
+        while True:
+            buf = self.buf
+            n = len(buf)
+            while i < n:
+                if kind == "scalar":
+                    match = _SCALAR_END.search(buf, i)
+                    if match is None:
+                        i = n
+                        break
+                    return match.start()
+                if in_string:
+                    match = _STRING_SPECIAL.search(buf, i)
+                    if match is None:
+                        i = n
+                        break
+                    j = match.start()
+                    if buf[j] == "\\":
+                        if j + 1 >= n:
+                            i = j  # escaped character in next chunk
+                            break
+                        i = j + 2
+                        continue
+                    in_string, i = False, j + 1
+                    if kind == "string":
+                        return i
+                    continue
+                match = _STRUCTURE.search(buf, i)
+                if match is None:
+                    i = n
+                    break
+                char, i = match.group(), match.end()
+                if char == '"':
+                    in_string = True
+                elif char in "{[":
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        return i
+            if skip:
+                self.pos = i
+            drop = self._more()
+            if drop is None:
+                if kind == "scalar":
+                    return len(self.buf)
+                raise ValueError("Unexpected end of JSON")
+            i -= drop
+
+    def read(self):
+        """Decode the next value."""
+        if self.peek() in ('{', '[', '"'):
+            # Fast path, the value is complete in the buffer. Closing
+            # brackets and quotes make success conclusive, unlike
+            # numbers that could continue in the next chunk.
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                pass
+            else:
+                self.pos = end
+                return value
+        end = self._value_end()
+        text = self.buf[self.pos:end]
+        self.pos = end
+        return self.decoder.decode(text)
+
+    def skip(self):
+        """Skip the next value without decoding it."""
+        self.pos = self._value_end(skip=True)
+
+    def members(self):
+        """
+        Iterate over the keys of the object starting at the current
+        position. The value of each key must be read or skipped
+        before advancing.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.read()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+
+def iter_items(chunks, path=(), predicate=None, keys=None,
+               parse_float=None, parse_int=None):
+    """
+    Yield ``(key, value)`` entries of the object found at ``path``
+    inside a JSON document, decoding one entry at a time.
+
+    Example:
+        ---------------------------------------
+        >>> chunks = cc.transport.stream(url, timeout=30)
+        >>> for symbol, coin in iter_items(chunks, ("Data",)):
+        ...     print(symbol, coin["CoinName"])
+        ---------------------------------------
+
+    :param chunks: Decoded text chunks of the document.
+    :type chunks: iterable
+
+    :param path: Keys of the object to iterate from the top
+        level object. (optional, default == ())
+    :type path: tuple
+
+    :param predicate: Function receiving key and decoded
+        value, only entries for which it returns True are
+        yielded. (optional, default == None)
+    :type predicate: function
+
+    :param keys: Only entries with these keys are decoded,
+        the rest are skipped. (optional, default == None)
+    :type keys: set
+
+    - raises 'cryptocompare.CryptoCompareError' if the document
+        is an error response of the API.
+    """
+    reader = JSONStreamReader(chunks, parse_float=parse_float,
+                              parse_int=parse_int)
+    keys = set(keys) if keys is not None else None
+    response = {}
+    members = reader.members()
+    for depth, target in enumerate(path):
+        for key in members:
+            if key == target:
+                break
+            if depth == 0 and key in ("Response", "Message"):
+                response[key] = reader.read()
+            else:
+                reader.skip()
+        else:
+            if response.get("Response") == "Error":
+                raise CryptoCompareError(response.get("Message"))
+            return
+        members = reader.members()
+
+    for key in members:
+        if not path and key in ("Response", "Message"):
+            response[key] = reader.read()
+            continue
+        if keys is not None and key not in keys:
+            reader.skip()
+            continue
+        value = reader.read()
+        if predicate is None or predicate(key, value):
+            yield key, value
+    if response.get("Response") == "Error":
+        raise CryptoCompareError(response.get("Message"))
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared memory ring buffer of price ticks.
+
+A publisher process polls pricemultifull and writes fixed layout
+tick records (numpy structured records) into a shared memory block:
+a table with the latest tick of each pair and a ring with the recent
+history. Consumer processes attach to the block by name and read it
+directly, without network, serialization or locks. Every record
+carries a sequence number (seqlock): the writer makes it odd while
+the record is being written, readers copy records and retry the ones
+whose sequence was odd or changed during the copy.
+
+The single publisher writes with plain stores, ordered on x86 and
+other platforms with total store order. Requires numpy.
+"""
+
+import time
+import threading
+
+from .series import np, require_numpy
+from .cryptocompare import PRICE_CHUNK
+
+MAGIC = 0x43435449434b5301  # "CCTICKS" + version
+HEADER_SIZE = 64
+SYMBOL_SIZE = 16
+
+# RAW fields of pricemultifull stored in each record
+TICK_FIELDS = ("PRICE", "LASTVOLUME", "LASTVOLUMETO", "VOLUME24HOUR",
+               "VOLUME24HOURTO", "OPEN24HOUR", "HIGH24HOUR", "LOW24HOUR",
+               "CHANGE24HOUR", "CHANGEPCT24HOUR", "SUPPLY", "MKTCAP")
+
+
+def tick_dtype():
+    """Layout of a tick record."""
+    require_numpy()
+    return np.dtype([("seq", np.uint64), ("index", np.uint64),
+                     ("pair", np.uint32), ("published", np.float64),
+                     ("LASTUPDATE", np.int64)] +
+                    [(field, np.float64) for field in TICK_FIELDS],
+                    align=True)
+
+
+def _header_dtype():
+    return np.dtype([("magic", np.uint64), ("capacity", np.uint64),
+                     ("pairs", np.uint64), ("written", np.uint64),
+                     ("record_size", np.uint64)])
+
+
+def _open_shared_memory(name, create=False, size=0):
+    from multiprocessing import shared_memory
+    if create:
+        return shared_memory.SharedMemory(name, create=True, size=size)
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block in the
+        # resource tracker, which would unlink it at exit
+        shm = shared_memory.SharedMemory(name)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class TickRing(object):
+    """ Latest ticks and recent history of a fixed set of
+    pairs in a shared memory block. Use ``create`` in the
+    publisher and ``attach`` in consumers.
+
+    Example:
+        ---------------------------------------
+        >>> ring = TickRing.attach("cryptocompare-ticks")
+        >>> latest = ring.latest()
+        >>> latest["PRICE"][ring.index("BTC", "USD")]
+        >>> ring.history(100)  # last 100 ticks of any pair
+        ---------------------------------------
+    """
+    def __init__(self, shm, owner=False):
+        require_numpy()
+        self.shm = shm
+        self.owner = owner
+        self.dtype = tick_dtype()
+        buf = shm.buf
+        self._header = np.ndarray(1, _header_dtype(), buffer=buf)
+        header = self._header[0]
+        if int(header["magic"]) != MAGIC:
+            raise ValueError("%s is not a tick ring" % shm.name)
+        if int(header["record_size"]) != self.dtype.itemsize:
+            raise ValueError("%s has an incompatible record layout" % shm.name)
+        self.capacity = int(header["capacity"])
+        count = int(header["pairs"])
+        offset = HEADER_SIZE
+        symbols = np.ndarray((count, 2), "S%d" % SYMBOL_SIZE, buffer=buf,
+                             offset=offset)
+        offset += symbols.nbytes
+        self.pairs = [(f.decode("ascii"), t.decode("ascii")) for f, t in symbols]
+        self._index = dict((pair, i) for i, pair in enumerate(self.pairs))
+        offset += -offset % 64
+        self._latest = np.ndarray(count, self.dtype, buffer=buf, offset=offset)
+        offset += self._latest.nbytes
+        self._ring = np.ndarray(self.capacity, self.dtype, buffer=buf,
+                                offset=offset)
+
+    @staticmethod
+    def size(pairs, capacity):
+        """Bytes of a block for ``pairs`` and ``capacity``."""
+        symbols = len(pairs) * 2 * SYMBOL_SIZE
+        offset = HEADER_SIZE + symbols
+        offset += -offset % 64
+        return offset + (len(pairs) + capacity) * tick_dtype().itemsize
+
+    @classmethod
+    def create(cls, pairs, name=None, capacity=65536):
+        """
+        Create a block for ``pairs``, ``capacity`` is the
+        number of ticks kept in the history.
+        """
+        require_numpy()
+        pairs = [(str(fsym), str(tsym)) for fsym, tsym in pairs]
+        for pair in pairs:
+            for symbol in pair:
+                if len(symbol.encode("ascii")) > SYMBOL_SIZE:
+                    raise ValueError("symbol too long: %s" % symbol)
+        shm = _open_shared_memory(name, create=True,
+                                  size=cls.size(pairs, capacity))
+        buf = shm.buf
+        symbols = np.ndarray((len(pairs), 2), "S%d" % SYMBOL_SIZE,
+                             buffer=buf, offset=HEADER_SIZE)
+        symbols[:] = [(f.encode("ascii"), t.encode("ascii")) for f, t in pairs]
+        header = np.ndarray(1, _header_dtype(), buffer=buf)
+        header[0] = (0, capacity, len(pairs), 0, tick_dtype().itemsize)
+        header["magic"] = MAGIC  # written last, the block is ready
+        ring = cls(shm, owner=True)
+        ring._latest[:] = np.zeros(1, ring.dtype)
+        ring._latest["pair"] = np.arange(len(pairs))
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        """Attach to a block created by another process."""
+        return cls(_open_shared_memory(name))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def written(self):
+        """Number of ticks written since creation."""
+        return int(self._header["written"][0])
+
+    def index(self, fsym, tsym):
+        """Position of a pair in latest ticks."""
+        return self._index[(fsym, tsym)]
+
+    def close(self):
+        """Detach from the block, the owner removes it too."""
+        self._header = self._latest = self._ring = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    """ ###########################################
+        ##############  PUBLISHING  ###############
+        ###########################################
+    """
+
+    @staticmethod
+    def _write(array, position, record):
+        seq = array["seq"][position]
+        array["seq"][position] = seq + 1
+        record["seq"] = seq + 1
+        array[position] = record
+        array["seq"][position] = seq + 2
+
+    def publish(self, ticks, published=None):
+        """
+        Write ticks of pairs of the ring.
+
+        :param ticks: RAW pricemultifull ticks, by from
+            symbol and to symbol.
+        :type ticks: dict
+
+        :return: Number of ticks written.
+        :rtype: int
+        """
+        published = time.time() if published is None else published
+        header = self._header
+        written = int(header["written"][0])
+        record = np.zeros((), self.dtype)
+        count = 0
+        for fsym, entries in ticks.items():
+            for tsym, entry in entries.items():
+                pair = self._index.get((fsym, tsym))
+                if pair is None:
+                    continue
+                record["pair"] = pair
+                record["published"] = published
+                record["LASTUPDATE"] = int(entry.get("LASTUPDATE") or 0)
+                for field in TICK_FIELDS:
+                    value = entry.get(field)
+                    record[field] = np.nan if value is None else float(value)
+                record["index"] = written
+                self._write(self._latest, pair, record)
+                self._write(self._ring, written % self.capacity, record)
+                written += 1
+                header["written"] = written
+                count += 1
+        return count
+
+    """ ###########################################
+        ###############  READING  #################
+        ###########################################
+    """
+
+    def _read(self, array, positions=None):
+        """Consistent copy of records of ``array``."""
+        copy = array.copy() if positions is None else array[positions]
+        while True:
+            current = array["seq"] if positions is None else array["seq"][positions]
+            torn = (copy["seq"] != current) | (copy["seq"] % 2 == 1)
+            if not torn.any():
+                return copy
+            retry = np.flatnonzero(torn)
+            source = retry if positions is None else positions[retry]
+            copy[retry] = array[source]
+
+    def latest(self):
+        """
+        Latest tick of every pair, a record by pair in the
+        order of ``pairs``. Pairs without ticks have seq 0.
+
+        :rtype: numpy.ndarray
+        """
+        return self._read(self._latest)
+
+    def history(self, n=None):
+        """
+        Last ``n`` ticks of any pair, oldest first, as
+        default every tick kept.
+
+        :rtype: numpy.ndarray
+        """
+        written = self.written
+        n = min(self.capacity, written if n is None else n, written)
+        indexes = np.arange(written - n, written, dtype=np.uint64)
+        positions = (indexes % self.capacity).astype(np.intp)
+        records = self._read(self._ring, positions)
+        # Drop ticks overwritten by the writer while reading
+        return records[records["index"] == indexes]
+
+    def pair_history(self, fsym, tsym, n=None):
+        """Ticks of a pair among the last ``n`` ticks."""
+        records = self.history(n)
+        return records[records["pair"] == self.index(fsym, tsym)]
+
+
+class TickPublisher(object):
+    """ Polls pricemultifull and publishes ticks to a ring.
+
+    Example:
+        ---------------------------------------
+        >>> publisher = TickPublisher(cc, [("BTC", "USD"), ("ETH", "USD")],
+        ...                           name="cryptocompare-ticks")
+        >>> publisher.start()  # polls in a background thread
+        ---------------------------------------
+
+    :param cc: Client.
+    :type cc: CryptoCompare
+
+    :param pairs: (fsym, tsym) tuples.
+    :type pairs: list
+
+    :param name: Name of the shared memory block, random
+        if not passed. (optional, default == None)
+    :type name: str
+
+    :param capacity: Ticks kept in history.
+        (optional, default == 65536)
+    :type capacity: int
+
+    :param interval: Seconds between polls, the server caches
+        prices for 10 seconds. (optional, default == 10)
+    :type interval: float
+    """
+    def __init__(self, cc, pairs, name=None, capacity=65536, interval=10):
+        self.cc = cc
+        self.ring = TickRing.create(pairs, name=name, capacity=capacity)
+        self.interval = interval
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+        fsyms = sorted(set(fsym for fsym, _ in self.ring.pairs))
+        tsyms = sorted(set(tsym for _, tsym in self.ring.pairs))
+        self._calls = [("price", (fsyms[i:i + PRICE_CHUNK], tsyms),
+                        dict(full=True))
+                       for i in range(0, len(fsyms), PRICE_CHUNK)]
+
+    @property
+    def name(self):
+        return self.ring.name
+
+    def poll(self):
+        """
+        Retrieve and publish ticks once.
+
+        :return: Number of ticks written.
+        :rtype: int
+        """
+        count = 0
+        for result in self.cc.batch(self._calls):
+            if not result.ok:
+                self.errors += 1
+                continue
+            count += self.ring.publish(result.result.get("RAW") or {})
+        return count
+
+    def run(self):
+        """Poll each interval until ``stop`` is called."""
+        while not self._stop.is_set():
+            started = time.time()
+            self.poll()
+            self._stop.wait(max(0, self.interval - (time.time() - started)))
+
+    def start(self):
+        """Run in a background thread."""
+        self._thread = threading.Thread(target=self.run,
+                                        name="cryptocompare-ticks")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def close(self):
+        """Stop polling and remove the ring."""
+        self.stop()
+        self.ring.close()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+HTTP transports used by CryptoCompare for retrieve API responses.
+
+Every transport exposes a ``get(url, timeout, headers=None)`` method
+returning the decoded body of the response, and a ``stream`` method
+with the same arguments yielding the body by decoded chunks. Heavy
+dependencies are imported the first time a request is made, so
+importing the package stays cheap for short-lived processes.
+"""
+
+import codecs
+import weakref
+import threading
+
+CHUNK_SIZE = 64 * 1024
+
+
+class RequestsTransport(object):
+    """ Transport based on ``requests`` (default transport).
+    Each thread gets its own ``requests.Session``, as sessions
+    aren't guaranteed to be thread-safe, all of them mounted on
+    a single adapter so connections are pooled and reused
+    between calls and threads.
+
+    :param pool_size: Maximum connections kept by host, should be
+        at least the number of threads sharing the transport.
+        (optional, default == 32)
+    :type pool_size: int
+    """
+    def __init__(self, pool_size=32):
+        self.pool_size = pool_size
+        self._adapter = None
+        self._sessions = weakref.WeakSet()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            from requests import Session
+            from requests.adapters import HTTPAdapter
+            session = Session()
+            with self._lock:
+                if self._adapter is None:
+                    self._adapter = HTTPAdapter(pool_connections=4,
+                                                pool_maxsize=self.pool_size)
+                adapter = self._adapter
+                self._sessions.add(session)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._local.session = session
+        return session
+
+    def get(self, url, timeout, headers=None):
+        ret = self.session.get(url, timeout=timeout, headers=headers)
+        return ret.text
+
+    def stream(self, url, timeout, headers=None, chunk_size=CHUNK_SIZE):
+        ret = self.session.get(url, timeout=timeout, headers=headers,
+                               stream=True)
+        try:
+            decoder = codecs.getincrementaldecoder(ret.encoding or "utf-8")(
+                errors="replace")
+            for chunk in ret.iter_content(chunk_size):
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+        finally:
+            ret.close()
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = list(self._sessions), weakref.WeakSet()
+            adapter, self._adapter = self._adapter, None
+        # Sessions of other threads are replaced on their next request
+        self._local = threading.local()
+        for session in sessions:
+            session.close()
+        if adapter is not None:
+            adapter.close()
+
+
+class HTTPClientTransport(object):
+    """ Lightweight transport built on the standard library
+    ``http.client`` module. Keeps one persistent (keep-alive)
+    connection per host and thread. Useful where startup
+    time matters more than features like proxies handling.
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    def _connection(self, scheme, netloc, timeout, fresh=False):
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = {}
+        key = (scheme, netloc)
+        conn = conns.get(key)
+        if conn is not None and fresh:
+            conn.close()
+            conn = None
+        if conn is None:
+            import http.client
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(netloc, timeout=timeout)
+            else:
+                conn = http.client.HTTPConnection(netloc, timeout=timeout)
+            conns[key] = conn
+        conn.timeout = timeout
+        return conn
+
+    def _open(self, url, timeout, headers):
+        from urllib.parse import urlsplit
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        request_headers = {"Connection": "keep-alive",
+                           "Accept-Encoding": "identity"}
+        if headers:
+            request_headers.update(headers)
+
+        # A kept-alive connection can be closed by the server between
+        # requests, in that case retry once with a new connection.
+        for attempt in (0, 1):
+            conn = self._connection(parts.scheme, parts.netloc,
+                                    timeout, fresh=bool(attempt))
+            try:
+                conn.request("GET", path, headers=request_headers)
+                return conn, conn.getresponse()
+            except OSError as err:
+                conn.close()
+                if attempt or not isinstance(err, ConnectionError):
+                    raise
+
+    def get(self, url, timeout, headers=None):
+        conn, resp = self._open(url, timeout, headers)
+        try:
+            body = resp.read()
+        except OSError:
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        charset = resp.headers.get_content_charset() or "utf-8"
+        return body.decode(charset, errors="replace")
+
+    def stream(self, url, timeout, headers=None, chunk_size=CHUNK_SIZE):
+        conn, resp = self._open(url, timeout, headers)
+        charset = resp.headers.get_content_charset() or "utf-8"
+        decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+        complete = False
+        try:
+            while True:
+                chunk = resp.read(chunk_size)
+                if not chunk:
+                    break
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+            complete = True
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+        finally:
+            # A partially read response can't be reused
+            if not complete or resp.will_close:
+                conn.close()
+
+    def close(self):
+        conns = getattr(self._local, "conns", None) or {}
+        for conn in conns.values():
+            conn.close()
+        conns.clear()
+
+
+TRANSPORTS = {
+    "requests": RequestsTransport,
+    "http.client": HTTPClientTransport,
+}
+
+
+def get_transport(transport=None):
+    """
+    Returns a transport instance from a name
+    (``"requests"`` or ``"http.client"``) or returns
+    the object passed if it's already a transport.
+    """
+    if transport is None:
+        transport = "requests"
+    if isinstance(transport, str):
+        try:
+            return TRANSPORTS[transport]()
+        except KeyError:
+            msg = "%s is not a valid transport, please select: %s"
+            raise ValueError(msg % (transport, ", ".join(sorted(TRANSPORTS))))
+    return transport
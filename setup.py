@@ -15,6 +15,7 @@ setup(
     author_email = 'mondejar1994@gmail.com',
     license = 'BSD License',
     packages = ['pycryptocompare'],
+    scripts = ['bin/pycryptocompare'],
     description = 'Python3 API Wrapper for CryptoCompare',
     long_description = open('README.md','r').read(),
     keywords = ['Cryptocompare', 'cryptocurrency', 'API', 'wrapper', 'CryptoExchanges'],
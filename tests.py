@@ -4,8 +4,114 @@
 import unittest
 from pycryptocompare import CryptoCompare
 
+import sys
+import json
+import threading
+import subprocess
 from time import time
 from pprint import pprint
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    """
+    Local HTTP server that mimics CryptoCompare API responses.
+    ``routes`` maps request paths to a JSON serializable body
+    or to a function receiving the query parameters.
+    """
+    daemon_threads = True
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.hits = []
+        HTTPServer.__init__(self, ("127.0.0.1", 0), StubHandler)
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%d/" % self.server_address[1]
+
+    def client(self, **kwargs):
+        cc = CryptoCompare(**kwargs)
+        cc.api_url = cc.web_url = self.url
+        return cc
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def endpoint_doc(url, duration):
+    return {"Simple": url, "Info": {"Description": "", "CacheDuration": duration}}
+
+DOCUMENTATION = {
+    "Response": "Success",
+    "AvailableCalls": {
+        "Price": {
+            "Single": endpoint_doc("https://min-api.cryptocompare.com/data/"
+                                   "price?fsym=ETH&tsyms=BTC,USD", "10 seconds"),
+            "Multi": endpoint_doc("", "10 seconds"),
+            "MultiFull": endpoint_doc("", "10 seconds"),
+            "GenerateAvg": endpoint_doc("", "10 seconds"),
+            "DayAvg": endpoint_doc("", "1200 seconds"),
+            "PriceHistorical": endpoint_doc("", "3600 seconds"),
+        },
+        "HistoDay": endpoint_doc("", "610 seconds"),
+        "HistoHour": endpoint_doc("", "610 seconds"),
+        "HistoMinute": endpoint_doc("", "40 seconds"),
+        "TopPairs": endpoint_doc("", "120 seconds"),
+        "TopExchanges": endpoint_doc("", "120 seconds"),
+        "TopVolumes": endpoint_doc("", "120 seconds"),
+        "AllExchanges": endpoint_doc("", "120 seconds"),
+        "AllNewsProviders": endpoint_doc("", "120 seconds"),
+        "News": endpoint_doc("", "120 seconds"),
+    },
+}
+
+
+def make_candles(start, count, step=60, seed=0):
+    """
+    Synthetic histo candles (random walk) starting at ``start``.
+    """
+    import random
+    rand = random.Random(seed)
+    candles, close = [], 100.0
+    for i in range(count):
+        open_, close = close, close + rand.uniform(-1, 1)
+        candles.append(dict(time=start + i * step, open=open_,
+                            high=max(open_, close) + rand.uniform(0, 1),
+                            low=min(open_, close) - rand.uniform(0, 1),
+                            close=close, volumefrom=rand.uniform(1, 5),
+                            volumeto=rand.uniform(100, 500)))
+    return candles
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        if self.headers.get("authorization"):
+            params["authorization"] = self.headers["authorization"]
+        self.server.hits.append((parts.path, params))
+        body = self.server.routes.get(parts.path, {"Response": "Error",
+                                                   "Message": "Not found"})
+        if callable(body):
+            body = body(params)
+        body = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
 
 """ ###########################################
     ############  POLONIEX TESTS  #############
@@ -140,5 +246,1786 @@ class TestCryptoCompare(unittest.TestCase):
         actual = self.cc.news()
         self.assertIs(type(actual), list)
 
+class TestTransport(unittest.TestCase):
+    """
+    Offline tests for transports and startup cost.
+    """
+    def setUp(self):
+        self.server = StubServer({
+            "/data/pricemulti": lambda p: {p["fsyms"]: {p["tsyms"]: 1.5}},
+        })
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_transports(self):
+        for transport in ("requests", "http.client"):
+            cc = self.server.client(transport=transport)
+            for _ in range(3):
+                actual = cc.price("BTC", "USD")
+                self.assertEqual(actual, {"BTC": {"USD": cc.parse_float("1.5")}})
+
+    def test_invalid_transport(self):
+        self.assertRaises(ValueError, CryptoCompare, transport="curl")
+
+    def test_lazy_import(self):
+        code = ("import sys, pycryptocompare; "
+                "from pycryptocompare import CryptoCompare; "
+                "CryptoCompare(transport='http.client'); "
+                "print('requests' in sys.modules, 'http.client' in sys.modules)")
+        out = subprocess.check_output([sys.executable, "-c", code],
+                                      universal_newlines=True)
+        self.assertEqual(out.split(), ["False", "False"])
+
+class TestCache(unittest.TestCase):
+    """
+    Offline tests for response caches.
+    """
+    def setUp(self):
+        import tempfile
+        self.tmpdir = tempfile.mkdtemp()
+        self.server = StubServer({
+            "/data/coinlist": {"Response": "Success",
+                               "Data": {"BTC": {"Id": "1182"}}},
+            "/data/pricemulti": lambda p: {p["fsyms"]: {p["tsyms"]: 1}},
+        })
+
+    def tearDown(self):
+        import shutil
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_memory_cache(self):
+        from pycryptocompare.cache import MemoryCache
+        cc = self.server.client(cache=MemoryCache())
+        for _ in range(3):
+            self.assertEqual(cc.coin_list("BTC"), {"BTC": {"Id": "1182"}})
+        self.assertEqual(len(self.server.hits), 1)
+
+    def test_sqlite_cache_ttl_and_eviction(self):
+        from pycryptocompare.cache import SQLiteCache
+        cache = SQLiteCache(self.tmpdir + "/cache.db",
+                            ttls={"data/pricemulti": 0.2})
+        cc = self.server.client(cache=cache)
+        cc.price("BTC", "USD")
+        cc.price("BTC", "USD")
+        self.assertEqual(len(self.server.hits), 1)
+        cc.price("ETH", "USD")
+        self.assertEqual(len(self.server.hits), 2)
+        from time import sleep
+        sleep(0.3)
+        cc.price("BTC", "USD")
+        self.assertEqual(len(self.server.hits), 3)
+
+        cache.max_size = 0
+        cache.set("data/coinlist", "key", "x" * 1000)
+        self.assertIsNone(cache.get("key"))
+
+    def test_sqlite_cache_processes(self):
+        code = ("from pycryptocompare import CryptoCompare; "
+                "from pycryptocompare.cache import SQLiteCache; "
+                "cc = CryptoCompare(cache=SQLiteCache(%r)); "
+                "cc.api_url = cc.web_url = %r; "
+                "print(cc.coin_list()['BTC']['Id'])")
+        code = code % (self.tmpdir + "/cache.db", self.server.url)
+        procs = [subprocess.Popen([sys.executable, "-c", code],
+                                  stdout=subprocess.PIPE,
+                                  universal_newlines=True)
+                 for _ in range(6)]
+        outputs = [proc.communicate()[0].strip() for proc in procs]
+        self.assertEqual(outputs, ["1182"] * 6)
+        self.assertEqual(len(self.server.hits), 1)
+
+class TestAnalytics(unittest.TestCase):
+    """
+    Offline tests for series and incremental indicators.
+    """
+    def setUp(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy not installed")
+
+    def test_incremental_matches_full(self):
+        import numpy as np
+        from pycryptocompare import analytics
+        from pycryptocompare.series import HistoSeries
+
+        candles = make_candles(0, 300)
+        series = HistoSeries.from_response({"Data": candles[:250]})
+        indicators = analytics.Indicators(series, sma=(5, 20), ema=(12,),
+                                          volatility=(10,), vwap=(7,))
+        series.update(candles[249:260])
+        changed = dict(candles[259], close=1.0)
+        series.update([changed])
+        series.update(candles[259:])
+        series.update(candles[100:110])  # merge of older candles
+
+        full = HistoSeries.from_response(candles)
+        close = full["close"]
+        expected = {
+            "return": analytics.returns(close),
+            "sma_5": analytics.sma(close, 5),
+            "sma_20": analytics.sma(close, 20),
+            "ema_12": analytics.ema(close, 12),
+            "volatility_10": analytics.volatility(close, 10),
+            "vwap": analytics.vwap(full["high"], full["low"], close,
+                                   full["volumefrom"]),
+            "vwap_7": analytics.vwap(full["high"], full["low"], close,
+                                     full["volumefrom"], 7),
+        }
+        self.assertEqual(len(series), 300)
+        for name, values in expected.items():
+            self.assertTrue(np.allclose(indicators[name], values,
+                                        equal_nan=True), name)
+
+    def test_maxlen(self):
+        import numpy as np
+        from pycryptocompare import analytics
+        from pycryptocompare.series import HistoSeries
+
+        candles = make_candles(0, 300)
+        series = HistoSeries.from_response(candles[:100], maxlen=50)
+        indicators = analytics.Indicators(series, sma=(5,), volatility=(10,))
+        for i in range(100, 300, 7):
+            series.update(candles[i:i + 7])
+        close = HistoSeries.from_response(candles)["close"]
+        self.assertEqual(len(series), 50)
+        self.assertTrue(np.allclose(indicators["sma_5"],
+                                    analytics.sma(close, 5)[-50:]))
+        self.assertTrue(np.allclose(indicators["volatility_10"],
+                                    analytics.volatility(close, 10)[-50:]))
+        self.assertRaises(ValueError, analytics.Indicators, series, sma=(50,))
+
+class TestResample(unittest.TestCase):
+    """
+    Offline tests for local resampling of candles.
+    """
+    def setUp(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy not installed")
+
+    def expected(self, candles, width):
+        buckets = {}
+        for candle in candles:
+            start = candle["time"] // width * width
+            if start not in buckets:
+                buckets[start] = dict(candle, time=start)
+                continue
+            bucket = buckets[start]
+            bucket["high"] = max(bucket["high"], candle["high"])
+            bucket["low"] = min(bucket["low"], candle["low"])
+            bucket["close"] = candle["close"]
+            bucket["volumefrom"] += candle["volumefrom"]
+            bucket["volumeto"] += candle["volumeto"]
+        return list(buckets.values())
+
+    def assertCandlesEqual(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        for a, e in zip(actual, expected):
+            self.assertEqual(sorted(a), sorted(e))
+            for field in e:
+                self.assertAlmostEqual(a[field], e[field])
+
+    def test_resample(self):
+        from pycryptocompare.series import HistoSeries
+
+        candles = make_candles(1800, 500)
+        series = HistoSeries.from_response(candles)
+        for factor in (5, 15, 60):
+            self.assertCandlesEqual(series.resample(factor).to_candles(),
+                                    self.expected(candles, 60 * factor))
+        # Candles end at 08:49, so the 08:00 bucket is incomplete
+        hours = series.resample(60, partial=False)
+        self.assertEqual(len(hours), 8)
+        self.assertEqual(hours.aggregate, 60)
+
+    def test_resampler_follows_updates(self):
+        from pycryptocompare.series import HistoSeries
+        from pycryptocompare.resample import Resampler
+
+        candles = make_candles(1800, 500)
+        series = HistoSeries.from_response(candles[:200])
+        resampler = Resampler(series, 15)
+        for i in range(199, 500, 13):
+            series.update(candles[i:i + 13])
+        self.assertCandlesEqual(resampler.series.to_candles(),
+                                self.expected(candles, 900))
+
+class TestAdaptiveExecutor(unittest.TestCase):
+    """
+    Offline tests for the adaptive concurrency executor.
+    """
+    def setUp(self):
+        from time import sleep
+        self.active, self.peak = [0], [0]
+        lock = threading.Lock()
+
+        def price(params):
+            with lock:
+                self.active[0] += 1
+                self.peak[0] = max(self.peak[0], self.active[0])
+                throttled = self.active[0] > self.capacity
+            sleep(0.02)
+            with lock:
+                self.active[0] -= 1
+            if throttled:
+                return {"Response": "Error",
+                        "Message": "Rate limit excess only 6 per second"}
+            return {params["fsyms"]: {params["tsyms"]: 1}}
+
+        self.server = StubServer({
+            "/data/pricemulti": price,
+            "/stats/rate/second/limit": {
+                "Response": "Success",
+                "CallsMade": {"Histo": 0, "News": 0, "Price": 0},
+                "CallsLeft": {"Histo": 15, "News": 15, "Price": 1000}},
+        })
+        self.cc = self.server.client(transport="http.client")
+
+    def tearDown(self):
+        self.server.stop()
+
+    def run_calls(self, executor, count):
+        from pycryptocompare import CryptoCompareError
+        futures = [executor.submit(self.cc.price, "BTC", "USD")
+                   for _ in range(count)]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except CryptoCompareError:
+                results.append(None)
+        return results
+
+    def test_ramp_up(self):
+        from pycryptocompare.executor import AdaptiveExecutor
+        self.capacity = 1000
+        with AdaptiveExecutor(self.cc, max_workers=16,
+                              latency_target=1) as executor:
+            results = self.run_calls(executor, 300)
+            self.assertEqual(executor.limit, 16)
+        self.assertNotIn(None, results)
+        self.assertGreater(self.peak[0], 4)
+
+    def test_back_off_on_throttling(self):
+        from pycryptocompare.executor import AdaptiveExecutor
+        self.capacity = 6
+        with AdaptiveExecutor(self.cc, max_workers=32,
+                              latency_target=1) as executor:
+            results = self.run_calls(executor, 300)
+            self.assertGreater(executor.counters["throttled"], 0)
+            self.assertGreater(executor.counters["decreases"], 0)
+            self.assertLessEqual(executor.limit, 12)
+        self.assertEqual(len(results), 300)
+
+    def test_mixed_latencies(self):
+        from time import sleep
+        from pycryptocompare.executor import AdaptiveExecutor
+
+        def fast():
+            sleep(0.02)
+
+        def slow():
+            sleep(0.15)
+
+        def cached():
+            pass
+
+        for mix in ([fast, slow], [cached] * 4 + [slow]):
+            with AdaptiveExecutor(None, initial_workers=8, max_workers=32,
+                                  stats_interval=None) as executor:
+                futures = [executor.submit(mix[i % len(mix)])
+                           for i in range(200)]
+                for future in futures:
+                    future.result()
+                self.assertEqual(executor.counters["decreases"], 0)
+                self.assertGreaterEqual(executor.limit, 8)
+
+    def test_scheduler_queueing(self):
+        from pycryptocompare.executor import AdaptiveExecutor
+        from pycryptocompare.scheduler import RequestScheduler
+        self.capacity = 1000
+        cc = self.server.client(transport="http.client",
+                                scheduler=RequestScheduler(rates={"Price": 40},
+                                                           burst=0.05))
+        with AdaptiveExecutor(cc, initial_workers=8, max_workers=8,
+                              stats_interval=None) as executor:
+            futures = [executor.submit(cc.price, "BTC", "USD")
+                       for _ in range(40)]
+            for future in futures:
+                future.result()
+            # Requests wait up to a second in the scheduler queue
+            self.assertEqual(executor.counters["decreases"], 0)
+            self.assertEqual(executor.limit, 8)
+
+class TestDocumentationIndex(unittest.TestCase):
+    """
+    Offline tests for the memoized documentation index.
+    """
+    def setUp(self):
+        self.server = StubServer({"/": DOCUMENTATION})
+        self.cc = self.server.client()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_memoized(self):
+        cc = self.cc
+        self.assertEqual(cc.cache_duration(cc.price), 10)
+        self.assertEqual(cc.cache_duration(cc.histo), 40)
+        self.assertEqual(cc.cache_duration(cc.day_avg), 1200)
+        self.assertEqual(sorted(cc.documentation(func=cc.histo)),
+                         ["HistoDay", "HistoHour", "HistoMinute"])
+        self.assertEqual(cc.documentation(), DOCUMENTATION)
+        self.assertEqual(len(self.server.hits), 1)
+
+        cc.documentation(refresh=True)
+        self.assertEqual(len(self.server.hits), 2)
+        self.assertRaises(ValueError, cc.cache_duration, cc.coin_list)
+
+    def test_parameters(self):
+        params = self.cc.documentation_index().parameters_of("price")
+        self.assertEqual(sorted(params), ["fsym", "tsyms"])
+
+    def test_persist(self):
+        import os
+        import tempfile
+        path = os.path.join(tempfile.mkdtemp(), "doc.json")
+        self.cc.save_documentation(path)
+
+        cc = CryptoCompare()
+        cc.load_documentation(path)
+        self.assertEqual(cc.cache_duration(cc.top_pairs), 120)
+        os.remove(path)
+
+    def test_persist_decimals(self):
+        import os
+        import tempfile
+        from decimal import Decimal
+        self.server.routes["/"] = dict(DOCUMENTATION, Version=1.25,
+                                       Rates=[0.1, 3, "x"])
+        path = os.path.join(tempfile.mkdtemp(), "doc.json")
+        documentation = self.cc.documentation()
+        self.assertEqual(documentation["Version"], Decimal("1.25"))
+        self.cc.save_documentation(path)
+
+        cc = CryptoCompare()
+        cc.load_documentation(path)
+        self.assertEqual(cc.documentation(), documentation)
+        self.assertIsInstance(cc.documentation()["Rates"][0], Decimal)
+        os.remove(path)
+
+    def test_missing_cache_duration(self):
+        calls = dict(DOCUMENTATION["AvailableCalls"],
+                     TopPairs=endpoint_doc("", "varies"))
+        self.server.routes["/"] = dict(DOCUMENTATION, AvailableCalls=calls)
+        with self.assertRaises(ValueError) as context:
+            self.cc.cache_duration(self.cc.top_pairs)
+        self.assertIn("top_pairs", str(context.exception))
+
+class TestBatch(unittest.TestCase):
+    """
+    Offline tests for batches of heterogeneous calls.
+    """
+    def setUp(self):
+        from time import sleep
+
+        def top_pairs(params):
+            sleep(0.05 if params["fsym"] == "BTC" else 0)
+            return {"Response": "Success", "Data": [params["fsym"]]}
+
+        self.server = StubServer({
+            "/data/top/pairs": top_pairs,
+            "/data/socialstats": lambda p: {"Response": "Success",
+                                            "Data": {"Id": p["id"]}},
+            "/data/dayAvg": {"Response": "Error", "Message": "No data"},
+            "/stats/rate/second/limit": {"Response": "Success",
+                                         "CallsLeft": {"Price": 50}},
+        })
+        self.cc = self.server.client()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_ordered(self):
+        from pycryptocompare import CryptoCompareError
+        cc = self.cc
+        calls = [("top_pairs", "BTC"),
+                 ("top_pairs", ("ETH",), {"limit": 10}),
+                 (cc.social_stats, (1182,)),
+                 ("day_avg", ("BTC", "USD"))]
+        results = cc.batch(calls, max_workers=4)
+        self.assertEqual([r.index for r in results], [0, 1, 2, 3])
+        self.assertEqual(results[0].result["Data"], ["BTC"])
+        self.assertEqual(results[1].result["Data"], ["ETH"])
+        self.assertEqual(results[2].result["Data"], {"Id": "1182"})
+        self.assertFalse(results[3].ok)
+        self.assertIsInstance(results[3].error, CryptoCompareError)
+
+    def test_completion_order(self):
+        calls = [("top_pairs", "BTC")] + [("top_pairs", "ETH")] * 3
+        results = list(self.cc.batch(calls, ordered=False,
+                                     initial_workers=4, max_workers=4))
+        self.assertEqual(sorted(r.index for r in results), [0, 1, 2, 3])
+        self.assertEqual(results[-1].index, 0)
+
+    def test_invalid_calls(self):
+        calls = [("top_pairs", "BTC"), ("no_such_method",), ("_get", ("x",)),
+                 ("social_stats", 1182)]
+        results = self.cc.batch(calls, max_workers=4)
+        self.assertTrue(results[0].ok)
+        self.assertIsInstance(results[1].error, AttributeError)
+        self.assertIsInstance(results[2].error, AttributeError)
+        self.assertEqual(results[3].result["Data"], {"Id": "1182"})
+
+    def test_mixed_methods_throughput(self):
+        from time import sleep
+        latencies = {"/data/top/pairs": 0.02, "/data/socialstats": 0.1,
+                     "/data/dayAvg": 0.05}
+        active = dict((path, 0) for path in latencies)
+        peak = dict(active)
+        lock = threading.Lock()
+
+        def slow(path):
+            def route(params):
+                with lock:
+                    active[path] += 1
+                    peak[path] = max(peak[path], active[path])
+                sleep(latencies[path])
+                with lock:
+                    active[path] -= 1
+                return {"Response": "Success", "Data": params}
+            return route
+        for path in latencies:
+            self.server.routes[path] = slow(path)
+        calls = [[("top_pairs", "BTC"), ("social_stats", 1182),
+                  ("day_avg", ("BTC", "USD"))][i % 3] for i in range(90)]
+        # Concurrency starts at one request, it must grow for every method
+        results = self.cc.batch(calls, initial_workers=1, max_workers=32)
+        self.assertTrue(all(r.ok for r in results))
+        for path in latencies:
+            self.assertGreater(peak[path], 1, path)
+
+class TestScheduler(unittest.TestCase):
+    """
+    Offline tests for the priority aware request scheduler.
+    """
+    def setUp(self):
+        self.server = StubServer({
+            "/data/pricemulti": lambda p: {p["fsyms"]: {p["tsyms"]: 1}},
+            "/data/histoday": {"Response": "Success", "Data": []},
+        })
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_interactive_preempts_bulk(self):
+        from time import sleep
+        from pycryptocompare.scheduler import RequestScheduler
+        cc = self.server.client(scheduler=RequestScheduler(
+            rates={"Price": 20}, burst=0.05))
+        done = []
+
+        def bulk():
+            with cc.priority("bulk"):
+                cc.price("ETH", "USD")
+            done.append("bulk")
+
+        threads = [threading.Thread(target=bulk) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        sleep(0.1)
+        with cc.priority("interactive"):
+            cc.price("BTC", "USD")
+        done.append("interactive")
+        for thread in threads:
+            thread.join()
+        # 20 bulk requests take about one second at 20 calls per second
+        self.assertLess(done.index("interactive"), 6)
+
+    def test_deadline(self):
+        from pycryptocompare.scheduler import RequestScheduler, DeadlineExceeded
+        scheduler = RequestScheduler(rates={"Histo": 10}, burst=0.1)
+        cc = self.server.client(scheduler=scheduler)
+        errors = []
+
+        def histo():
+            try:
+                with cc.priority("bulk", timeout=0.25):
+                    cc.histo("day", "BTC", "USD")
+            except DeadlineExceeded as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=histo) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(errors)
+        self.assertEqual(scheduler.counters["expired"], len(errors))
+        self.assertEqual(len(self.server.hits), scheduler.counters["sent"])
+        self.assertEqual(len(self.server.hits) + len(errors), 10)
+
+    def test_weighted_fair_queuing(self):
+        from pycryptocompare.scheduler import RequestScheduler
+        scheduler = RequestScheduler(rates={"Price": 200}, burst=0.005)
+        order = []
+        lock = threading.Lock()
+
+        def request(priority):
+            scheduler.acquire("Price", priority)
+            with lock:
+                order.append(priority)
+
+        scheduler.acquire("Price")  # use the initial token
+        threads = [threading.Thread(target=request, args=(p,))
+                   for p in ["bulk"] * 20 + ["normal"] * 20]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # normal requests weight 4 times more than bulk ones
+        self.assertGreater(order[:20].count("normal"), 12)
+
+    def test_priority_requires_scheduler(self):
+        self.assertRaises(ValueError, CryptoCompare().priority, "bulk")
+
+class TestKeyPool(unittest.TestCase):
+    """
+    Offline tests for the pool of API keys.
+    """
+    def setUp(self):
+        self.calls = {}
+        lock = threading.Lock()
+
+        def price(params):
+            key = params["authorization"].split()[-1]
+            with lock:
+                self.calls[key] = self.calls.get(key, 0) + 1
+            if key == "throttled":
+                return {"Response": "Error",
+                        "Message": "Rate limit excess only 50 per second"}
+            return {"BTC": {"USD": 1}}
+
+        def rate(params):
+            key = params["authorization"].split()[-1]
+            return {"Response": "Success",
+                    "CallsMade": {"Price": 40 if key == "busy" else 0},
+                    "CallsLeft": {"Price": 10 if key == "busy" else 50}}
+
+        def hour_rate(params):
+            key = params["authorization"].split()[-1]
+            return {"Response": "Success",
+                    "CallsMade": {"Price": 0},
+                    "CallsLeft": {"Price": 2 if key == "scarce" else 1000}}
+
+        self.server = StubServer({"/data/pricemulti": price,
+                                  "/stats/rate/second/limit": rate,
+                                  "/stats/rate/hour/limit": hour_rate})
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_spreads_requests(self):
+        cc = self.server.client(api_keys=["a", "b", "c"])
+        for _ in range(30):
+            cc.price("BTC", "USD")
+        self.assertEqual(sorted(self.calls), ["a", "b", "c"])
+        self.assertEqual(sum(self.calls.values()), 30)
+        # Calls older than one second stop counting
+        self.assertLessEqual(max(self.calls.values()) -
+                             min(self.calls.values()), 2)
+
+    def test_headroom_from_stats(self):
+        cc = self.server.client(api_keys=["busy", "idle"])
+        cc.keys.refresh(cc, periods=("second",))
+        self.assertEqual(cc.keys.stats()["busy"]["CallsLeft"], {"Price": 10})
+        for _ in range(20):
+            cc.price("BTC", "USD")
+        self.assertEqual(self.calls, {"idle": 20})
+
+    def test_rotates_throttled_keys(self):
+        cc = self.server.client(api_keys=["throttled", "ok"])
+        for _ in range(5):
+            self.assertEqual(cc.price("BTC", "USD"), {"BTC": {"USD": 1}})
+        self.assertEqual(self.calls, {"throttled": 1, "ok": 5})
+
+    def test_stats_refreshed(self):
+        from time import sleep
+        from pycryptocompare.keys import KeyPool
+        keys = KeyPool(["busy", "idle"], refresh_interval=0.2)
+        cc = self.server.client(api_keys=keys)
+        # Stats are retrieved by the client before the first request
+        cc.price("BTC", "USD")
+        self.assertEqual(keys.stats()["busy"]["CallsLeft"], {"Price": 10})
+        refreshes = len(self.server.hits)
+        cc.price("BTC", "USD")
+        self.assertEqual(len(self.server.hits), refreshes + 1)
+        sleep(0.25)
+        cc.price("BTC", "USD")
+        self.assertEqual(len(self.server.hits), 2 * refreshes + 1)
+
+        # And updated from rate_calls responses
+        keys.refresh_interval = None
+        self.server.routes["/stats/rate/second/limit"] = {
+            "Response": "Success", "CallsMade": {"Price": 3},
+            "CallsLeft": {"Price": 47}}
+        cc.rate_calls("second")
+        stats = keys.stats()
+        self.assertIn({"Price": 47}, [s["CallsLeft"] for s in stats.values()])
+
+    def test_hour_calls_counted(self):
+        cc = self.server.client(api_keys=["scarce", "plenty"])
+        for _ in range(20):
+            cc.price("BTC", "USD")
+        # Only 2 calls left in the hour for the first key
+        self.assertEqual(self.calls, {"scarce": 2, "plenty": 18})
+
+    def test_retries_use_scheduler(self):
+        from pycryptocompare.keys import KeyPool
+        from pycryptocompare.scheduler import RequestScheduler
+        scheduler = RequestScheduler()
+        cc = self.server.client(scheduler=scheduler, api_keys=KeyPool(
+            ["throttled", "ok"], refresh_interval=None))
+        cc.price("BTC", "USD")
+        self.assertEqual(self.calls, {"throttled": 1, "ok": 1})
+        self.assertEqual(scheduler.counters["sent"], 2)
+
+class TestRefreshAhead(unittest.TestCase):
+    """
+    Offline tests for the refresh-ahead cache.
+    """
+    def setUp(self):
+        self.version = [0]
+
+        def price(params):
+            self.version[0] += 1
+            return {"BTC": {"USD": self.version[0]}}
+
+        self.server = StubServer({"/data/pricemulti": price,
+                                  "/": DOCUMENTATION})
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_hot_keys_refreshed_ahead(self):
+        from time import sleep
+        from pycryptocompare.refresh import RefreshAheadCache
+        cache = RefreshAheadCache(ttls={"data/pricemulti": 0.4},
+                                  hot_hits=2, margin=0.5)
+        cc = self.server.client(cache=cache)
+        values = []
+        for _ in range(30):
+            values.append(cc.price("BTC", "USD")["BTC"]["USD"])
+            sleep(0.05)
+        cache.close()
+        self.assertEqual(cache.counters["misses"], 1)
+        self.assertGreaterEqual(cache.counters["refreshes"], 3)
+        self.assertEqual(values, sorted(values))
+        self.assertGreater(values[-1], 1)
+
+    def test_stale_while_revalidate(self):
+        from time import sleep
+        from pycryptocompare.refresh import RefreshAheadCache
+        cache = RefreshAheadCache(hot_hits=100)
+        cc = self.server.client(cache=cache)
+        # TTL of pricemulti comes from the documentation
+        self.assertEqual(cache.ttl("data/pricemulti"), 10)
+        cache.ttls["data/pricemulti"] = 0.1
+        self.assertEqual(cc.price("BTC", "USD")["BTC"]["USD"], 1)
+        sleep(0.15)
+        self.assertEqual(cc.price("BTC", "USD")["BTC"]["USD"], 1)
+        sleep(0.1)
+        self.assertEqual(cc.price("BTC", "USD")["BTC"]["USD"], 2)
+        self.assertEqual(cache.counters["stale"], 1)
+        cache.close()
+
+    def test_refreshes_keep_nothing(self):
+        import gc
+        from pycryptocompare.refresh import RefreshAheadCache
+
+        def price(params):
+            self.version[0] += 1
+            return {"BTC": {"USD": self.version[0]}, "Refreshed": True}
+
+        self.server.routes["/data/pricemulti"] = price
+        cache = RefreshAheadCache(ttls={"data/pricemulti": 60}, hot_hits=100)
+        cc = self.server.client(cache=cache)
+        self.assertEqual(cc.price("BTC", "USD")["BTC"]["USD"], 1)
+        key, entry = next(iter(cache._entries.items()))
+        for _ in range(20):
+            cache._refresh(key, entry)
+            entry = cache._entries[key]
+        self.assertEqual(cache.counters["refreshes"], 20)
+        self.assertEqual(cc.price("BTC", "USD")["BTC"]["USD"], 21)
+
+        # Decoded responses aren't kept by the stored loader
+        gc.collect()
+        kept = [o for o in gc.get_objects()
+                if isinstance(o, dict) and "Refreshed" in o]
+        self.assertEqual(kept, [])
+
+        # Error responses aren't stored
+        self.server.routes["/data/pricemulti"] = {"Response": "Error",
+                                                  "Message": "down"}
+        cache._refresh(key, cache._entries[key])
+        self.assertEqual(cache.counters["errors"], 1)
+        self.assertEqual(cc.price("BTC", "USD")["BTC"]["USD"], 21)
+        cache.close()
+
+class TestStream(unittest.TestCase):
+    """
+    Offline tests for incremental parsing of big responses.
+    """
+    COINS = {
+        "BTC": {"Id": "1182", "CoinName": "Bitcoin", "ProofType": "PoW",
+                "SortOrder": 1, "Sponsored": False},
+        "ETH": {"Id": "7605", "CoinName": "Ethereum \"E\\\u00e9\"",
+                "ProofType": "PoW", "Nested": [1.5, [2, {"a": None}]]},
+        "NXT": {"Id": "1", "CoinName": "Nxt {}[]\",", "ProofType": "PoS",
+                "Supply": -1.25e-3},
+    }
+
+    def setUp(self):
+        self.server = StubServer({
+            "/data/coinlist": {"Response": "Success", "Message": "ok",
+                               "BaseImageUrl": "https://x/",
+                               "Data": self.COINS, "Type": 100},
+            "/data/miningequipment": {"Response": "Error",
+                                      "Message": "Not available"},
+            "/data/all/exchanges": {"Kraken": {"BTC": ["USD", "EUR"]},
+                                    "Bitstamp": {"BTC": ["USD"]}},
+        })
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_chunk_boundaries(self):
+        from decimal import Decimal
+        from pycryptocompare.stream import iter_items
+        doc = json.dumps({"Response": "Success", "Data": self.COINS,
+                          "Other": [1, 2, {"Data": 3}]}, indent=1)
+        for size in (1, 2, 3, 7, 64, len(doc)):
+            chunks = [doc[i:i + size] for i in range(0, len(doc), size)]
+            actual = dict(iter_items(chunks, ("Data",), parse_float=Decimal))
+            self.assertEqual(actual, json.loads(doc, parse_float=Decimal)["Data"])
+
+    def test_client_methods(self):
+        from pycryptocompare import CryptoCompareError
+        for transport in ("requests", "http.client"):
+            cc = self.server.client(transport=transport)
+            pos = list(cc.iter_coin_list(lambda s, c: c["ProofType"] == "PoS"))
+            self.assertEqual([symbol for symbol, _ in pos], ["NXT"])
+            self.assertEqual(sorted(dict(cc.iter_coin_list(coins=["ETH", "BTC"]))),
+                             ["BTC", "ETH"])
+            self.assertEqual(dict(cc.iter_exchanges(exchanges=["Kraken"])),
+                             {"Kraken": {"BTC": ["USD", "EUR"]}})
+            self.assertRaises(CryptoCompareError, list,
+                              cc.iter_mining_equipment())
+            # Connection is reusable after stopping early
+            next(cc.iter_coin_list())
+            self.assertEqual(len(dict(cc.iter_coin_list())), 3)
+
+class TestExport(unittest.TestCase):
+    """
+    Offline tests for Arrow and Parquet export.
+    """
+    def setUp(self):
+        try:
+            import numpy
+            import pyarrow
+        except ImportError:
+            self.skipTest("numpy or pyarrow not installed")
+
+    def test_histo_record_batch(self):
+        from pycryptocompare import export
+        from pycryptocompare.series import HistoSeries
+
+        candles = make_candles(1800, 100)
+        series = HistoSeries.from_response(candles)
+        batch = export.histo_record_batch(series, "BTC", "USD")
+        self.assertEqual(batch.num_rows, 100)
+        self.assertEqual(str(batch.schema.field("time").type), "timestamp[s]")
+        # Columns share memory with the series
+        close = batch.column(batch.schema.get_field_index("close"))
+        self.assertEqual(close.buffers()[1].address,
+                         series["close"].__array_interface__["data"][0])
+        self.assertEqual(batch.to_pylist()[3]["fsym"], "BTC")
+        from_response = export.histo_record_batch({"Data": candles})
+        self.assertEqual(from_response.column(4).to_pylist(),
+                         [c["close"] for c in candles])
+
+    def test_price_record_batch(self):
+        from pycryptocompare import export
+        raw = {"BTC": {"USD": {"PRICE": 100.5, "MARKET": "CCCAGG",
+                               "LASTUPDATE": 1500000000},
+                       "EUR": {"PRICE": 90.0, "MARKET": "CCCAGG"}},
+               "ETH": {"USD": {"PRICE": 10.25, "LASTMARKET": "Kraken"}}}
+        batch = export.price_record_batch({"RAW": raw, "DISPLAY": {}},
+                                          timestamp=1500000001)
+        rows = batch.to_pylist()
+        self.assertEqual([(r["fsym"], r["tsym"], r["PRICE"]) for r in rows],
+                         [("BTC", "USD", 100.5), ("BTC", "EUR", 90.0),
+                          ("ETH", "USD", 10.25)])
+        self.assertEqual(rows[2]["LASTMARKET"], "Kraken")
+        self.assertTrue(rows[1]["LASTUPDATE"] != rows[1]["LASTUPDATE"])  # NaN
+
+    def test_writers(self):
+        import os
+        import tempfile
+        import pyarrow.ipc
+        import pyarrow.parquet as pq
+        from pycryptocompare import export
+
+        tmp = tempfile.mkdtemp()
+        batches = [export.histo_record_batch(make_candles(0, 30, seed=i), fsym, "USD")
+                   for i, fsym in enumerate(("BTC", "ETH", "LTC", "XMR"))]
+        for name in ("histo.parquet", "histo.arrow"):
+            path = os.path.join(tmp, name)
+            with export.ArrowWriter(path, chunk_rows=50) as writer:
+                for batch in batches:
+                    writer.write(batch)
+            self.assertEqual(writer.rows, 120)
+            if name.endswith(".parquet"):
+                f = pq.ParquetFile(path)
+                self.assertEqual(f.metadata.num_row_groups, 2)
+                table = f.read()
+            else:
+                table = pyarrow.ipc.open_file(path).read_all()
+            self.assertEqual(table.column("fsym").to_pylist()[::30],
+                             ["BTC", "ETH", "LTC", "XMR"])
+            self.assertEqual(table.column("close").to_pylist(),
+                             sum((b.column(4).to_pylist() for b in batches), []))
+        self.assertRaises(ValueError, export.ArrowWriter, path, format="csv")
+
+        buf = export.to_buffer(batches)
+        table = export.read_buffer(buf)
+        self.assertEqual(table.num_rows, 120)
+        close = table.column("close").chunk(0)
+        self.assertTrue(buf.address <= close.buffers()[1].address
+                        < buf.address + buf.size)
+
+class TestFetchCommand(unittest.TestCase):
+    """
+    Offline tests for the bulk download command.
+    """
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.mkdtemp()
+        self.failing = set(["ETH"])
+
+        def histo(params):
+            if params["fsym"] in self.failing:
+                return {"Response": "Error", "Message": "rate limit exceeded"}
+            to_ts, limit = int(params["toTs"]), int(params["limit"])
+            return {"Response": "Success",
+                    "Data": make_candles(to_ts - limit * 3600, limit + 1,
+                                         step=3600)}
+
+        def histominute(params):
+            if params["fsym"] in self.failing:
+                return {"Response": "Error", "Message": "rate limit exceeded"}
+            to_ts, limit = int(params["toTs"]), int(params["limit"])
+            return {"Response": "Success",
+                    "Data": make_candles(to_ts - limit * 60, limit + 1)}
+
+        def price(params):
+            return {"RAW": dict((fsym, dict((tsym, {"PRICE": 2.5})
+                                            for tsym in params["tsyms"].split(",")))
+                                for fsym in params["fsyms"].split(","))}
+
+        def news(params):
+            lts = int(params["lTs"])
+            if lts < self.news_fail_below:
+                return {"Response": "Error", "Message": "rate limit exceeded"}
+            return [{"id": str(ts), "published_on": ts, "title": "t%d" % ts}
+                    for ts in range(lts, lts - 50 * 60, -60)]
+
+        self.news_fail_below = 0
+        self.server = StubServer({"/data/histohour": histo,
+                                  "/data/histominute": histominute,
+                                  "/data/pricemultifull": price,
+                                  "/data/news/": news})
+        self.pairs = self.path("pairs.txt")
+        with open(self.pairs, "w") as f:
+            f.write("# pairs\nBTC/USD\neth-usd\n\nLTC, EUR\n")
+
+    def tearDown(self):
+        self.server.stop()
+
+    def path(self, name):
+        import os
+        return os.path.join(self.tmp, name)
+
+    def fetch(self, output, *argv):
+        import io
+        from pycryptocompare import cli
+        args = cli.parser().parse_args(
+            ["fetch", "histo", "--pairs", self.pairs, "--period", "hour",
+             "--start", "2018-01-01", "--end", "2018-03-01", "-j", "4",
+             "-o", output] + list(argv))
+        cc = self.server.client(parse_float=float)
+        out = io.StringIO()
+        return cli.fetch(cc, args, out=out), out.getvalue()
+
+    def test_resume(self):
+        import csv
+        import sqlite3
+
+        for name in ("histo.csv", "histo.db"):
+            output = self.path(name)
+            self.failing = set(["ETH"])
+            del self.server.hits[:]
+            status, report = self.fetch(output)
+            self.assertEqual(status, 1)
+            self.assertIn("rate limit", report)
+            histo_hits = [p for p, _ in self.server.hits if p == "/data/histohour"]
+            self.assertEqual(len(histo_hits), 3)  # 1417 candles by pair
+
+            self.failing = set()
+            del self.server.hits[:]
+            status, report = self.fetch(output)
+            self.assertEqual(status, 0)
+            self.assertIn("resuming, 2 of 3 tasks already done", report)
+            self.assertEqual([params["fsym"] for path, params in self.server.hits
+                              if path == "/data/histohour"], ["ETH"])
+
+            if name.endswith(".csv"):
+                with open(output) as f:
+                    rows = list(csv.DictReader(f))
+                times = [int(row["time"]) for row in rows]
+            else:
+                conn = sqlite3.connect(output)
+                times = [r[0] for r in conn.execute("SELECT time FROM histo")]
+                conn.close()
+            self.assertEqual(len(times), 3 * 1417)
+            self.assertEqual((min(times), max(times)), (1514764800, 1519862400))
+
+    def fetch_at(self, now, *argv):
+        import io
+        from unittest import mock
+        from pycryptocompare import cli
+        args = cli.parser().parse_args(["fetch"] + list(argv))
+        cc = self.server.client(parse_float=float)
+        out = io.StringIO()
+        with mock.patch.object(cli, "time") as clock:
+            clock.time.return_value = now
+            return cli.fetch(cc, args, out=out), out.getvalue()
+
+    def test_resume_without_end(self):
+        now = 1600000000
+        output = self.path("minute.csv")
+        argv = ["histo", "--pairs", self.pairs, "--period", "minute",
+                "--start", str(now - 5000 * 60), "-o", output]
+        status, _ = self.fetch_at(now, *argv)
+        self.assertEqual(status, 1)
+
+        # A minute boundary later, the same tasks are resumed
+        self.failing = set()
+        del self.server.hits[:]
+        status, report = self.fetch_at(now + 180, *argv)
+        self.assertEqual(status, 0)
+        self.assertIn("resuming, 6 of 9 tasks already done", report)
+        to_ts = [int(params["toTs"]) for path, params in self.server.hits
+                 if path == "/data/histominute"]
+        self.assertEqual(max(to_ts), now // 60 * 60)
+
+    def test_news_resume(self):
+        import sqlite3
+        now = 1600000000
+        output = self.path("news.db")
+        self.news_fail_below = now - 40000
+        status, _ = self.fetch_at(now, "news", "-o", output)
+        self.assertEqual(status, 1)
+        requested = [int(p["lTs"]) for path, p in self.server.hits
+                     if path == "/data/news/"]
+
+        self.news_fail_below = 0
+        del self.server.hits[:]
+        status, _ = self.fetch_at(now + 120, "news", "-o", output)
+        self.assertEqual(status, 0)
+        resumed = [int(p["lTs"]) for path, p in self.server.hits
+                   if path == "/data/news/"]
+        self.assertEqual(resumed[0], requested[-1])
+
+        conn = sqlite3.connect(output)
+        ids = set(int(r[0]) for r in conn.execute("SELECT id FROM news"))
+        conn.close()
+        self.assertEqual(ids, set(range(now - 86400, now + 1, 60)))
+
+    def test_price(self):
+        import sqlite3
+        from pycryptocompare import cli
+        now = 1600000000
+        output = self.path("price.db")
+        argv = ["price", "--pairs", self.pairs, "-o", output]
+        for snapshot in (now, now + 60):
+            status, _ = self.fetch_at(snapshot, *argv)
+            self.assertEqual(status, 0)
+        conn = sqlite3.connect(output)
+        rows = sorted(conn.execute("SELECT fsym, tsym, snapshot, PRICE "
+                                   "FROM price"))
+        conn.close()
+        self.assertEqual(rows, sorted((fsym, tsym, snapshot, 2.5)
+                                      for fsym, tsym in [("BTC", "USD"),
+                                                         ("ETH", "USD"),
+                                                         ("LTC", "EUR")]
+                                      for snapshot in (now, now + 60)))
+        self.assertRaises(ValueError, self.fetch_at, now, "price", "--end",
+                          "2018-01-01", *argv[1:])
+
+    def test_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+        self.failing = set()
+        status, _ = self.fetch(self.path("histo.parquet"), "--end", "2018-06-01")
+        self.assertEqual(status, 0)
+        table = pq.read_table(self.path("histo.parquet"))
+        self.assertEqual(table.num_rows, 3 * 3625)
+        self.assertEqual(sorted(set(table.column("fsym").to_pylist())),
+                         ["BTC", "ETH", "LTC"])
+
+class TestGaps(unittest.TestCase):
+    """
+    Offline tests for gap detection and repair of histo series.
+    """
+    def setUp(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy not installed")
+        self.candles = make_candles(3600 * 1000, 5000, step=3600)
+        by_time = dict((c["time"], c) for c in self.candles)
+
+        def histo(params):
+            to_ts, limit = int(params["toTs"]), int(params["limit"])
+            times = range(to_ts - limit * 3600, to_ts + 1, 3600)
+            return {"Response": "Success",
+                    "Data": [by_time[t] for t in times if t in by_time]}
+        self.server = StubServer({"/data/histohour": histo})
+
+    def tearDown(self):
+        self.server.stop()
+
+    def broken(self):
+        candles = [dict(c) for c in self.candles]
+        for c in candles[100:104]:
+            c["volumefrom"] = c["volumeto"] = 0
+        for c in candles[200:202]:  # short run, not reported
+            c["volumefrom"] = c["volumeto"] = 0
+        del candles[4000:4500]
+        del candles[1000:1001]
+        del candles[990:995]
+        return candles[10:]
+
+    def test_find_gaps(self):
+        from pycryptocompare.gaps import find_gaps, repair_calls, Gap
+        from pycryptocompare.series import HistoSeries
+
+        step, t0 = 3600, self.candles[0]["time"]
+        series = HistoSeries.from_response(self.broken(), "hour")
+        gaps = find_gaps(series, start=t0)
+        self.assertEqual(gaps, [
+            Gap(t0, t0 + 9 * step, "missing"),
+            Gap(t0 + 100 * step, t0 + 103 * step, "zero"),
+            Gap(t0 + 990 * step, t0 + 994 * step, "missing"),
+            Gap(t0 + 1000 * step, t0 + 1000 * step, "missing"),
+            Gap(t0 + 4000 * step, t0 + 4499 * step, "missing"),
+        ])
+        self.assertEqual(gaps[-1].count(step), 500)
+        calls = repair_calls(gaps, step)
+        self.assertEqual([(c.toTs, c.limit) for c in calls],
+                         [(t0 + 1000 * step, 1000),
+                          (t0 + 4499 * step, 499)])
+        split = repair_calls([Gap(t0, t0 + 4500 * step, "missing")], step)
+        self.assertEqual([(c.start(step), c.toTs) for c in split],
+                         [(t0, t0 + 2000 * step),
+                          (t0 + 2001 * step, t0 + 4001 * step),
+                          (t0 + 4002 * step, t0 + 4500 * step)])
+
+    def test_repair(self):
+        from pycryptocompare.gaps import repair
+        from pycryptocompare.series import HistoSeries
+
+        cc = self.server.client(parse_float=float)
+        series = HistoSeries.from_response(self.broken(), "hour")
+        repaired = repair(cc, series, "BTC", "USD",
+                          start=self.candles[0]["time"])
+        self.assertEqual(len(repaired.calls), 2)
+        self.assertEqual(len([h for h in self.server.hits
+                              if h[0] == "/data/histohour"]), 2)
+        self.assertEqual(repaired.remaining, [])
+        self.assertEqual(series.to_candles(), self.candles)
+
+class TestPanel(unittest.TestCase):
+    """
+    Offline tests for aligned multi-pair panels.
+    """
+    def setUp(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy not installed")
+        self.data = {
+            "BTC": make_candles(86400 * 10, 30, step=86400, seed=1),
+            "ETH": make_candles(86400 * 15, 30, step=86400, seed=2),
+            "LTC": [c for i, c in enumerate(make_candles(86400 * 10, 40,
+                                                         step=86400, seed=3))
+                    if i % 3],
+        }
+
+        def histo(params):
+            if params["fsym"] not in self.data:
+                return {"Response": "Error", "Message": "market does not exist"}
+            return {"Response": "Success", "Data": self.data[params["fsym"]]}
+        self.server = StubServer({"/data/histoday": histo})
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_fetch_panel(self):
+        import numpy as np
+        from pycryptocompare import CryptoCompareError
+        from pycryptocompare.panel import fetch_panel
+
+        cc = self.server.client(parse_float=float)
+        pairs = [("BTC", "USD"), ("ETH", "USD"), ("LTC", "USD")]
+        panel = fetch_panel(cc, pairs, "day", limit=40)
+        times = [set(c["time"] for c in self.data[fsym]) for fsym, _ in pairs]
+        self.assertEqual(panel["close"].shape, (len(set.union(*times)), 3))
+        self.assertEqual(panel.time[0], 86400 * 10)
+        for fsym, tsym in pairs:
+            j = panel.index(fsym, tsym)
+            candles = self.data[fsym]
+            self.assertEqual(panel.mask[:, j].sum(), len(candles))
+            rows = np.searchsorted(panel.time, [c["time"] for c in candles])
+            self.assertTrue(np.array_equal(panel["close"][rows, j],
+                                           [c["close"] for c in candles]))
+            self.assertTrue(np.isnan(panel["close"][~panel.mask[:, j], j]).all())
+
+        inner = fetch_panel(cc, pairs, "day", how="inner")
+        self.assertTrue(inner.mask.all())
+        self.assertEqual(list(inner.time), sorted(set.intersection(*times)))
+
+        # Executor params aren't sent as query params
+        del self.server.hits[:]
+        fetch_panel(cc, pairs[:1], "day", latency_target=1, stats_interval=None,
+                    max_workers=2)
+        params = [p for path, p in self.server.hits if path == "/data/histoday"]
+        self.assertEqual(sorted(params[0]), ["aggregate", "fsym", "tsym"])
+
+        pairs.append(("XXX", "USD"))
+        self.assertRaises(CryptoCompareError, fetch_panel, cc, pairs)
+        panel = fetch_panel(cc, pairs, raise_errors=False)
+        self.assertEqual(list(panel.errors), [("XXX", "USD")])
+        self.assertFalse(panel.mask[:, 3].any())
+
+class TestDayAverages(unittest.TestCase):
+    """
+    Offline tests for bulk day averages.
+    """
+    def setUp(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy not installed")
+        # 120 days of synthetic hourly candles with some hours
+        # without volume and a day without any trade
+        self.start = 1514764800
+        candles = make_candles(self.start - 86400, 24 * 120, step=3600)
+        for candle in candles[100:124] + candles[500:505]:
+            candle["volumefrom"] = candle["volumeto"] = 0
+        self.candles = candles
+        self.server = StubServer({"/data/histohour": self.histo})
+
+    def tearDown(self):
+        self.server.stop()
+
+    def histo(self, params):
+        to_ts, limit = int(params["toTs"]), int(params["limit"])
+        return {"Response": "Success",
+                "Data": [c for c in self.candles
+                         if to_ts - limit * 3600 <= c["time"] <= to_ts]}
+
+    def test_day_averages(self):
+        import numpy as np
+        from pycryptocompare.averages import day_averages
+
+        day = 1514764800
+
+        def candle(time, close, high, low, volumefrom, volumeto):
+            return dict(time=time, open=close, close=close, high=high, low=low,
+                        volumefrom=volumefrom, volumeto=volumeto)
+        candles = [candle(day, 10, 11, 9, 1, 10),
+                   candle(day + 3600, 12, 13, 10, 3, 36),
+                   candle(day + 7200, 11, 12, 8, 0, 0),
+                   candle(day + 86400, 20, 22, 19, 2, 40),
+                   candle(day + 86400 + 36000, 30, 31, 18, 2, 60),
+                   candle(day + 2 * 86400, 5, 6, 4, 0, 0)]
+        expected = {
+            0: [(day, 11.5, 10.5, 11.5),
+                (day + 86400, 25.0, 24.5, 25.0),
+                (day + 2 * 86400, np.nan, 5.0, np.nan)],
+            -8: [(day - 57600, 11.5, 10.5, 11.5),
+                 (day + 28800, 20.0, 20.5, 20.0),
+                 (day + 115200, 30.0, 17.5, 30.0)],
+        }
+        for diff, rows in expected.items():
+            result = day_averages(candles, utc_hour_diff=diff)
+            actual = np.column_stack([result["time"], result["HourVWAP"],
+                                      result["MidHighLow"], result["VolFVolT"]])
+            np.testing.assert_allclose(actual, np.array(rows, dtype=float))
+
+    def test_bulk_day_avg(self):
+        import numpy as np
+        from pycryptocompare.averages import (bulk_day_avg, day_averages,
+                                              day_start, AVG_TYPES)
+
+        cc = self.server.client(parse_float=float)
+        end = self.start + 100 * 86400
+        for diff in (0, -8, 5):
+            averages = bulk_day_avg(cc, [("BTC", "USD"), ("ETH", "USD")],
+                                    self.start, end, utc_hour_diff=diff)
+            result = averages[("ETH", "USD")]
+            first, last = day_start(self.start, diff), day_start(end, diff)
+            self.assertEqual(len(result["time"]), 101)
+            self.assertEqual(result["time"][0], first)
+            hours = [c for c in self.candles
+                     if first <= c["time"] < last + 86400]
+            expected = day_averages(hours, utc_hour_diff=diff)
+            for field in ("time",) + AVG_TYPES:
+                np.testing.assert_array_equal(result[field], expected[field])
+
+        # 2424 hours of two pairs in two requests each
+        requests = [h for h in self.server.hits if h[0] == "/data/histohour"]
+        self.assertEqual(len(requests), 3 * 2 * 2)
+
+class TestGenerateAverages(unittest.TestCase):
+    """
+    Offline tests for batched generate_avg.
+    """
+    TICKS = {
+        "Kraken": {"BTC": {"USD": dict(PRICE=100.0, OPEN24HOUR=90.0,
+                                       VOLUME24HOUR=10.0, VOLUME24HOURTO=1000.0,
+                                       HIGH24HOUR=105.0, LOW24HOUR=88.0,
+                                       LASTUPDATE=1000, LASTVOLUME=0.5,
+                                       LASTVOLUMETO=50.0, LASTTRADEID="k1")},
+                   "ETH": {"USD": dict(PRICE=10.0, OPEN24HOUR=10.0,
+                                       VOLUME24HOUR=0.0, VOLUME24HOURTO=0.0,
+                                       HIGH24HOUR=11.0, LOW24HOUR=9.0,
+                                       LASTUPDATE=900, LASTVOLUME=1.0,
+                                       LASTVOLUMETO=10.0)}},
+        "Bitstamp": {"BTC": {"USD": dict(PRICE=110.0, OPEN24HOUR=100.0,
+                                         VOLUME24HOUR=30.0, VOLUME24HOURTO=3300.0,
+                                         HIGH24HOUR=112.0, LOW24HOUR=95.0,
+                                         LASTUPDATE=1200, LASTVOLUME=0.1,
+                                         LASTVOLUMETO=11.0, LASTTRADEID="b7")}},
+    }
+
+    def setUp(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy not installed")
+
+        def pricemultifull(params):
+            if params["e"] not in self.TICKS:
+                return {"Response": "Error", "Message": "market does not exist"}
+            raw = self.TICKS[params["e"]]
+            fsyms = params["fsyms"].split(",")
+            return {"RAW": dict((f, raw[f]) for f in fsyms if f in raw),
+                    "DISPLAY": {"BTC": {"USD": {"FROMSYMBOL": "\u0243",
+                                                "TOSYMBOL": "$"}}}}
+        self.server = StubServer({"/data/pricemultifull": pricemultifull})
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_batch_generate_avg(self):
+        from pycryptocompare.averages import batch_generate_avg
+
+        cc = self.server.client(parse_float=float)
+        pairs = [("BTC", "USD"), ("ETH", "USD"), ("LTC", "USD")]
+        averages = batch_generate_avg(cc, pairs, {
+            "both": ["Kraken", "Bitstamp"],
+            "kraken": ["Kraken"],
+            "other": ["Bitstamp", "Missing"],
+        })
+        requests = [h for h in self.server.hits if h[0] == "/data/pricemultifull"]
+        self.assertEqual(sorted(p["e"] for _, p in requests),
+                         ["Bitstamp", "Kraken", "Missing"])
+
+        btc = averages["both"][("BTC", "USD")]
+        raw = btc["RAW"]
+        self.assertAlmostEqual(raw["PRICE"], (100 * 10 + 110 * 30) / 40.0)
+        self.assertAlmostEqual(raw["OPEN24HOUR"], (90 * 10 + 100 * 30) / 40.0)
+        self.assertEqual((raw["VOLUME24HOUR"], raw["VOLUME24HOURTO"]),
+                         (40.0, 4300.0))
+        self.assertEqual((raw["HIGH24HOUR"], raw["LOW24HOUR"]), (112.0, 88.0))
+        self.assertEqual((raw["LASTMARKET"], raw["LASTUPDATE"],
+                          raw["LASTTRADEID"]), ("Bitstamp", 1200, "b7"))
+        self.assertAlmostEqual(raw["CHANGEPCT24HOUR"],
+                               (107.5 - 97.5) / 97.5 * 100)
+        self.assertEqual(btc["DISPLAY"]["PRICE"], "$ 107.5")
+        self.assertEqual(btc["DISPLAY"]["VOLUME24HOUR"], "\u0243 40")
+
+        self.assertEqual(averages["kraken"][("BTC", "USD")]["RAW"]["PRICE"], 100.0)
+        # Without volume, plain mean of the markets
+        self.assertEqual(averages["both"][("ETH", "USD")]["RAW"]["PRICE"], 10.0)
+        self.assertEqual(sorted(averages["other"]), [("BTC", "USD")])
+        self.assertNotIn(("LTC", "USD"), averages["both"])
+
+class TestSocialStatsCrawler(unittest.TestCase):
+    """
+    Offline tests for the social stats crawler.
+    """
+    def setUp(self):
+        import tempfile
+        self.path = tempfile.mktemp(suffix=".db")
+        self.failing = set(["7"])
+        coins = dict(("C%d" % i, {"Id": str(i), "Symbol": "C%d" % i})
+                     for i in range(1, 21))
+
+        def socialstats(params):
+            if params["id"] in self.failing:
+                return {"Response": "Error", "Message": "Not available"}
+            return {"Response": "Success",
+                    "Data": {"General": {"Id": params["id"], "Points": 1.5}}}
+        self.server = StubServer({"/data/coinlist": {"Response": "Success",
+                                                     "Data": coins},
+                                  "/data/socialstats": socialstats})
+
+    def tearDown(self):
+        self.server.stop()
+
+    def requested(self):
+        ids = [p["id"] for path, p in self.server.hits
+               if path == "/data/socialstats"]
+        del self.server.hits[:]
+        return sorted(ids, key=int)
+
+    def test_crawl_and_resume(self):
+        from pycryptocompare.crawler import SocialStatsCrawler
+
+        class Crash(Exception):
+            pass
+
+        def crash(id, error):
+            done.append(id)
+            if len(done) == 5:
+                raise Crash()
+
+        done = []
+        cc = self.server.client()
+        crawler = SocialStatsCrawler(cc, self.path, max_workers=4)
+        self.assertRaises(Crash, crawler.crawl, callback=crash)
+        crawler.close()
+
+        # Resumes with the ids not stored
+        self.requested()
+        crawler = SocialStatsCrawler(cc, self.path, max_workers=4)
+        counters = crawler.crawl()
+        self.assertEqual(counters, dict(fetched=20 - len(done) - ("7" not in done),
+                                        fresh=len(done) - ("7" in done),
+                                        errors=1))
+        self.assertEqual(len(set(self.requested()) & set(done) - set(["7"])), 0)
+        self.assertEqual(len(crawler), 19)
+        self.assertEqual(list(crawler.errors()), ["7"])
+        self.assertEqual(crawler.get(3)["Data"]["General"]["Points"],
+                         cc.parse_float("1.5"))
+
+        # Only stale and failed ids are requested again
+        self.failing = set()
+        self.assertEqual(crawler.crawl(), dict(fetched=1, fresh=19, errors=0))
+        self.assertEqual(self.requested(), ["7"])
+        crawler.max_age = 0
+        crawler.crawl(ids=[1, 2, "2"])
+        self.assertEqual(self.requested(), ["1", "2"])
+        self.assertEqual(len(dict(crawler.items())), 20)
+        crawler.close()
+
+class TestRankings(unittest.TestCase):
+    """
+    Offline tests for locally maintained leaderboards.
+    """
+    def test_leaderboard_changes(self):
+        import random
+        from pycryptocompare.rankings import Leaderboard
+
+        rand = random.Random(1)
+        for size in (None, 1, 5):
+            board = Leaderboard(size=size, history=3)
+            values, ranks = {}, {}
+            for _ in range(200):
+                update = {}
+                for _ in range(rand.randint(1, 6)):
+                    name = "C%d" % rand.randint(0, 15)
+                    update[name] = (None if rand.random() < 0.15
+                                    else rand.randint(0, 20))
+                changes = board.update(update)
+                for name, value in update.items():
+                    if value is None:
+                        values.pop(name, None)
+                    else:
+                        values[name] = value
+                order = sorted(values, key=lambda n: (-values[n], n))
+                order = order if size is None else order[:size]
+                new = dict((name, i + 1) for i, name in enumerate(order))
+                expected = set((name, ranks.get(name), new.get(name))
+                               for name in set(new) | set(ranks)
+                               if new.get(name) != ranks.get(name))
+                self.assertEqual(set(c[:3] for c in changes), expected)
+                self.assertEqual([name for name, _ in board.top()], order)
+                ranks = new
+            self.assertTrue(all(len(h) <= 3 for h in board.history.values()))
+
+    def test_tracker(self):
+        from pycryptocompare.rankings import RankingTracker
+
+        volumes = {"BTC": 300.0, "ETH": 200.0, "LTC": 100.0, "XMR": 50.0}
+        server = StubServer({
+            "/data/top/volumes": lambda params: {"Data": [
+                {"SYMBOL": s, "VOLUME24HOURTO": v} for s, v in volumes.items()]},
+            "/data/pricemultifull": lambda params: {"RAW": dict(
+                (s, {"USD": {"VOLUME24HOURTO": volumes[s]}})
+                for s in params["fsyms"].split(",") if s in volumes)},
+        })
+        try:
+            tracker = RankingTracker(server.client(), size=2, margin=1,
+                                     resync=60)
+            key = tracker.track_volumes("USD")
+            changes = tracker.poll(now=1000)[key]
+            self.assertEqual([(c.name, c.old, c.new) for c in changes],
+                             [("BTC", None, 1), ("ETH", None, 2)])
+
+            # Incremental poll of the top 3, XMR is not requested
+            volumes.update(LTC=250.0, XMR=400.0)
+            del server.hits[:]
+            changes = tracker.poll(now=1010)[key]
+            self.assertEqual([p for p, _ in server.hits if p.startswith("/data")],
+                             ["/data/pricemultifull"])
+            self.assertEqual(server.hits[0][1]["fsyms"], "BTC,ETH,LTC")
+            self.assertEqual([(c.name, c.old, c.new) for c in changes],
+                             [("LTC", None, 2), ("ETH", 2, None)])
+            self.assertEqual(tracker.poll(now=1020)[key], [])
+
+            # Full poll on resync finds XMR
+            changes = tracker.poll(now=1060)[key]
+            self.assertEqual([(c.name, c.old, c.new) for c in changes],
+                             [("XMR", None, 1), ("BTC", 1, 2), ("LTC", 2, None)])
+            self.assertEqual([r for _, r in tracker[key].history["LTC"]],
+                             [2, None])
+        finally:
+            server.stop()
+
+class TestTickRing(unittest.TestCase):
+    """
+    Offline tests for the shared memory tick ring buffer.
+    """
+    PAIRS = [("BTC", "USD"), ("ETH", "USD"), ("BTC", "EUR")]
+
+    def setUp(self):
+        try:
+            import numpy
+            from multiprocessing import shared_memory
+        except ImportError:
+            self.skipTest("numpy or shared_memory not available")
+
+    def test_publish_and_attach(self):
+        from pycryptocompare.ticks import TickPublisher
+
+        raw = {"BTC": {"USD": {"PRICE": 100.5, "LASTUPDATE": 1500000000,
+                               "VOLUME24HOUR": 3.0},
+                       "EUR": {"PRICE": 90.0}},
+               "ETH": {"USD": {"PRICE": 10.0}}}
+        server = StubServer({"/data/pricemultifull": {"RAW": raw}})
+        publisher = TickPublisher(server.client(), self.PAIRS, capacity=4)
+        try:
+            self.assertEqual(publisher.poll(), 3)
+            raw["BTC"]["USD"]["PRICE"] = 101.0
+            self.assertEqual(publisher.poll(), 3)
+
+            # A consumer process reads it without network
+            code = ("import sys, json\n"
+                    "from pycryptocompare.ticks import TickRing\n"
+                    "ring = TickRing.attach(sys.argv[1])\n"
+                    "latest = ring.latest()\n"
+                    "history = ring.pair_history('BTC', 'USD')\n"
+                    "print(json.dumps([ring.pairs, latest['PRICE'].tolist(),\n"
+                    "                  int(latest['LASTUPDATE'][0]),\n"
+                    "                  history['PRICE'].tolist(), ring.written]))\n"
+                    "ring.close()\n")
+            output = subprocess.check_output([sys.executable, "-c", code,
+                                              publisher.name])
+            pairs, prices, lastupdate, history, written = json.loads(output)
+            self.assertEqual([tuple(p) for p in pairs], self.PAIRS)
+            self.assertEqual(prices, [101.0, 10.0, 90.0])
+            self.assertEqual(lastupdate, 1500000000)
+            self.assertEqual(history, [101.0])  # capacity 4 of 6 ticks
+            self.assertEqual(written, 6)
+            self.assertEqual(len(publisher.ring.history()), 4)
+        finally:
+            publisher.close()
+            server.stop()
+
+    def test_no_torn_reads(self):
+        import numpy as np
+        from pycryptocompare.ticks import TickRing, TICK_FIELDS
+
+        ring = TickRing.create(self.PAIRS, capacity=64)
+        code = ("import sys, time\n"
+                "from pycryptocompare.ticks import TickRing, TICK_FIELDS\n"
+                "ring = TickRing.attach(sys.argv[1])\n"
+                "ring.owner = False\n"
+                "end, k = time.time() + 1.5, 0\n"
+                "while time.time() < end:\n"
+                "    k += 1\n"
+                "    tick = dict((f, k) for f in TICK_FIELDS)\n"
+                "    ring.publish({'BTC': {'USD': tick, 'EUR': tick},\n"
+                "                  'ETH': {'USD': tick}}, published=k)\n"
+                "ring.close()\n")
+        writer = subprocess.Popen([sys.executable, "-c", code, ring.name])
+        try:
+            reads = 0
+            while writer.poll() is None:
+                for records in (ring.latest(), ring.history(32)):
+                    values = np.array([records[f] for f in TICK_FIELDS])
+                    self.assertTrue((values == records["published"]).all())
+                reads += 1
+            self.assertEqual(writer.returncode, 0)
+            self.assertGreater(ring.written, 0)
+            self.assertGreater(reads, 0)
+        finally:
+            writer.wait()
+            ring.close()
+
+class TestPortfolio(unittest.TestCase):
+    """
+    Offline tests for vectorised portfolio valuation.
+    """
+    def setUp(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy not installed")
+        import random
+        rng = random.Random(7)
+        self.symbols = ["C%02d" % i for i in range(45)]
+        self.quotes = dict((s, round(rng.uniform(0.01, 5000), 4))
+                           for s in self.symbols)
+        self.records = [(rng.randrange(300), rng.choice(self.symbols + ["USD"]),
+                         round(rng.uniform(0, 100), 6)) for _ in range(2000)]
+        self.records.append((1000, "XXX", 1.0))
+        self.candles = {}
+        for i, symbol in enumerate(self.symbols[:5]):
+            candles = make_candles(86400 * 10, 20, step=86400, seed=i)
+            self.candles[symbol] = [c for j, c in enumerate(candles)
+                                    if (j + i) % 4]
+
+        def pricemulti(params):
+            fsyms = params["fsyms"].split(",")
+            known = [s for s in fsyms if s in self.quotes]
+            if not known:
+                return {"Response": "Error", "Message": "no data for XXX"}
+            return dict((s, {params["tsyms"]: self.quotes[s]}) for s in known)
+
+        def histoday(params):
+            return {"Response": "Success", "Data": self.candles[params["fsym"]]}
+        self.server = StubServer({"/data/pricemulti": pricemulti,
+                                  "/data/histoday": histoday})
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_value_portfolios(self):
+        import math
+        from pycryptocompare.portfolio import Holdings, value_portfolios
+
+        holdings = Holdings.from_records(*zip(*self.records))
+        valuation = value_portfolios(self.server.client(parse_float=float),
+                                     holdings, "USD")
+        expected = {}
+        for portfolio, symbol, quantity in self.records:
+            price = 1.0 if symbol == "USD" else self.quotes.get(symbol, math.nan)
+            expected[portfolio] = expected.get(portfolio, 0.0) + quantity * price
+        values = valuation.as_dict()
+        self.assertEqual(sorted(values), sorted(expected))
+        self.assertTrue(math.isnan(values.pop(1000)))
+        for portfolio, value in values.items():
+            self.assertAlmostEqual(value, expected[portfolio], places=6)
+        self.assertTrue(math.isnan(valuation.prices[-1]))  # XXX
+        self.assertEqual(valuation.errors, {})
+        prices = [h for h in self.server.hits if h[0] == "/data/pricemulti"]
+        self.assertEqual(len(prices), 3)  # 46 symbols by 20
+
+        holdings = Holdings.from_dict({1: {"XXX": 2}, 2: {"USD": 3}})
+        valuation = value_portfolios(self.server.client(), holdings, "USD")
+        self.assertTrue(math.isnan(valuation.values[0]))
+        self.assertEqual(valuation.values[1], 3)
+        self.assertEqual(list(valuation.errors), ["XXX"])
+
+    def test_exact(self):
+        from decimal import Decimal
+        from pycryptocompare.portfolio import Holdings, value_portfolios
+
+        holdings = Holdings.from_records(*zip(*self.records), exact=True)
+        valuation = value_portfolios(self.server.client(), holdings, "USD")
+        expected = {}
+        for portfolio, symbol, quantity in self.records:
+            if symbol == "XXX":
+                continue
+            price = Decimal(1) if symbol == "USD" else \
+                Decimal(repr(self.quotes[symbol]))
+            expected[portfolio] = (expected.get(portfolio, Decimal(0)) +
+                                   Decimal(repr(quantity)) * price)
+        values = valuation.as_dict()
+        self.assertIsNone(values.pop(1000))
+        self.assertEqual(values, expected)
+        self.assertTrue(all(isinstance(v, Decimal) for v in values.values()))
+
+    def test_value_history(self):
+        import numpy as np
+        from pycryptocompare.portfolio import Holdings, value_history
+
+        quantities = dict((s, i + 1) for i, s in enumerate(self.symbols[:5]))
+        quantities["USD"] = 10
+        holdings = Holdings.from_dict({"a": quantities,
+                                       "b": {self.symbols[0]: 2}})
+        history = value_history(self.server.client(parse_float=float),
+                                holdings, "USD", "day", limit=20)
+        times = sorted(set(c["time"] for candles in self.candles.values()
+                           for c in candles))
+        self.assertEqual(list(history.time), times)
+        for row, ts in enumerate(times):
+            value = 10.0
+            for symbol, candles in self.candles.items():
+                before = [c["close"] for c in candles if c["time"] <= ts]
+                value = value + quantities[symbol] * before[-1] \
+                    if before else np.nan
+            if np.isnan(value):
+                self.assertTrue(np.isnan(history.portfolio("a")[row]))
+            else:
+                self.assertAlmostEqual(history.portfolio("a")[row], value)
+        self.assertFalse(np.isnan(history.portfolio("a")[-1]))
+
+class TestThreadSafety(unittest.TestCase):
+    """
+    Offline stress tests of a client shared by many threads.
+    """
+    PATHS = ("/data/pricemulti", "/data/pricemultifull", "/data/generateAvg",
+             "/data/dayAvg", "/data/pricehistorical", "/data/socialstats",
+             "/data/histohour", "/data/top/pairs", "/data/top/exchanges",
+             "/data/top/volumes", "/data/all/exchanges", "/data/news/providers",
+             "/data/news/", "/data/coinlist", "/data/miningcontracts",
+             "/data/miningequipment", "/stats")
+
+    def setUp(self):
+        def echo(path):
+            return lambda params: {"Response": "Success",
+                                   "Data": {"path": path, "params": params}}
+        routes = dict((path, echo(path)) for path in self.PATHS)
+        routes["/"] = DOCUMENTATION
+        self.server = StubServer(routes)
+
+    def tearDown(self):
+        self.server.stop()
+
+    @staticmethod
+    def calls(symbol):
+        """(method, args, kwargs, path, unique param) of every data method."""
+        return [
+            ("price", (symbol, "USD"), {}, "/data/pricemulti", symbol),
+            ("price", (symbol, "USD"), {"full": True}, "/data/pricemultifull",
+             symbol),
+            ("generate_avg", (symbol, "USD", ["Kraken"]), {},
+             "/data/generateAvg", symbol),
+            ("day_avg", (symbol, "USD"), {}, "/data/dayAvg", symbol),
+            ("price_historical", (symbol, ["USD"]), {}, "/data/pricehistorical",
+             symbol),
+            ("social_stats", (symbol,), {}, "/data/socialstats", symbol),
+            ("histo", ("hour", symbol, "USD"), {}, "/data/histohour", symbol),
+            ("top_pairs", (symbol,), {}, "/data/top/pairs", symbol),
+            ("top_exchanges", (symbol, "USD"), {}, "/data/top/exchanges",
+             symbol),
+            ("top_volumes", (symbol,), {}, "/data/top/volumes", symbol),
+            ("exchanges", (), {}, "/data/all/exchanges", None),
+            ("news_providers", (), {}, "/data/news/providers", None),
+            ("news", (), {"lTs": 1500000000}, "/data/news/", None),
+            ("mining_contracts", (), {}, "/data/miningcontracts", None),
+            ("mining_equipment", (), {}, "/data/miningequipment", None),
+            ("server_stats", (), {}, "/stats", None),
+        ]
+
+    def hammer(self, cc, threads=16, rounds=40):
+        import random
+        errors = []
+        barrier = threading.Barrier(threads)
+
+        def worker(n):
+            rng = random.Random(n)
+            barrier.wait()
+            try:
+                for i in range(rounds):
+                    symbol = "S%dX%d" % (n, i)
+                    method, args, kwargs, path, unique = \
+                        rng.choice(self.calls(symbol))
+                    data = getattr(cc, method)(*args, **kwargs)["Data"]
+                    self.assertEqual(data["path"], path)
+                    if unique is not None:
+                        self.assertIn(unique, data["params"].values())
+                    self.assertEqual(cc.cache_duration(cc.day_avg), 1200)
+                    self.assertEqual(cc.coin_list()["path"], "/data/coinlist")
+            except Exception as err:
+                errors.append(err)
+
+        workers = [threading.Thread(target=worker, args=(n,))
+                   for n in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(errors, [])
+        # Documentation is downloaded once by the shared client
+        self.assertEqual(len([h for h in self.server.hits if h[0] == "/"]), 1)
+
+    def test_shared_client(self):
+        for transport in ("requests", "http.client"):
+            del self.server.hits[:]
+            cc = self.server.client(transport=transport)
+            self.hammer(cc)
+            cc.transport.close()
+
+    def test_shared_client_with_cache(self):
+        from pycryptocompare.cache import MemoryCache
+        cc = self.server.client(cache=MemoryCache())
+        self.hammer(cc)
+        coinlist = [h for h in self.server.hits if h[0] == "/data/coinlist"]
+        self.assertEqual(len(coinlist), 1)
+
+    def test_concurrent_misses(self):
+        import time
+        from pycryptocompare.cache import MemoryCache
+
+        def slow(params):
+            time.sleep(0.2)
+            return {"BTC": {"USD": 1}}
+        self.server.routes["/data/pricemulti"] = slow
+        cc = self.server.client(cache=MemoryCache())
+        results = []
+        workers = [threading.Thread(target=lambda: results.append(
+                       cc.price("BTC", "USD"))) for _ in range(8)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(len(results), 8)
+        hits = [h for h in self.server.hits if h[0] == "/data/pricemulti"]
+        self.assertEqual(len(hits), 1)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file